@@ -1,16 +1,27 @@
 import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from fastapi import APIRouter
 from sqlalchemy.orm import Session
 
-from app.api import get_db
+from app.database import get_db
 from app.models import User
+from app.utils.latency import LatencyHistogram
+from app.utils.config import settings
+from app.utils.shared_cache import make_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
@@ -29,25 +40,153 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token: no username",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return username
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
+# Principal cache: authenticated user snapshots keyed on token subject
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+# Embed immutable claims (uid, role) in tokens so id/role checks skip the DB
+AUTH_EMBED_CLAIMS = os.getenv("AUTH_EMBED_CLAIMS", "true").lower() in ("1", "true", "yes")
+
+# Both are shared by the workers on a host, so an invalidation in one reaches all of them
+_principal_cache = make_cache("principals", AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_SIZE)
+# username -> unix time of the last role change; older embedded claims are ignored.
+# Kept for a token lifetime; most lookups are for users never revoked, so misses are cached too.
+_claims_revoked_at = make_cache(
+    "claims_revoked", ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    negative_ttl_seconds=settings.SHARED_CACHE_L1_TTL_SECONDS,
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached snapshot of the authenticated user, safe to share across sessions."""
+    id: int
+    username: str
+    role: str
+    email: Optional[str] = None
+    full_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=user.role,
+            email=user.email,
+            full_name=user.full_name,
+            created_at=user.created_at,
         )
-    
+
+
+def invalidate_principal(username: str, claims_changed: bool = False):
+    """
+    Drop the cached principal for `username`. Pass claims_changed=True when
+    the role changes so tokens carrying the old role fall back to the DB.
+    """
+    _principal_cache.delete(username)
+    if claims_changed:
+        _claims_revoked_at.set(username, int(time.time()))
+
 # Password hashing
+# bcrypt runs on its own bounded pool so login storms can't starve the request threadpool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+BCRYPT_CALIBRATE = os.getenv("BCRYPT_CALIBRATE", "true").lower() in ("1", "true", "yes")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", 250))
+# Floor for the cost: passlib's default, never lowered by calibration
+BCRYPT_MIN_ROUNDS = max(12, int(os.getenv("BCRYPT_MIN_ROUNDS", 12)))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", 14))
+pwd_context.update(bcrypt__default_rounds=BCRYPT_MIN_ROUNDS, bcrypt__min_rounds=BCRYPT_MIN_ROUNDS)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated thread pool. At most workers + queue_limit
+    jobs may be pending; beyond that callers get a 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.hash_latency = LatencyHistogram()
+        self.verify_latency = LatencyHistogram()
+        self.rejected = 0
+        self.rehashed = 0
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        def _job():
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        return await asyncio.wrap_future(self._executor.submit(_job))
+
+    async def hash(self, password: str) -> str:
+        start = time.perf_counter()
+        hashed = await self.run(pwd_context.hash, password)
+        self.hash_latency.observe(time.perf_counter() - start)
+        return hashed
+
+    async def verify(self, plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """
+        Returns (valid, new_hash). new_hash is set when the stored hash is
+        weaker than the current policy and should be replaced.
+        """
+        start = time.perf_counter()
+        valid, new_hash = await self.run(pwd_context.verify_and_update, plain_password, hashed_password)
+        self.verify_latency.observe(time.perf_counter() - start)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "rounds": pwd_context.handler("bcrypt").default_rounds,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "hash_latency": self.hash_latency.snapshot(),
+            "verify_latency": self.verify_latency.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS) -> int:
+    """
+    Raise the bcrypt cost to the highest one whose hash time stays within
+    target_ms on this machine; it never goes below BCRYPT_MIN_ROUNDS. New
+    hashes use the calibrated cost. Only hashes below the fixed floor are
+    upgraded on login, so workers that calibrate differently agree on which
+    hashes need it.
+    """
+    bcrypt = pwd_context.handler("bcrypt").using(rounds=BCRYPT_MIN_ROUNDS)
+    elapsed_ms = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        bcrypt.hash("calibration")
+        elapsed_ms = min(elapsed_ms, (time.perf_counter() - start) * 1000)
+
+    rounds = BCRYPT_MIN_ROUNDS
+    # Each extra round doubles the cost
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+
+    pwd_context.update(bcrypt__default_rounds=rounds)
+    logger.info("bcrypt cost calibrated to %d rounds (~%.0f ms per hash)", rounds, elapsed_ms)
+    return rounds
+
+
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
@@ -61,6 +200,12 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_user_token(user) -> str:
+    data = {"sub": user.username}
+    if AUTH_EMBED_CLAIMS:
+        data.update({"uid": user.id, "role": user.role, "iat": datetime.utcnow()})
+    return create_access_token(data)
+
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -68,21 +213,51 @@ def decode_access_token(token: str):
     except JWTError:
         return None
     
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decode_subject(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return payload
+
+def _load_principal(username: str, db: Session) -> Principal:
+    principal = _principal_cache.get(username)
+    if principal is None:
+        user = db.query(User).filter(User.username == username).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.from_user(user)
+        _principal_cache.set(username, principal)
+    return principal
+
+def _claims_are_current(payload: dict) -> bool:
+    if not AUTH_EMBED_CLAIMS or "uid" not in payload or "role" not in payload:
+        return False
+    revoked_at = _claims_revoked_at.get(payload["sub"])
+    return revoked_at is None or payload.get("iat", 0) > revoked_at
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Full profile of the caller, served from the principal cache when warm."""
+    payload = _decode_subject(token)
+    return _load_principal(payload["sub"], db)
+
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """
+    Caller identity for endpoints that only need id and role. Answered from
+    the token's embedded claims when present, so it usually never hits the DB.
+    """
+    return principal_from_token(token, db)
 
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+def principal_from_token(token: str, db: Session) -> Principal:
+    """get_current_principal without dependency injection (WebSockets, long-lived streams)."""
+    payload = _decode_subject(token)
+    if _claims_are_current(payload):
+        return Principal(id=payload["uid"], username=payload["sub"], role=payload["role"])
+    return _load_principal(payload["sub"], db)
 
-def get_current_admin(current_user: User = Depends(get_current_user)):
+def get_current_admin(current_user: Principal = Depends(get_current_principal)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized as admin")
     return current_user
\ No newline at end of file
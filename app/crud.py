@@ -1,8 +1,20 @@
 # app/crud.py
+import base64
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from . import models, schemas
-from sqlalchemy.orm import Session
-from . import models, schemas
+
+# Keyset pagination
+MAX_PAGE_SIZE = 1000
+
+# Columns returned by list views when no explicit projection is requested.
+# Media.ai_result is left out on purpose: it is the heaviest column.
+MEDIA_LIST_FIELDS = ("id", "filename", "file_path", "file_type", "size_mb", "uploaded_at", "farm_id", "ai_status")
+MEDIA_ALL_FIELDS = MEDIA_LIST_FIELDS + ("user_id", "ai_result")
+FARM_LIST_FIELDS = ("id", "farm_name", "location", "soil_type", "area", "latitude", "longitude", "created_at", "owner_id")
 
 def create_user(db: Session, user: schemas.UserCreate):
     db_user = models.User(name=user.name, email=user.email)
@@ -14,6 +26,23 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_users(db: Session):
     return db.query(models.User).all()
 
+def get_user_by_username(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def create_account(db: Session, username: str, email: str, hashed_password: str):
+    db_user = models.User(username=username, email=email, hashed_password=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+def set_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user_id).update({"hashed_password": hashed_password})
+    db.commit()
+
 def create_image_record(db: Session, filename: str, filepath: str, uploaded_by: int = None):
     rec = models.ImageRecord(filename=filename, filepath=filepath, uploaded_by=uploaded_by)
     db.add(rec)
@@ -33,5 +62,101 @@ def update_image_prediction(db: Session, record_id: int, prediction: str):
 def get_image(db: Session, record_id: int):
     return db.query(models.ImageRecord).filter(models.ImageRecord.id == record_id).first()
 
-def list_images(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ImageRecord).offset(skip).limit(limit).all()
+def list_images(db: Session, after_id: Optional[int] = None, limit: int = 100):
+    q = db.query(models.ImageRecord)
+    if after_id is not None:
+        q = q.filter(models.ImageRecord.id > after_id)
+    return q.order_by(models.ImageRecord.id).limit(limit).all()
+
+
+# ---------------------
+# KEYSET PAGINATION
+# ---------------------
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    """Opaque cursor pointing at the last row of a page."""
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor. Raises ValueError on malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> list[str]:
+    """Turn a comma separated ?fields= value into a validated column list."""
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _keyset_query(db: Session, model, owner_col, owner_id: int, ts_col, fields: Sequence[str], cursor: Optional[str]):
+    # id and the sort column are always selected so the next cursor can be built
+    # (the requested fields come first, which _row_serializer relies on)
+    names = list(dict.fromkeys(list(fields) + ["id", ts_col.key]))
+    q = db.query(*[getattr(model, n) for n in names]).filter(owner_col == owner_id)
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        q = q.filter(tuple_(ts_col, model.id) < tuple_(ts, last_id))
+    return names, q.order_by(ts_col.desc(), model.id.desc())
+
+
+def _row_serializer(names, fields: Sequence[str]):
+    """Row tuple -> dict of the requested fields, with the key list worked out once per query."""
+    keys = tuple(dict.fromkeys(fields))
+    return lambda row: dict(zip(keys, row))
+
+
+def _page(names, q, fields: Sequence[str], ts_key: str, limit: int):
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = dict(zip(names, rows[-1]))
+        next_cursor = encode_cursor(last[ts_key], last["id"])
+    to_dict = _row_serializer(names, fields)
+    items = [to_dict(row) for row in rows]
+    return items, next_cursor
+
+
+def _iter_rows(names, q, fields: Sequence[str], batch_size: int = 500):
+    to_dict = _row_serializer(names, fields)
+    for row in q.yield_per(batch_size):
+        yield to_dict(row)
+
+
+def list_media_page(db: Session, user_id: int, limit: int = 100, cursor: Optional[str] = None,
+                    fields: Sequence[str] = MEDIA_LIST_FIELDS):
+    """Newest-first page of a user's media plus the cursor of the next page (None at the end)."""
+    names, q = _keyset_query(db, models.Media, models.Media.user_id, user_id, models.Media.uploaded_at, fields, cursor)
+    return _page(names, q, fields, "uploaded_at", limit)
+
+
+def iter_media(db: Session, user_id: int, cursor: Optional[str] = None, fields: Sequence[str] = MEDIA_LIST_FIELDS):
+    """Every media row after the cursor, fetched in batches."""
+    names, q = _keyset_query(db, models.Media, models.Media.user_id, user_id, models.Media.uploaded_at, fields, cursor)
+    return _iter_rows(names, q, fields)
+
+
+def list_farms_page(db: Session, owner_id: int, limit: int = 100, cursor: Optional[str] = None,
+                    fields: Sequence[str] = FARM_LIST_FIELDS):
+    """Newest-first page of a user's farms plus the cursor of the next page (None at the end)."""
+    names, q = _keyset_query(db, models.Farm, models.Farm.owner_id, owner_id, models.Farm.created_at, fields, cursor)
+    return _page(names, q, fields, "created_at", limit)
+
+
+def iter_farms(db: Session, owner_id: int, cursor: Optional[str] = None, fields: Sequence[str] = FARM_LIST_FIELDS):
+    """Every farm row after the cursor, fetched in batches."""
+    names, q = _keyset_query(db, models.Farm, models.Farm.owner_id, owner_id, models.Farm.created_at, fields, cursor)
+    return _iter_rows(names, q, fields)
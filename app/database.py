@@ -1,28 +1,275 @@
 # app/database.py
 import os
-from sqlalchemy import create_engine
+import time
+import logging
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
+from app.utils.latency import LatencyHistogram
+from app.utils.metrics import db_query_latency, histogram_samples, metrics
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 
-DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-print(DATABASE_URL)
+# DATABASE_URL overrides the POSTGRES_* settings, e.g. sqlite:///./test.db for local runs
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+# Pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+# Create missing tables in the app's startup hook; turn off when a deploy step runs `python -m app.database init`
+DB_CREATE_TABLES = os.getenv("DB_CREATE_TABLES", "true").lower() in ("1", "true", "yes")
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+class PoolMetrics:
+    """
+    Checkout latency and saturation counters for the connection pool.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = LatencyHistogram(self.BUCKETS)
+        self.reset()
+
+    def reset(self):
+        self.wait.reset()
+        with self._lock:
+            self.timeouts = 0
+            self.in_use = 0
+            self.in_use_peak = 0
+
+    def observe_wait(self, seconds: float):
+        self.wait.observe(seconds)
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def checked_out(self):
+        with self._lock:
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> dict:
+        capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+        wait = self.wait.snapshot()
+        with self._lock:
+            return {
+                "checkouts": wait["count"],
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": wait["sum_seconds"] / wait["count"] if wait["count"] else 0.0,
+                "wait_seconds_max": wait["max_seconds"],
+                "wait_histogram": wait["buckets"],
+                "in_use": self.in_use,
+                "in_use_peak": self.in_use_peak,
+                "capacity": None if IS_SQLITE else capacity,
+                "saturation": None if IS_SQLITE else round(self.in_use / capacity, 3),
+            }
+
+    def collect(self):
+        """Prometheus families for /metrics."""
+        yield "db_pool_wait_seconds", "histogram", "Time spent waiting for a pooled connection", \
+            histogram_samples("db_pool_wait_seconds", {}, self.wait)
+        yield "db_pool_timeouts_total", "counter", "Connection checkouts that timed out", \
+            [("db_pool_timeouts_total", {}, self.timeouts)]
+        yield "db_pool_connections_in_use", "gauge", "Connections currently checked out", \
+            [("db_pool_connections_in_use", {}, self.in_use)]
+
+
+pool_metrics = PoolMetrics()
+metrics.register_collector(pool_metrics.collect)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        pool_metrics.observe_wait(time.perf_counter() - start)
+        return conn
+
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite stand-in: keep SQLAlchemy's default pool, allow use across threadpool threads
+        return {"connect_args": {"check_same_thread": False}}
+    kwargs = {} if is_async else {"poolclass": InstrumentedQueuePool}
+    return {
+        **kwargs,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _async_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return url
+
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+logger.info("Database: %s", engine.url.render_as_string(hide_password=True))
+
+
+def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+    pool_metrics.checked_out()
+
+
+def _on_checkin(dbapi_conn, conn_record):
+    pool_metrics.checked_in()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start", None)
+    if started is None:
+        return
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_query_latency.labels(statement=verb if verb in _STATEMENT_LABELS else "OTHER").observe(
+        time.perf_counter() - started
+    )
+
+
+_STATEMENT_LABELS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COPY", "BEGIN", "COMMIT", "ROLLBACK", "CREATE"}
+
+
+def _track_pool(sync_engine):
+    event.listen(sync_engine, "checkout", _on_checkout)
+    event.listen(sync_engine, "checkin", _on_checkin)
+    event.listen(sync_engine, "before_cursor_execute", _before_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_execute)
+
+
+_track_pool(engine)
+
 
-engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional async engine for hot endpoints (aiosqlite / asyncpg driver, pinned in requirements.txt)
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC_ENABLED:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    try:
+        async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_kwargs(DATABASE_URL, is_async=True))
+    except ImportError as e:
+        raise RuntimeError(
+            f"DB_ASYNC_ENABLED=true needs the async driver for {engine.url.get_backend_name()} "
+            f"(aiosqlite or asyncpg, see requirements.txt): {e}"
+        ) from e
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    _track_pool(async_engine.sync_engine)
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is disabled (set DB_ASYNC_ENABLED=true)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a sync `fn(session, *args, **kwargs)` without blocking the event loop:
+    on the async engine when enabled, otherwise on a threadpool thread.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def _call():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+
+    return await run_in_threadpool(_call)
+
+
+def pool_status() -> dict:
+    status = pool_metrics.snapshot()
+    status["pool"] = engine.pool.status()
+    return status
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def migrate(revision: str = "head"):
+    """Apply the alembic migrations in app/migrations (columns and indexes on existing tables)."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    command.upgrade(config, revision)
+
+
+def init_db():
+    """
+    Create missing tables, then migrate: create_all() never changes a table
+    that already exists, so new columns and indexes come from migrations.
+    """
+    from app import models  # imported here: models imports this module
+    models.Base.metadata.create_all(bind=engine)
+    migrate()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument("command", choices=["init", "migrate"],
+                        help="init: create missing tables and migrate; migrate: apply migrations only")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        migrate()
+        logger.info("Migrations applied")
+    else:
+        init_db()
+        logger.info("Tables created and migrated")
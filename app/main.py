@@ -1,45 +1,172 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from .utils.startup_profiler import boot  # first: the boot clock starts here
+
+import io
+import sys
+import json
+import time
+import asyncio
+import logging
+import functools
+from typing import Optional
+
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.routes import media_routes
-from . import models, schemas
-from .database import engine, get_db
-from .auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.routes import alert_routes, knowledge_routes, media_routes, voice_routes
+from . import crud, models, schemas
+from .services.api_fetcher import APIFetcher
+from .services import language_detection
+from .services.language_detection import get_language_detector
+from .services.farm_import_service import IMPORT_FORMATS, FarmImportService, export_farms
+from .utils import grid_cell, stream_json_array
+from .utils.fast_json import FastJSONResponse
+from .utils.shared_cache import get_shared_store
+from .utils.tracing import format_collapsed, ignore_current_request, sample_stacks, slow_requests
+from .utils.translation_cache import get_translation_cache
+from .services.answer_cache import get_answer_cache
+from .services.insight_scheduler import get_insight_scheduler
+from .services.spatial_index import get_spatial_index
+from .services.alert_hub import get_alert_hub
+from .services.knowledge_base import get_knowledge_base
+from .services.timeseries_store import get_timeseries_store
+from .utils.config import settings
+from .utils.metrics import MetricsMiddleware, WorkerMetricsPublisher, histogram_samples, metrics
+from .database import DB_CREATE_TABLES, get_db, init_db, pool_status, run_db
+from .auth import (
+    BCRYPT_CALIBRATE, calibrate_bcrypt_rounds, password_hasher, create_user_token, invalidate_principal,
+    Principal, get_current_user, get_current_principal, get_current_admin,
+)
 from app import auth
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="AI Farm CoPilot - Backend (Hackathon)")
+app.add_middleware(MetricsMiddleware)
+boot.record("import app.main", boot.started)
+
+
+@app.on_event("startup")
+def create_tables():
+    # A startup step rather than an import side effect: with the DB down the
+    # worker still boots, and pool pre-ping reconnects once it is back
+    if DB_CREATE_TABLES:
+        with boot.phase("create_tables"):
+            try:
+                init_db()
+            except SQLAlchemyError as e:
+                logger.error(f"Creating tables failed, run `python -m app.database init` once the DB is up: {e}")
+
+
+def _load_language_processor():
+    # Imports deep_translator, speech_recognition and googletrans
+    from .services.language_services import get_language_processor
+    return get_language_processor()
+
+
+async def _warm_up():
+    """Calibrate bcrypt and load heavy libraries/models while the worker is already serving."""
+    steps = []
+    if BCRYPT_CALIBRATE:
+        steps.append(("calibrate_bcrypt", functools.partial(password_hasher.run, calibrate_bcrypt_rounds)))
+    if settings.STARTUP_WARMUP:
+        steps += [
+            (name, functools.partial(run_in_threadpool, fn))
+            for name, fn in (
+                ("language_detector", get_language_detector),
+                ("language_processor", _load_language_processor),
+                ("knowledge_base", get_knowledge_base),
+                ("spatial_index", get_spatial_index().reload),
+            )
+        ]
+    for name, step in steps:
+        try:
+            with boot.phase(f"warmup:{name}"):
+                await step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+
+
+@app.on_event("startup")
+def start_warm_up():
+    # Not awaited: anything needed before it finishes loads on first use
+    app.state.warm_up = asyncio.get_running_loop().create_task(_warm_up())
+
+
+@app.on_event("shutdown")
+def cancel_warm_up():
+    app.state.warm_up.cancel()
+
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+@app.on_event("startup")
+def start_alert_hub():
+    # Delivers alerts that other workers' schedulers publish
+    app.state.alert_poller = asyncio.get_running_loop().create_task(get_alert_hub().run())
+
+
+@app.on_event("shutdown")
+def stop_alert_hub():
+    app.state.alert_poller.cancel()
+
+
+@app.on_event("shutdown")
+async def close_translation_clients():
+    # Only if the warm-up or a request loaded the language stack; don't import it just to close it
+    language_services = sys.modules.get("app.services.language_services")
+    if language_services is not None:
+        await language_services.close_language_processor()
+
+
+@app.on_event("startup")
+def start_insight_scheduler():
+    if settings.INSIGHT_REFRESH_SECONDS > 0:
+        try:
+            get_insight_scheduler().start()
+        except ValueError as e:
+            logger.warning(f"Insight precompute disabled: {e}")
+
+
+@app.on_event("shutdown")
+def stop_insight_scheduler():
+    if settings.INSIGHT_REFRESH_SECONDS > 0:
+        try:
+            get_insight_scheduler().stop()
+        except ValueError:
+            pass
 
 # ---------------------
 # AUTH ENDPOINTS
 # ---------------------
 
 @app.post("/register", response_model=schemas.Token)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.username == user.username).first():
+async def register(user: schemas.UserCreate):
+    if await run_db(crud.get_user_by_username, user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await run_db(crud.get_user_by_email, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    hashed_password = await password_hasher.hash(user.password)
+    db_user = await run_db(crud.create_account, user.username, user.email, hashed_password)
 
-    token = create_access_token({"sub": db_user.username})
+    token = create_user_token(db_user)
     return {"access_token": token, "token_type": "bearer"}
 
 
 @app.post("/login", response_model=schemas.Token)
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: schemas.UserLogin):
+    db_user = await run_db(crud.get_user_by_username, user.username)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
+    valid, new_hash = await password_hasher.verify(user.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    if new_hash:
+        # Stored hash is below the calibrated cost: upgrade it while we have the password
+        await run_db(crud.set_password_hash, db_user.id, new_hash)
 
-    token = create_access_token({"sub": db_user.username})
+    token = create_user_token(db_user)
     return {"access_token": token, "token_type": "bearer"}
 
 
@@ -48,16 +175,16 @@ def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
 # ---------------------
 
 @app.get("/profile", response_model=schemas.UserProfile)
-def get_profile(current_user: models.User = Depends(get_current_user)):
+def get_profile(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 @app.put("/profile/update", response_model=schemas.UserOut)
 def update_profile(
     user_update: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    # Re-fetch user in the current session
+    # Load the user once, in the current session
     db_user = db.query(models.User).filter(models.User.id == current_user.id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -66,11 +193,13 @@ def update_profile(
         db_user.full_name = user_update.full_name
     if user_update.email:
         db_user.email = user_update.email
+    role_changed = bool(user_update.role) and user_update.role != db_user.role
     if user_update.role:
         db_user.role = user_update.role
 
     db.commit()
     db.refresh(db_user)
+    invalidate_principal(db_user.username, claims_changed=role_changed)
 
     return schemas.UserOut.from_orm(db_user)
 
@@ -80,32 +209,64 @@ def update_profile(
 # ---------------------
 
 @app.post("/farm/add", response_model=schemas.FarmResponse)
-def add_farm(farm: schemas.FarmCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def add_farm(farm: schemas.FarmCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_principal)):
     new_farm = models.Farm(
         farm_name=farm.farm_name,
         location=farm.location,
         soil_type=farm.soil_type,
         area=farm.area,
+        latitude=farm.latitude,
+        longitude=farm.longitude,
         owner_id=current_user.id
     )
     db.add(new_farm)
     db.commit()
     db.refresh(new_farm)
+    get_spatial_index().farm_changed(new_farm.id, new_farm.latitude, new_farm.longitude)
     return new_farm
 
 
 @app.get("/farm/myfarms", response_model=list[schemas.FarmResponse])
-def get_my_farms(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    farms = db.query(models.Farm).filter(models.Farm.owner_id == current_user.id).all()
-    return farms
+async def get_my_farms(
+    limit: int = Query(100, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Newest-first, keyset-paginated list of the user's farms.
+    The next page's cursor is returned in the X-Next-Cursor header.
+    `fields` restricts the returned columns; `stream=true` streams every
+    remaining farm after `cursor` as one JSON array and ignores `limit`.
+    """
+    try:
+        columns = crud.parse_fields(fields, crud.FARM_LIST_FIELDS, crud.FARM_LIST_FIELDS)
+        if stream:
+            rows = crud.iter_farms(db, current_user.id, cursor=cursor, fields=columns)
+            return StreamingResponse(stream_json_array(rows), media_type="application/json")
+        farms, next_cursor = await run_db(crud.list_farms_page, current_user.id, limit=limit, cursor=cursor, fields=columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    # Rows are plain dicts already; returning a Response skips response_model
+    # validation, which is kept for the OpenAPI schema only
+    return FastJSONResponse(farms, headers=headers)
 
 
 @app.put("/farm/update/{farm_id}", response_model=schemas.FarmResponse)
-def update_farm(farm_id: int, farm: schemas.FarmCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def update_farm(farm_id: int, farm: schemas.FarmCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_principal)):
     db_farm = db.query(models.Farm).filter(models.Farm.id == farm_id, models.Farm.owner_id == current_user.id).first()
     if not db_farm:
         raise HTTPException(status_code=404, detail="Farm not found or not authorized to update")
 
+    if farm.latitude is not None and farm.longitude is not None:
+        db_farm.latitude, db_farm.longitude = farm.latitude, farm.longitude
+    elif farm.location != db_farm.location:
+        # Geocoded from the old location: let the scheduler geocode the new one
+        db_farm.latitude = db_farm.longitude = None
     db_farm.farm_name = farm.farm_name
     db_farm.location = farm.location
     db_farm.soil_type = farm.soil_type
@@ -113,10 +274,137 @@ def update_farm(farm_id: int, farm: schemas.FarmCreate, db: Session = Depends(ge
 
     db.commit()
     db.refresh(db_farm)
+    get_spatial_index().farm_changed(db_farm.id, db_farm.latitude, db_farm.longitude)
     return db_farm
 
+
+@app.get("/farm/{farm_id}/insights", response_model=schemas.FarmInsightResponse)
+def get_farm_insights(farm_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_principal)):
+    """Latest precomputed weather/soil insights for a farm (one indexed lookup, no upstream calls)."""
+    snapshot = (
+        db.query(models.FarmInsight)
+        .join(models.Farm)
+        .filter(models.FarmInsight.farm_id == farm_id, models.Farm.owner_id == current_user.id)
+        .first()
+    )
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="No insights computed for this farm yet")
+    return {
+        "farm_id": snapshot.farm_id,
+        "grid_cell": snapshot.grid_cell,
+        "computed_at": snapshot.computed_at,
+        "insights": json.loads(snapshot.insights),
+    }
+
+
+def _farm_cell(db: Session, farm_id: int, owner_id: int) -> str:
+    farm = db.query(models.Farm).filter(models.Farm.id == farm_id, models.Farm.owner_id == owner_id).first()
+    if not farm:
+        raise HTTPException(status_code=404, detail="Farm not found")
+    if farm.latitude is None or farm.longitude is None:
+        raise HTTPException(status_code=409, detail="Farm has no coordinates yet")
+    return grid_cell(farm.latitude, farm.longitude, settings.GRID_CELL_DEGREES)
+
+
+@app.get("/farm/{farm_id}/history")
+def get_farm_history(
+    farm_id: int,
+    source: str = Query("weather", regex="^(weather|soil)$"),
+    days: int = Query(14, ge=1, le=3650),
+    resolution: str = Query("auto", regex="^(auto|raw|hour|day)$"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Recorded weather or soil readings for the farm's grid cell over the last `days` days."""
+    cell = _farm_cell(db, farm_id, current_user.id)
+    end = time.time()
+    series = get_timeseries_store().query(source, cell, end - days * 86400, end, resolution)
+    resolution = series.pop("resolution")
+    return {
+        "grid_cell": cell,
+        "resolution": resolution,
+        # NaN (no reading) is not valid JSON
+        "series": {name: [None if v != v else v for v in values.tolist()] for name, values in series.items()},
+    }
+
+
+@app.get("/farm/{farm_id}/trends")
+def get_farm_trends(
+    farm_id: int,
+    days: int = Query(30, ge=1, le=3650),
+    gdd_base: float = 10.0,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Rainfall, growing degree-days and soil moisture trend from recorded history (no upstream calls)."""
+    cell = _farm_cell(db, farm_id, current_user.id)
+    store = get_timeseries_store()
+    end = time.time()
+    start = end - days * 86400
+    return {
+        "grid_cell": cell,
+        "days": days,
+        "rainfall_mm": round(store.cumulative_rainfall(cell, start, end), 2),
+        "growing_degree_days": round(store.growing_degree_days(cell, start, end, base=gdd_base), 1),
+        "moisture_trend_per_day": store.moisture_trend(cell, start, end),
+    }
+
+
+def _bulk_format(fmt: Optional[str], filename: Optional[str] = None) -> str:
+    if not fmt and filename:
+        ext = filename.rsplit(".", 1)[-1].lower()
+        fmt = {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(ext)
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, expected one of {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+@app.post("/farm/import", response_model=schemas.FarmImportResult)
+def import_farms(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    geocode: bool = True,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Bulk-create farms from a CSV or NDJSON upload with FarmCreate columns.
+    Invalid rows are skipped and reported by row number.
+    """
+    fmt = _bulk_format(format, file.filename)
+
+    geocoder = None
+    if geocode:
+        try:
+            geocoder = APIFetcher().get_coordinates
+        except ValueError as e:
+            logger.warning(f"Farm import without geocoding: {e}")
+
+    service = FarmImportService(geocoder=geocoder)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    result = service.import_farms(db, current_user.id, service.parse(stream, fmt))
+    if result["imported"]:
+        get_spatial_index().owner_changed(current_user.id)
+    return result
+
+
+@app.get("/farm/export")
+def export_my_farms(
+    format: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    fmt = _bulk_format(format)
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_farms(db, current_user.id, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="farms.{fmt}"'},
+    )
+
+
 @app.delete("/farm/delete/{farm_id}", status_code=204)
-def delete_farm(farm_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def delete_farm(farm_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_principal)):
     # Fetch the farm from the database
     farm = db.query(models.Farm).filter(models.Farm.id == farm_id).first()
     
@@ -129,8 +417,225 @@ def delete_farm(farm_id: int, db: Session = Depends(get_db), current_user: model
     
     db.delete(farm)
     db.commit()
+    get_spatial_index().farm_changed(farm_id, None, None)
     
     return {"detail": "Farm deleted successfully"}
 
 
+# ---------------------
+# ADMIN ENDPOINTS
+# ---------------------
+
+@app.get("/admin/db/pool")
+def get_db_pool_status(current_user: Principal = Depends(get_current_admin)):
+    return pool_status()
+
+
+@app.get("/admin/auth/hashing")
+def get_password_hashing_stats(current_user: Principal = Depends(get_current_admin)):
+    return password_hasher.stats()
+
+
+@app.get("/admin/cache/translation")
+def get_translation_cache_stats(current_user: Principal = Depends(get_current_admin)):
+    return get_translation_cache().stats()
+
+
+@app.post("/admin/insights/refresh")
+def refresh_farm_insights(current_user: Principal = Depends(get_current_admin)):
+    """
+    Run one insight refresh pass now and return its counts (409 while another
+    pass runs). Upstream requests go out at once rather than spread over
+    INSIGHT_REFRESH_SPREAD_SECONDS, so the request doesn't sit through the window.
+    """
+    try:
+        scheduler = get_insight_scheduler()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        return scheduler.refresh_once(spread_seconds=0)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/cache/shared")
+def get_shared_cache_stats(current_user: Principal = Depends(get_current_admin)):
+    """Entries per namespace and file size of the host-wide cache, plus this worker's tiers."""
+    store = get_shared_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Shared cache is disabled")
+    caches = {"principals": auth._principal_cache, "claims_revoked": auth._claims_revoked_at,
+              "answers": get_answer_cache()._cache}
+    return {**store.stats(), "workers": {name: cache.stats() for name, cache in caches.items()}}
+
+
+@app.get("/admin/startup")
+def get_startup_profile(current_user: Principal = Depends(get_current_admin)):
+    """Boot phases of this worker: app import, create_tables and background warm-up steps."""
+    return boot.snapshot()
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    idle: bool = False,
+    current_user: Principal = Depends(get_current_admin)
+):
+    """
+    Sample every thread of this worker for `seconds` and return collapsed
+    stacks ("thread;module:func;... samples"), ready for flamegraph.pl or
+    speedscope. Each worker profiles only itself.
+    """
+    ignore_current_request()
+    try:
+        counts = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000, idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(format_collapsed(counts))
+
+
+@app.get("/admin/trace/slow")
+def get_slow_requests(limit: Optional[int] = Query(None, ge=1),
+                      current_user: Principal = Depends(get_current_admin)):
+    """Newest first: this worker's recent slow requests with their span breakdown."""
+    return slow_requests.snapshot(limit)
+
+
+@app.put("/admin/trace/slow")
+def configure_slow_requests(threshold_ms: Optional[float] = Query(None, ge=0),
+                            size: Optional[int] = Query(None, ge=1, le=10000),
+                            clear: bool = False,
+                            current_user: Principal = Depends(get_current_admin)):
+    """Change the threshold (0 stops tracing) or buffer size of this worker until restart."""
+    slow_requests.configure(threshold_ms=threshold_ms, size=size)
+    if clear:
+        slow_requests.clear()
+    return slow_requests.snapshot()
+
+
+@app.get("/admin/farms/nearby")
+def get_farms_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=20000),
+    limit: int = Query(1000, ge=1, le=100000),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """Farms within radius_km of a point, nearest first."""
+    found = get_spatial_index().within_radius(lat, lon, radius_km, limit=limit)
+    return [{"farm_id": farm_id, "distance_km": km} for farm_id, km in found]
+
+
+@app.get("/admin/farms/nearest")
+def get_farms_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=1000),
+    current_user: Principal = Depends(get_current_admin)
+):
+    found = get_spatial_index().nearest(lat, lon, k)
+    return [{"farm_id": farm_id, "distance_km": km} for farm_id, km in found]
+
+
+@app.get("/admin/farms/within")
+def get_farms_within(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(10000, ge=1, le=1000000),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """Ids of farms in a bounding box; min_lon > max_lon crosses the antimeridian."""
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    return get_spatial_index().within_bbox(min_lat, min_lon, max_lat, max_lon, limit=limit)
+
+
+@app.get("/admin/farms/cells")
+def get_farm_cells(
+    size_degrees: float = Query(settings.GRID_CELL_DEGREES, gt=0, le=90),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """Farm count per grid cell (grid_cell() keys)."""
+    cells = get_spatial_index().group_by_cell(size_degrees)
+    return {"size_degrees": size_degrees, "cells": {cell: len(ids) for cell, ids in cells.items()}}
+
+
+@app.get("/admin/farms/spatial")
+def get_spatial_index_stats(current_user: Principal = Depends(get_current_admin)):
+    return get_spatial_index().stats()
+
+
+@app.get("/admin/alerts")
+def get_alert_hub_stats(current_user: Principal = Depends(get_current_admin)):
+    """Alert connections and subscribed cells of this worker."""
+    return get_alert_hub().stats()
+
+
+@app.get("/admin/cache/answers")
+def get_answer_cache_stats(current_user: Principal = Depends(get_current_admin)):
+    return get_answer_cache().stats()
+
+
+# ---------------------
+# METRICS
+# ---------------------
+
+def _collect_service_metrics():
+    """Cache hit counters and password hashing latency, read at scrape time."""
+    caches = []
+    translation = get_translation_cache().stats()
+    caches.append(("translation", translation["memory_hits"] + translation["disk_hits"], translation["misses"]))
+    answers = get_answer_cache().stats()
+    caches.append(("answers", answers["hits"], answers["misses"]))
+    caches.append(("auth_principal", auth._principal_cache.hits, auth._principal_cache.misses))
+    # Only if already loaded: a scrape must not trigger the model load
+    memo = getattr(language_detection._detector, "_memo", None)
+    if memo is not None:
+        caches.append(("language_detection", memo.hits, memo.misses))
+
+    yield "cache_hits_total", "counter", "Cache lookups answered from the cache", \
+        [("cache_hits_total", {"cache": name}, hits) for name, hits, _ in caches]
+    yield "cache_misses_total", "counter", "Cache lookups that missed", \
+        [("cache_misses_total", {"cache": name}, misses) for name, _, misses in caches]
+    yield "password_hash_duration_seconds", "histogram", "bcrypt hash/verify time including queueing", [
+        *histogram_samples("password_hash_duration_seconds", {"op": "hash"}, password_hasher.hash_latency),
+        *histogram_samples("password_hash_duration_seconds", {"op": "verify"}, password_hasher.verify_latency),
+    ]
+
+
+metrics.register_collector(_collect_service_metrics)
+metrics_publisher: Optional[WorkerMetricsPublisher] = None
+
+
+@app.on_event("startup")
+def start_metrics_publisher():
+    global metrics_publisher
+    store = get_shared_store()
+    if store is not None and settings.METRICS_PUBLISH_SECONDS > 0:
+        metrics_publisher = WorkerMetricsPublisher(metrics, store, settings.METRICS_PUBLISH_SECONDS)
+        metrics_publisher.start()
+
+
+@app.on_event("shutdown")
+def stop_metrics_publisher():
+    if metrics_publisher is not None:
+        metrics_publisher.stop()
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Prometheus text exposition of route, upstream, stage, inference, DB and
+    cache metrics, for all workers on this host when they share a cache file.
+    """
+    body = metrics_publisher.render() if metrics_publisher is not None else metrics.render()
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 app.include_router(media_routes.router)
+app.include_router(voice_routes.router)
+app.include_router(knowledge_routes.router)
+app.include_router(alert_routes.router)
@@ -0,0 +1,51 @@
+# app/migrations/env.py
+"""
+Alembic environment: runs against app.database's engine (DATABASE_URL /
+POSTGRES_*), so `alembic` and `python -m app.database init` hit the same DB.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+from app import models
+from app.database import DATABASE_URL, IS_SQLITE, engine
+
+target_metadata = models.Base.metadata
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name)  # the alembic CLI (alembic.ini)
+
+# Postgres advisory lock id: workers upgrading at startup run one at a time
+MIGRATION_LOCK_ID = 7305841
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL instead of running it (`alembic upgrade head --sql`)."""
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata,
+                      literal_binds=True, render_as_batch=IS_SQLITE)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Session-level lock: survives the commit that ends the autobegun transaction
+            connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+        try:
+            # SQLite can't ALTER most things in place; batch mode copies the table
+            context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=IS_SQLITE)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,53 @@
+"""Farm coordinates and keyset pagination indexes
+
+Databases created before alembic was introduced were managed by
+create_all(), which never alters existing tables (nor adds indexes to
+them). init_db() runs create_all() first, so on a fresh database these
+already exist; each step checks before adding.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str) -> set:
+    if context.is_offline_mode():
+        return set()  # --sql output: no database to look at, emit every step
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str) -> set:
+    if context.is_offline_mode():
+        return set()
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    existing = _columns("farms")
+    for name in ("latitude", "longitude"):
+        if name not in existing:
+            op.add_column("farms", sa.Column(name, sa.Float(), nullable=True))
+    # Keyset pagination of /farm/myfarms and /media/myfiles
+    if "ix_farms_owner_created" not in _indexes("farms"):
+        op.create_index("ix_farms_owner_created", "farms", ["owner_id", "created_at"])
+    if "ix_media_user_uploaded" not in _indexes("media"):
+        op.create_index("ix_media_user_uploaded", "media", ["user_id", "uploaded_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_user_uploaded", table_name="media")
+    op.drop_index("ix_farms_owner_created", table_name="farms")
+    with op.batch_alter_table("farms") as batch:
+        batch.drop_column("longitude")
+        batch.drop_column("latitude")
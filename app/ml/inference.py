@@ -1,74 +1,143 @@
 # app/ml/inference.py
 import io
+import time
+import importlib.util
+from typing import Dict, List, Optional
 from PIL import Image, ImageOps
 import random
 
-# Try to import torch; if available we'll run a lightweight pretrained model
-try:
-    import torch
-    import torchvision.transforms as T
-    from torchvision import models
-    TORCH_AVAILABLE = True
-except Exception:
-    TORCH_AVAILABLE = False
+from app.utils.config import settings
+from app.utils.metrics import inference_batch_size, inference_latency
+
+# If torch is installed we'll run a lightweight pretrained model. It is imported
+# on first use (_import_torch), not here: importing it takes seconds.
+TORCH_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("torch", "torchvision"))
+torch = T = models = None
+transform = None  # built by _import_torch
+
+# fp32: as trained; bf16: autocast (fast only on CPUs with native bf16);
+# int8: dynamic quantization, which only covers the Linear classifier head
+PRECISIONS = ("fp32", "bf16", "int8")
+# standard: decode the full image, then resize; draft: let the JPEG decoder
+# scale down by 1/2..1/8 while decoding (no-op for other formats)
+PREPROCESS_VARIANTS = ("standard", "draft")
+RESIZE_SIZE = 256
+CROP_SIZE = 224
 
 # If you run with torch available, this will lazy-load a pretrained model on first call.
 _model = None
 _labels = None
 
+
+def _import_torch() -> bool:
+    """Import torch/torchvision once; a broken install falls back to the mock predictor."""
+    global TORCH_AVAILABLE, torch, T, models, transform
+    if torch is None and TORCH_AVAILABLE:
+        try:
+            import torch as _torch
+            import torchvision.transforms as _T
+            from torchvision import models as _models
+        except Exception:
+            TORCH_AVAILABLE = False
+            return False
+        T, models = _T, _models
+        transform = T.Compose([
+            T.Resize(RESIZE_SIZE),
+            T.CenterCrop(CROP_SIZE),
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406],
+                        std=[0.229, 0.224, 0.225]),
+        ])
+        torch = _torch  # set last: other threads treat it as "import done"
+    return TORCH_AVAILABLE
+
+
+def build_model(pretrained: bool = True, precision: str = "fp32"):
+    """mobilenet_v2 in eval mode, prepared for a precision mode."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    if not _import_torch():
+        raise RuntimeError("torch/torchvision are not available")
+    model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.DEFAULT if pretrained else None)
+    model.eval()
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
 def _load_model():
     global _model, _labels
     if _model is not None:
         return
+    if settings.INFERENCE_THREADS:
+        torch.set_num_threads(settings.INFERENCE_THREADS)
     # Using ImageNet labels as placeholders. Replace with your crop-disease labels & model.
-    _model = models.mobilenet_v2(pretrained=True)
-    _model.eval()
-    # load ImageNet labels file from torchvision (or define your own)
-    try:
-        # small helper to load labels shipped with torchvision (if available)
-        import json, pkgutil
-        data = pkgutil.get_data("torchvision", "imagenet_classes.txt")
-        if data:
-            _labels = [l.decode("utf-8").strip() for l in data.splitlines()]
-    except Exception:
-        _labels = None
-
-# NEW CORRECTED CODE
-if TORCH_AVAILABLE:
-    transform = T.Compose([
-        T.Resize(256),
-        T.CenterCrop(224),
-        T.ToTensor(),
-        T.Normalize(mean=[0.485, 0.456, 0.406],
-                    std=[0.229, 0.224, 0.225]),
-    ])
-else:
-    transform = None # or some placeholder if needed elsewhere
+    _model = build_model(pretrained=True, precision=settings.INFERENCE_PRECISION)
+    _labels = list(models.MobileNet_V2_Weights.DEFAULT.meta["categories"])
+
+
+def preprocess(image_bytes: bytes, variant: Optional[str] = None):
+    """Decoded, resized and normalized 3x224x224 tensor."""
+    variant = variant or settings.INFERENCE_PREPROCESS
+    _import_torch()
+    if variant not in PREPROCESS_VARIANTS:
+        raise ValueError(f"Unknown preprocessing {variant!r}, expected one of {PREPROCESS_VARIANTS}")
+    img = Image.open(io.BytesIO(image_bytes))
+    if variant == "draft":
+        img.draft("RGB", (RESIZE_SIZE, RESIZE_SIZE))  # never smaller than requested
+    return transform(img.convert("RGB"))
+
+
+def classify(model, batch, precision: str = "fp32", labels: Optional[List[str]] = None) -> List[Dict]:
+    """Top-1 {label, score} for each image of an Nx3x224x224 batch."""
+    with torch.inference_mode():
+        if precision == "bf16":
+            with torch.autocast("cpu", dtype=torch.bfloat16):
+                out = model(batch)
+            out = out.float()
+        else:
+            out = model(batch)
+        scores, indices = torch.nn.functional.softmax(out, dim=1).max(dim=1)
+    return [
+        {"label": labels[idx] if labels else f"imagenet_{idx}", "score": float(score)}
+        for idx, score in zip(indices.tolist(), scores.tolist())
+    ]
+
+
 def predict_image_bytes(image_bytes: bytes):
     """
     Returns a prediction dict: { label: str, score: float }
     If torch is not available, returns a mock deterministic label.
     """
-    if TORCH_AVAILABLE:
-        global _model, _labels
+    return predict_batch([image_bytes])[0]
+
+
+def predict_batch(images: List[bytes]) -> List[Dict]:
+    """One model call for several images; same results as predicting them one by one."""
+    start = time.perf_counter()
+    try:
+        return _predict(images)
+    finally:
+        backend = "torch" if TORCH_AVAILABLE else "mock"
+        inference_latency.labels(backend=backend).observe(time.perf_counter() - start)
+        inference_batch_size.labels(backend=backend).observe(len(images))
+
+
+def _predict(images: List[bytes]) -> List[Dict]:
+    if _import_torch():
         if _model is None:
             _load_model()
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_t = transform(img).unsqueeze(0)  # add batch dim
-        with torch.no_grad():
-            out = _model(img_t)
-            probs = torch.nn.functional.softmax(out[0], dim=0)
-            top1 = torch.topk(probs, k=1)
-            idx = int(top1.indices[0].item())
-            score = float(top1.values[0].item())
-            label = _labels[idx] if _labels else f"imagenet_{idx}"
-            return {"label": label, "score": score}
+        batch = torch.stack([preprocess(image_bytes) for image_bytes in images])
+        return classify(_model, batch, settings.INFERENCE_PRECISION, _labels)
+    return [_mock_prediction(image_bytes) for image_bytes in images]
+
+
+def _mock_prediction(image_bytes: bytes) -> Dict:
+    # Deterministic fallback: hash length of bytes to make repeatable deterministic "predictions".
+    h = len(image_bytes) % 3
+    if h == 0:
+        return {"label": "healthy", "score": 0.85}
+    elif h == 1:
+        return {"label": "diseased", "score": 0.73}
     else:
-        # Deterministic fallback: hash length of bytes to make repeatable deterministic "predictions".
-        h = len(image_bytes) % 3
-        if h == 0:
-            return {"label": "healthy", "score": 0.85}
-        elif h == 1:
-            return {"label": "diseased", "score": 0.73}
-        else:
-            return {"label": "nutrient_deficit", "score": 0.62}
+        return {"label": "nutrient_deficit", "score": 0.62}
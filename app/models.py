@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Float, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Float, Integer, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -30,11 +30,17 @@ class Farm(Base):
     location = Column(String, nullable=True)
     soil_type = Column(String, nullable=True)
     area = Column(Float, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="farms")
     media_files = relationship("Media", back_populates="farm")
+    insight = relationship("FarmInsight", back_populates="farm", uselist=False, cascade="all, delete-orphan")
+
+    # Backs keyset pagination of /farm/myfarms on (created_at, id)
+    __table_args__ = (Index("ix_farms_owner_created", "owner_id", "created_at"),)
 
 
 class Media(Base):
@@ -57,4 +63,21 @@ class Media(Base):
 
     # Relationships
     user = relationship("User", back_populates="media_files")
-    farm = relationship("Farm", back_populates="media_files")
\ No newline at end of file
+    farm = relationship("Farm", back_populates="media_files")
+
+    # Backs keyset pagination of /media/myfiles on (uploaded_at, id)
+    __table_args__ = (Index("ix_media_user_uploaded", "user_id", "uploaded_at"),)
+
+
+class FarmInsight(Base):
+    """Latest precomputed ProcessingService.analyze_data output for a farm."""
+    __tablename__ = "farm_insights"
+
+    farm_id = Column(Integer, ForeignKey("farms.id", ondelete="CASCADE"), primary_key=True)
+    grid_cell = Column(String, nullable=False, index=True)
+    # Fingerprint of the weather/soil readings the snapshot was computed from
+    input_hash = Column(String, nullable=False)
+    insights = Column(Text, nullable=False)  # JSON
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    farm = relationship("Farm", back_populates="insight")
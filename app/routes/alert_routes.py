@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import models
+from app.auth import principal_from_token
+from app.database import run_db
+from app.services.alert_hub import get_alert_hub
+from app.utils import grid_cell
+from app.utils.config import settings
+from app.utils.tracing import ignore_current_request
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["alerts"]
+)
+
+
+def _subscriber_cells(db: Session, token: str) -> Dict[str, List[int]]:
+    """The caller's farms with coordinates, grouped by grid cell."""
+    principal = principal_from_token(token, db)
+    cells: Dict[str, List[int]] = {}
+    farms = (
+        db.query(models.Farm.id, models.Farm.latitude, models.Farm.longitude)
+        .filter(models.Farm.owner_id == principal.id,
+                models.Farm.latitude.isnot(None), models.Farm.longitude.isnot(None))
+        .all()
+    )
+    for farm_id, lat, lon in farms:
+        cells.setdefault(grid_cell(lat, lon, settings.GRID_CELL_DEGREES), []).append(farm_id)
+    return cells
+
+
+def _token(query_token: Optional[str], authorization: Optional[str]) -> Optional[str]:
+    # Browsers can't set headers on WebSocket/EventSource, hence ?token=
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return query_token
+
+
+@router.websocket("/ws")
+async def alerts_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Alerts for the caller's farms, one JSON message per cell whose alerts
+    changed: {"farm_ids", "type": "alert", "cell", "alerts", "at"}; an
+    empty "alerts" list means the cell's alerts cleared. {"type": "ping"}
+    every ALERT_HEARTBEAT_SECONDS. Cells are fixed at connect time.
+    """
+    token = _token(token, websocket.headers.get("authorization"))
+    try:
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        # A short-lived session: the connection may stay open for hours
+        cells = await run_db(_subscriber_cells, token)
+        subscription = await get_alert_hub().subscribe(cells, "websocket")
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    except OverflowError:
+        await websocket.close(code=1013)
+        return
+
+    async def watch_close():
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass  # client messages are ignored
+        finally:
+            subscription.close()
+
+    watcher = None
+    try:
+        await websocket.accept()
+        watcher = asyncio.create_task(watch_close())
+        while not subscription.closed:
+            messages = await subscription.next(settings.ALERT_HEARTBEAT_SECONDS)
+            if subscription.closed:
+                break
+            # A client that can't take a message within the timeout is dropped
+            for message in messages or [b'{"type":"ping"}']:
+                await asyncio.wait_for(websocket.send_text(message.decode("utf-8")), settings.ALERT_SEND_TIMEOUT_SECONDS)
+    except (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError):
+        pass
+    finally:
+        client_left = subscription.closed
+        get_alert_hub().unsubscribe(subscription)
+        if watcher is not None:
+            watcher.cancel()
+        if not client_left:
+            try:
+                await websocket.close(code=1013)
+            except RuntimeError:
+                pass
+
+
+@router.get("/stream")
+async def alerts_stream(request: Request, token: Optional[str] = None):
+    """Server-sent events version of /alerts/ws: "alert" events, plus a comment line as keep-alive."""
+    ignore_current_request()  # open for as long as the client listens, not slow
+    token = _token(token, request.headers.get("authorization"))
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    cells = await run_db(_subscriber_cells, token)
+    hub = get_alert_hub()
+    if hub.full:
+        raise HTTPException(status_code=503, detail="Too many alert connections on this worker")
+
+    async def events():
+        yield b"retry: 5000\n\n"
+        # Subscribed only once the body is being sent, so a response that is
+        # never iterated (client gone before the first chunk) leaves nothing behind
+        try:
+            subscription = await hub.subscribe(cells, "sse")
+        except OverflowError:
+            return  # the last slot went to another connection meanwhile; the client retries
+        try:
+            while not subscription.closed:
+                messages = await subscription.next(settings.ALERT_HEARTBEAT_SECONDS)
+                if not messages:
+                    yield b": ping\n\n"
+                for message in messages:
+                    yield b"event: alert\ndata: " + message + b"\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from app import schemas
+from app.auth import Principal, get_current_admin, get_current_principal
+from app.services.answer_cache import AnswerContext
+from app.services.knowledge_base import get_knowledge_base
+from app.utils.config import settings
+
+router = APIRouter(
+    prefix="/knowledge",
+    tags=["knowledge"]
+)
+
+_response_service = None
+
+
+def get_response_service():
+    # Built on first use: pulls in the translation clients and opens the index
+    global _response_service
+    if _response_service is None:
+        from app.services.language_services import get_language_processor
+        from app.services.response_services import ResponseService
+        _response_service = ResponseService(get_language_processor())
+    return _response_service
+
+
+@router.get("/search", response_model=list[schemas.KnowledgeHit])
+def search_knowledge(
+    q: str = Query(..., min_length=1),
+    k: int = Query(settings.KNOWLEDGE_TOP_K, ge=1, le=50),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Top-k passages for an English query (BM25)."""
+    return get_knowledge_base().search(q, k)
+
+
+@router.post("/ask", response_model=schemas.AskResponse)
+async def ask(request: schemas.AskRequest, current_user: Principal = Depends(get_current_principal)):
+    """
+    Answer a question in any supported language: translate it to English,
+    retrieve passages and return the answer in English and the user's language.
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question is empty")
+    service = get_response_service()
+    query_en, user_lang = await service.lang_proc.aprocess_input(request.question)
+    context = AnswerContext(
+        crop=request.crop, latitude=request.latitude, longitude=request.longitude,
+        temperature=request.temperature, rainfall=request.rainfall,
+    )
+    # Off the event loop: the cache lookup may hit SQLite (shared cache), a
+    # miss adds retrieval and translating the answer back
+    answer = await run_in_threadpool(service.answer, query_en, user_lang, context)
+    return {"question_en": query_en, "language": user_lang, **answer}
+
+
+@router.post("/reindex")
+def reindex_knowledge(current_user: Principal = Depends(get_current_admin)):
+    """Index new and changed documents under KNOWLEDGE_DOCS_DIR (admin only)."""
+    kb = get_knowledge_base()
+    result = kb.index_folder(settings.KNOWLEDGE_DOCS_DIR)
+    return {**result, **kb.stats()}
+
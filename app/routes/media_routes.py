@@ -1,26 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
 import aiofiles
 from uuid import uuid4
 from datetime import datetime
-from app.database import get_db
-from app import models
-from app.auth import get_current_user
+from typing import Optional
+from app.database import get_db, run_db
+from app import crud, models, schemas
+from app.auth import Principal, get_current_principal
+from app.services.upload_sessions import UploadConflict, UploadSessions
+from app.utils import stream_json_array
+from app.utils.fast_json import FastJSONResponse
 
 router = APIRouter(
     prefix="/media",
     tags=["media"]
 )
 
-UPLOAD_DIR = "static/uploads"
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/uploads")
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".mp4", ".mov"}
 MAX_FILE_SIZE_MB = 20  # Max 20MB
 
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
+# Same filesystem as UPLOAD_DIR, so completing an upload is a rename
+upload_sessions = UploadSessions(os.path.join(UPLOAD_DIR, ".staging"), MAX_FILE_SIZE_MB * 1024 * 1024)
+
 
 # Stub AI processing function
 async def process_file_with_ai(file_path: str) -> dict:
@@ -31,7 +39,7 @@ async def process_file_with_ai(file_path: str) -> dict:
 async def upload_file(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     # Validate file extension
     file_ext = os.path.splitext(file.filename)[1].lower()
@@ -53,17 +61,22 @@ async def upload_file(
         await out_file.write(contents)
     await file.close()
 
+    return await _save_media(db, current_user.id, unique_filename, file_path, file_ext, file_size)
+
+
+async def _save_media(db: Session, user_id: int, filename: str, file_path: str, file_ext: str, file_size: float) -> dict:
+    """AI processing and the Media row for a file already in UPLOAD_DIR (size in MB)."""
     # Trigger AI processing
     ai_result = await process_file_with_ai(file_path)
 
     # Save in DB
     db_media = models.Media(
-        filename=unique_filename,
+        filename=filename,
         file_path=file_path,
         file_type=file_ext,
         size_mb=str(round(file_size, 2)),
         uploaded_at=datetime.utcnow(),
-        user_id=current_user.id,
+        user_id=user_id,
         ai_status=ai_result["status"],
         ai_result=str(ai_result)  # could use json.dumps(ai_result)
     )
@@ -80,13 +93,126 @@ async def upload_file(
     }
 
 
+# ---------------------------
+# Resumable uploads
+# ---------------------------
+# POST /media/uploads                    -> session, offset 0
+# PUT  /media/uploads/{id}?offset=N      -> one chunk (X-Chunk-SHA256 header), new offset
+# GET  /media/uploads/{id}               -> offset to resume from after a dropped connection
+# POST /media/uploads/{id}/complete      -> same response as /media/upload/
+# A 409 carries {"offset"}: the client continues from there.
+
+def _conflict(e: UploadConflict) -> JSONResponse:
+    return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.offset})
+
+
+@router.post("/uploads", response_model=schemas.UploadSessionStatus, status_code=201)
+async def create_upload(
+    body: schemas.UploadSessionCreate,
+    current_user: Principal = Depends(get_current_principal)
+):
+    file_ext = os.path.splitext(body.filename)[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    try:
+        return await run_in_threadpool(upload_sessions.create, current_user.id, file_ext, body.size, body.sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OverflowError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@router.get("/uploads/{upload_id}", response_model=schemas.UploadSessionStatus)
+async def get_upload(upload_id: str, current_user: Principal = Depends(get_current_principal)):
+    try:
+        return await run_in_threadpool(upload_sessions.status, upload_id, current_user.id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.put("/uploads/{upload_id}", response_model=schemas.UploadSessionStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256"),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Append the raw request body at `offset`. The chunk is only written once
+    it has fully arrived and matches X-Chunk-SHA256, so a connection that
+    drops mid-chunk leaves the upload where it was.
+    """
+    chunk = bytearray()
+    async for part in request.stream():
+        chunk += part
+        if len(chunk) > upload_sessions.chunk_max:
+            raise HTTPException(status_code=413, detail=f"Chunk too large. Max {upload_sessions.chunk_max} bytes.")
+    try:
+        return await run_in_threadpool(upload_sessions.append, upload_id, current_user.id, offset, bytes(chunk), chunk_sha256)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadConflict as e:
+        return _conflict(e)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    try:
+        file_ext = await run_in_threadpool(upload_sessions.extension, upload_id, current_user.id)
+        unique_filename = f"{uuid4()}{file_ext}"
+        file_path = os.path.join(UPLOAD_DIR, unique_filename)
+        size = await run_in_threadpool(upload_sessions.complete, upload_id, current_user.id, file_path)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadConflict as e:
+        return _conflict(e)
+
+    return await _save_media(db, current_user.id, unique_filename, file_path, file_ext, size / (1024 * 1024))
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str, current_user: Principal = Depends(get_current_principal)):
+    try:
+        await run_in_threadpool(upload_sessions.abort, upload_id, current_user.id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/myfiles")
-def list_my_files(
+async def list_my_files(
+    limit: int = Query(100, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    files = db.query(models.Media).filter(models.Media.user_id == current_user.id).all()
-    return files
+    """
+    Newest-first, keyset-paginated list of the user's uploads.
+    The next page's cursor is returned in the X-Next-Cursor header.
+    `ai_result` is only returned when requested through `fields`.
+    `stream=true` streams every remaining file after `cursor` and ignores `limit`.
+    """
+    try:
+        columns = crud.parse_fields(fields, crud.MEDIA_ALL_FIELDS, crud.MEDIA_LIST_FIELDS)
+        if stream:
+            rows = crud.iter_media(db, current_user.id, cursor=cursor, fields=columns)
+            return StreamingResponse(stream_json_array(rows), media_type="application/json")
+        files, next_cursor = await run_db(crud.list_media_page, current_user.id, limit=limit, cursor=cursor, fields=columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return FastJSONResponse(files, headers=headers)
 
 
 @router.get("/view/{filename}")
@@ -101,7 +227,7 @@ async def view_file(filename: str):
 def delete_file(
     media_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     media = db.query(models.Media).filter(
         models.Media.id == media_id,
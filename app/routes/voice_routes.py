@@ -0,0 +1,45 @@
+import json
+from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi.responses import StreamingResponse
+from app.auth import Principal, get_current_principal
+
+router = APIRouter(
+    prefix="/voice",
+    tags=["voice"]
+)
+
+
+def get_language_processor():
+    # Imported on first use: pulls in the speech and translation clients
+    from app.services.language_services import get_language_processor
+    return get_language_processor()
+
+
+def _sse(events):
+    for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/transcribe")
+async def transcribe_voice_note(
+    file: UploadFile = File(...),
+    language: str = "en-US",
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Server-sent events with partial transcripts (and their English
+    translation) as each spoken segment is recognized, then a final event.
+    """
+    processor = get_language_processor()
+
+    async def events():
+        # Recognition runs on the language I/O pool, not the shared request threadpool
+        try:
+            async for event in processor.astream_audio(file.file, language=language):
+                for chunk in _sse([event]):
+                    yield chunk
+        except Exception as e:
+            for chunk in _sse([{"type": "error", "detail": str(e) or type(e).__name__}]):
+                yield chunk
+
+    return StreamingResponse(events(), media_type="text/event-stream")
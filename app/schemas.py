@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 # ---------------------
@@ -58,6 +58,9 @@ class FarmCreate(BaseModel):
     location: Optional[str] = None
     soil_type: Optional[str] = None
     area: Optional[float] = None
+    # when left out, `location` is geocoded in the background (insight scheduler, bulk import)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 
 class FarmResponse(FarmCreate):
@@ -66,4 +69,76 @@ class FarmResponse(FarmCreate):
     owner_id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class FarmImportError(BaseModel):
+    row: int
+    error: str
+
+
+class FarmImportResult(BaseModel):
+    imported: int
+    failed: int
+    geocoded: int
+    errors: List[FarmImportError]
+
+class FarmInsightResponse(BaseModel):
+    farm_id: int
+    grid_cell: str
+    computed_at: datetime
+    insights: Dict[str, Any]
+
+# ---------------------
+# MEDIA SCHEMAS
+# ---------------------
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)  # bytes
+    sha256: Optional[str] = Field(None, regex=r"^[0-9a-fA-F]{64}$")  # of the whole file, checked on completion
+
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    chunk_max: int
+    expires_at: datetime
+
+# ---------------------
+# KNOWLEDGE SCHEMAS
+# ---------------------
+
+class AskRequest(BaseModel):
+    question: str
+    # optional context: narrows retrieval and keys the answer cache
+    crop: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    temperature: Optional[float] = None
+    rainfall: Optional[float] = None
+
+
+class KnowledgeHit(BaseModel):
+    title: str
+    body: str
+    source: str
+    type: str
+    score: float
+
+
+class AnswerSource(BaseModel):
+    source: str
+    type: str
+    score: float
+
+
+class AskResponse(BaseModel):
+    question_en: str
+    language: str
+    answer_en: str
+    answer_local: str
+    detailed_en: Optional[str] = None
+    detailed_local: Optional[str] = None
+    sources: List[AnswerSource]
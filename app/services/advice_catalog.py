@@ -0,0 +1,197 @@
+"""
+Precomputed, multilingual catalog of the fixed advice templates produced by
+ProcessingService. Advice is emitted as message IDs with parameters, so
+localizing it is a dictionary lookup instead of a translation API call.
+
+Build the catalog once (e.g. at image build time):
+
+    python -m app.services.advice_catalog --languages hi,te --out data/advice_catalog.bin
+"""
+import os
+import re
+import json
+import mmap
+import struct
+import logging
+import argparse
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# English source templates. IDs are stable; edit the text, never reuse an ID.
+ADVICE_MESSAGES: Dict[str, str] = {
+    "temp.unavailable": "Temperature data unavailable.",
+    "temp.cold": "Cold conditions detected. Protect sensitive crops and consider frost protection measures.",
+    "temp.hot": "High temperature alert. Ensure adequate irrigation and consider shade for sensitive plants.",
+    "temp.favorable": "Temperature is favorable for most crops.",
+    "humidity.high": "High humidity may increase disease risk.",
+    "humidity.low": "Low humidity may stress plants.",
+    "moisture.dry": "Soil moisture is critically low. Immediate irrigation recommended.",
+    "moisture.wet": "Soil moisture is excessive. Reduce irrigation and ensure proper drainage.",
+    "moisture.optimal": "Soil moisture levels are optimal.",
+    "soil_temp.low": "Soil temperature is low, which may slow seed germination.",
+    "soil_temp.high": "Soil temperature is high, monitor for heat stress.",
+    "soil.normal": "Soil conditions appear normal.",
+    "plant.no_match": "No plant identification matches found.",
+    "combined.heat_dry": (
+        "🚨 URGENT: High temperature and low soil moisture detected. "
+        "Increase irrigation immediately to prevent crop stress."
+    ),
+    "combined.cold_wet": (
+        "⚠️ WARNING: Cold and wet conditions increase disease risk. "
+        "Ensure proper drainage and consider fungicide application."
+    ),
+    "combined.rain_wet": "Recent rainfall with high soil moisture. Skip irrigation and monitor for waterlogging.",
+    "combined.plant_identified": "Plant identified as {plant_name}. Adjust care based on species-specific requirements.",
+    "combined.monitor": "Continue regular monitoring and maintenance schedules.",
+    "response.no_answer": "I'm sorry — I couldn't find a clear answer. Try rephrasing or ask about something else.",
+}
+
+_MAGIC = b"AFCAT1\n"
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def advice_message(msg_id: str, **params: Any) -> Dict[str, Any]:
+    """A localizable message: template ID plus its parameters."""
+    if msg_id not in ADVICE_MESSAGES:
+        raise KeyError(f"Unknown advice message: {msg_id}")
+    return {"id": msg_id, "params": params}
+
+
+def render_en(message: Dict[str, Any]) -> str:
+    return ADVICE_MESSAGES[message["id"]].format_map(message.get("params") or {})
+
+
+def render_all_en(messages: Iterable[Dict[str, Any]]) -> str:
+    return " ".join(render_en(m) for m in messages)
+
+
+class AdviceCatalog:
+    """
+    Read-only view over a catalog file. The file is memory-mapped: only the
+    small index is parsed, template text is sliced out of the map on lookup.
+
+    Layout: magic | u32 index length | JSON index | UTF-8 blob, where the index
+    maps language -> message ID -> [offset, length] into the blob.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._mmap = None
+        self._blob_start = 0
+        self._index: Dict[str, Dict[str, List[int]]] = {}
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"Not an advice catalog: {path}")
+        (index_len,) = struct.unpack_from("<I", self._mmap, len(_MAGIC))
+        index_start = len(_MAGIC) + 4
+        self._index = json.loads(self._mmap[index_start:index_start + index_len].decode("utf-8"))
+        self._blob_start = index_start + index_len
+
+    @property
+    def languages(self) -> List[str]:
+        return ["en"] + [lang for lang in self._index if lang != "en"]
+
+    def template(self, msg_id: str, lang: str) -> Optional[str]:
+        if lang == "en":
+            return ADVICE_MESSAGES.get(msg_id)
+        entry = self._index.get(lang, {}).get(msg_id)
+        if entry is None or self._mmap is None:
+            return None
+        offset, length = entry
+        start = self._blob_start + offset
+        return self._mmap[start:start + length].decode("utf-8")
+
+    def localize(self, message: Dict[str, Any], lang: str) -> Optional[str]:
+        """Localized text for a message, or None when the catalog lacks it."""
+        template = self.template(message["id"], lang)
+        if template is None:
+            return None
+        return template.format_map(message.get("params") or {})
+
+    # ---------------------------
+    # Build step
+    # ---------------------------
+    @staticmethod
+    def build(translate, languages: Iterable[str], path: str) -> Dict[str, int]:
+        """
+        Translate every template into each language and write the catalog.
+
+        Args:
+            translate: callable(text, source, target) -> str, e.g. TranslatorBackend.translate
+            languages: target language codes
+            path: output file
+
+        Returns:
+            Number of templates stored per language. Templates whose
+            placeholders don't survive translation are left out (they fall
+            back to runtime translation).
+        """
+        blob = bytearray()
+        index: Dict[str, Dict[str, List[int]]] = {}
+        counts: Dict[str, int] = {}
+        for lang in languages:
+            if lang == "en":
+                continue
+            index[lang] = {}
+            for msg_id, template in ADVICE_MESSAGES.items():
+                names = _PLACEHOLDER.findall(template)
+                # Shield placeholders from the translator as opaque tokens
+                protected = _PLACEHOLDER.sub(lambda m: f"__{names.index(m.group(1))}__", template)
+                try:
+                    translated = translate(protected, "en", lang)
+                except Exception as e:
+                    logger.warning(f"Translating {msg_id} to {lang} failed: {e}")
+                    continue
+                if not translated or any(f"__{i}__" not in translated for i in range(len(names))):
+                    logger.warning(f"Skipping {msg_id} for {lang}: placeholders lost in translation")
+                    continue
+                for i, name in enumerate(names):
+                    translated = translated.replace(f"__{i}__", "{" + name + "}")
+                data = translated.encode("utf-8")
+                index[lang][msg_id] = [len(blob), len(data)]
+                blob.extend(data)
+            counts[lang] = len(index[lang])
+
+        index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(index_bytes)))
+            f.write(index_bytes)
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return counts
+
+
+_catalog: Optional[AdviceCatalog] = None
+
+
+def get_advice_catalog() -> AdviceCatalog:
+    """Process-wide catalog loaded from settings.ADVICE_CATALOG_PATH (English-only if absent)."""
+    global _catalog
+    if _catalog is None:
+        _catalog = AdviceCatalog(settings.ADVICE_CATALOG_PATH)
+    return _catalog
+
+
+if __name__ == "__main__":
+    from app.services.language_services import GoogleTranslatorBackend
+
+    parser = argparse.ArgumentParser(description="Pre-translate the advice catalog")
+    parser.add_argument("--languages", default=settings.ADVICE_LANGUAGES)
+    parser.add_argument("--out", default=settings.ADVICE_CATALOG_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    langs = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    stored = AdviceCatalog.build(GoogleTranslatorBackend().translate, langs, args.out)
+    for lang, n in stored.items():
+        print(f"{lang}: {n}/{len(ADVICE_MESSAGES)} templates")
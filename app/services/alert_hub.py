@@ -0,0 +1,272 @@
+"""
+Push of urgent per-cell alerts (heat + dry soil, cold + wet soil, rain on
+wet soil) to connected farmers, over WebSocket or SSE (app/routes/alert_routes.py).
+
+The insight scheduler analyzes each grid cell once per refresh and calls
+publish(cell, alerts). A cell's alert set is only published when it
+changes (including back to no alerts). It is stored in the shared cache
+under the "alerts" namespace. Every worker's poller (run()) picks it up
+from the invalidation log and hands the same pre-serialized payload to
+each local subscription of that cell.
+
+A subscription holds at most ALERT_QUEUE_SIZE undelivered cells. A newer
+alert for a cell replaces the undelivered one (coalescing), and when the
+queue is full the oldest cell is dropped. Slow consumers therefore lose
+intermediate states, never the latest one, and memory stays bounded.
+Idle connections cost one Event and a few small objects each.
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.services.advice_catalog import render_en
+from app.utils.config import settings
+from app.utils.fast_json import dumps
+from app.utils.metrics import metrics
+from app.utils.shared_cache import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+# Combined recommendations urgent enough to push
+ALERT_MESSAGE_IDS = ("combined.heat_dry", "combined.cold_wet", "combined.rain_wet")
+NAMESPACE = "alerts"
+
+alert_connections = metrics.gauge("alert_connections", "Open alert subscriptions", ("transport",))
+alert_messages = metrics.counter(
+    "alert_messages_total", "Alert messages per outcome (queued, coalesced, dropped)", ("outcome",))
+# Resolved once: offer() runs once per subscriber on every fan-out
+_queued = alert_messages.labels(outcome="queued")
+_coalesced = alert_messages.labels(outcome="coalesced")
+_dropped = alert_messages.labels(outcome="dropped")
+
+
+def cell_alerts(insights: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The urgent messages of an analyze_data() result, with their English text."""
+    return [
+        {**message, "text": render_en(message)}
+        for message in insights.get("combined_recommendation_messages") or []
+        if message["id"] in ALERT_MESSAGE_IDS
+    ]
+
+
+def _fingerprint(alerts: List[Dict[str, Any]]) -> str:
+    return hashlib.sha1(dumps([[a["id"], a.get("params")] for a in alerts])).hexdigest()
+
+
+class Subscription:
+    """One connection's cells and its queue of undelivered alert payloads (event loop thread only)."""
+
+    def __init__(self, cells: Dict[str, List[int]], transport: str, max_pending: int):
+        self.cells = cells  # grid cell -> the subscriber's farm ids in it
+        self.transport = transport
+        self.max_pending = max_pending
+        self.closed = False
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending: "OrderedDict[str, bytes]" = OrderedDict()
+        self._event = asyncio.Event()
+
+    def offer(self, cell: str, payload: bytes):
+        if cell in self._pending:
+            self.coalesced += 1
+            _coalesced.inc()
+        elif len(self._pending) >= self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+            _dropped.inc()
+        self._pending[cell] = payload
+        _queued.inc()
+        self._event.set()
+
+    async def next(self, timeout: float) -> List[bytes]:
+        """
+        Messages ready to send, each the cell's payload plus this
+        subscriber's farm ids; empty after `timeout` seconds of silence.
+        """
+        if not self._pending and not self.closed:
+            # A timer handle rather than wait_for(), which costs a task per wait
+            timer = asyncio.get_running_loop().call_later(timeout, self._event.set)
+            try:
+                await self._event.wait()
+            finally:
+                timer.cancel()
+        self._event.clear()
+        pending, self._pending = self._pending, OrderedDict()
+        return [b'{"farm_ids":' + dumps(self.cells[cell]) + b"," + payload[1:] for cell, payload in pending.items()]
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+
+class AlertHub:
+    def __init__(self, queue_size: int = settings.ALERT_QUEUE_SIZE,
+                 max_connections: int = settings.ALERT_MAX_CONNECTIONS,
+                 ttl_seconds: int = settings.ALERT_TTL_SECONDS):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.ttl_seconds = ttl_seconds
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._connections = 0
+        # Latest payload per cell with active alerts, for new subscribers
+        self._current: Dict[str, bytes] = {}
+        # Fingerprint of the last alert set published per cell (publisher side)
+        self._published: Dict[str, str] = {}
+        self._publish_lock = threading.Lock()
+        self._own: Set[int] = set()
+        self._seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+
+    # ---------------------------
+    # Publishing (any thread)
+    # ---------------------------
+    def publish(self, cell: str, alerts: List[Dict[str, Any]]) -> bool:
+        """Announce a cell's current alerts; False when unchanged since the last publish."""
+        fingerprint = _fingerprint(alerts)
+        store = get_shared_store()
+        with self._publish_lock:
+            previous = self._published.get(cell)
+            if previous is None and store is not None:
+                # Maybe published before a restart, or by another worker
+                try:
+                    found = store.get(NAMESPACE, cell)
+                    previous = found[0]["fingerprint"] if found else None
+                except sqlite3.Error as e:
+                    logger.warning(f"Reading alert state for cell {cell} failed: {e}")
+            if fingerprint == previous or (previous is None and not alerts):
+                self._published[cell] = fingerprint
+                return False
+            self._published[cell] = fingerprint
+        state = {"fingerprint": fingerprint, "cell": cell, "alerts": alerts,
+                 "at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        if store is not None:
+            try:
+                self._own.add(store.set(NAMESPACE, cell, state, self.ttl_seconds))
+            except sqlite3.Error as e:
+                logger.warning(f"Storing alerts for cell {cell} failed: {e}")
+        self.published += 1
+        payload = self._payload(state)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, cell, payload, bool(alerts))
+        else:
+            self._deliver(cell, payload, bool(alerts))  # nobody connected yet: just keep the state
+        return True
+
+    @staticmethod
+    def _payload(state: Dict[str, Any]) -> bytes:
+        return dumps({"type": "alert", "cell": state["cell"], "alerts": state["alerts"], "at": state["at"]})
+
+    # ---------------------------
+    # Fan-out (event loop thread)
+    # ---------------------------
+    def _deliver(self, cell: str, payload: bytes, active: bool):
+        if active:
+            self._current[cell] = payload
+        else:
+            self._current.pop(cell, None)
+        for subscription in self._subscribers.get(cell, ()):
+            subscription.offer(cell, payload)
+
+    @property
+    def full(self) -> bool:
+        """Whether subscribe() would refuse a connection right now."""
+        return self._connections >= self.max_connections
+
+    async def subscribe(self, cells: Dict[str, List[int]], transport: str) -> Subscription:
+        """Register a connection; alerts already active in its cells are queued right away."""
+        if self.full:
+            raise OverflowError("Too many alert connections on this worker")
+        self._loop = self._loop or asyncio.get_running_loop()
+        unknown = [cell for cell in cells if cell not in self._current]
+        store = get_shared_store()
+        if unknown and store is not None:
+            # Cells that became active before anyone on this worker listened to them
+            for state in await asyncio.to_thread(self._load_states, store, unknown):
+                if state["alerts"] and state["cell"] not in self._current:
+                    self._current[state["cell"]] = self._payload(state)
+        # No awaits from here on: a cancelled connect can't leave a registration behind
+        subscription = Subscription(cells, transport, self.queue_size)
+        self._connections += 1
+        alert_connections.labels(transport=transport).inc()
+        for cell in cells:
+            self._subscribers.setdefault(cell, set()).add(subscription)
+        for cell in cells:
+            if cell in self._current:
+                subscription.offer(cell, self._current[cell])
+        return subscription
+
+    @staticmethod
+    def _load_states(store, cells: Iterable[str]) -> List[Dict[str, Any]]:
+        states = []
+        for cell in cells:
+            try:
+                found = store.get(NAMESPACE, cell)
+            except sqlite3.Error:
+                continue
+            if found:
+                states.append(found[0])
+        return states
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.close()
+        self._connections -= 1
+        alert_connections.labels(transport=subscription.transport).inc(-1)
+        for cell in subscription.cells:
+            subscribers = self._subscribers.get(cell)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[cell]
+
+    async def run(self, poll_seconds: float = settings.SHARED_CACHE_POLL_SECONDS):
+        """Deliver alerts published by other workers; runs for the life of the worker."""
+        self._loop = asyncio.get_running_loop()
+        store = get_shared_store()
+        if store is None:
+            return  # single process: publish() delivers directly
+        self._seq = await asyncio.to_thread(store.last_seq)
+        while True:
+            await asyncio.sleep(poll_seconds)
+            try:
+                changes = await asyncio.to_thread(store.invalidations_since, self._seq)
+                cells = []
+                for seq, namespace, key in changes:
+                    self._seq = seq
+                    if seq in self._own:
+                        self._own.discard(seq)
+                    elif namespace == NAMESPACE and key is not None:
+                        cells.append(key)
+                # Only cells someone here listens to (or that we show to new subscribers) matter
+                cells = [cell for cell in dict.fromkeys(cells) if cell in self._subscribers or cell in self._current]
+                if cells:
+                    for state in await asyncio.to_thread(self._load_states, store, cells):
+                        self._deliver(state["cell"], self._payload(state), bool(state["alerts"]))
+            except sqlite3.Error as e:
+                logger.warning(f"Alert poll failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "connections": self._connections,
+            "subscribed_cells": len(self._subscribers),
+            "active_cells": len(self._current),
+            "published": self.published,
+        }
+
+
+_hub: Optional[AlertHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_alert_hub() -> AlertHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = AlertHub()
+    return _hub
@@ -0,0 +1,106 @@
+"""
+Cache of assembled answers for repeated questions. Keys combine the query's
+ranking terms, the user's language, a coarse context (crop, grid cell,
+weather bucket) and the knowledge base version, so a hit returns the
+localized answer without retrieval or translation.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.services.knowledge_base import tokenize
+from app.services.processing_service import TemperatureRange
+from app.utils import grid_cell
+from app.utils.config import settings
+from app.utils.shared_cache import make_cache
+
+
+@dataclass
+class AnswerContext:
+    """Coarse context of a question; every field is optional."""
+    crop: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    temperature: Optional[float] = None
+    rainfall: Optional[float] = None
+
+    def key(self) -> str:
+        crop = (self.crop or "").strip().lower()
+        cell = ""
+        if self.latitude is not None and self.longitude is not None:
+            cell = grid_cell(self.latitude, self.longitude, settings.GRID_CELL_DEGREES)
+        weather = ""
+        if self.temperature is not None:
+            if self.temperature < TemperatureRange.COLD_THRESHOLD.value:
+                weather = "cold"
+            elif self.temperature > TemperatureRange.HOT_THRESHOLD.value:
+                weather = "hot"
+            else:
+                weather = "mild"
+        if self.rainfall:
+            weather += "+rain"
+        return f"{crop}|{cell}|{weather}"
+
+
+class AnswerCache:
+    """
+    Bounded LRU of answers with a TTL. Queries are normalized to the sorted
+    set of their BM25 terms, which is exactly what the ranker sees, so
+    "When should I water my tomatoes?" and "when to water tomatoes" share
+    an entry.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        # Shared by the workers on a host when SHARED_CACHE_PATH is set
+        self._cache = make_cache("answers", ttl_seconds, max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query_en: str) -> str:
+        return " ".join(sorted(set(tokenize(query_en))))
+
+    def make_key(self, query_en: str, user_lang: str, context: Optional[AnswerContext] = None,
+                 version: int = 0) -> Optional[str]:
+        """Cache key, or None for queries with no searchable terms."""
+        terms = self.normalize_query(query_en)
+        if not terms:
+            return None
+        context_key = context.key() if context is not None else "||"
+        return f"{version}|{user_lang}|{context_key}|{terms}"
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Optional[str], answer: Dict[str, Any]):
+        if key is not None:
+            self._cache.set(key, answer)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache sized by settings.ANSWER_CACHE_SIZE."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL_SECONDS)
+    return _answer_cache
@@ -1,9 +1,13 @@
 import os
+import time
 import requests
 import logging
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from app.utils.config import settings
+from app.utils.metrics import upstream_latency
+
 # Load API keys from .env file
 load_dotenv()
 
@@ -14,6 +18,21 @@ PLANT_ID_API_KEY = os.getenv("PLANT_ID_API_KEY")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _request(provider: str, method: str, url: str, **kwargs) -> requests.Response:
+    """requests call timed into upstream_request_duration_seconds by provider and status."""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        resp = requests.request(method, url, **kwargs)
+        status = resp.status_code
+        return resp
+    except requests.Timeout:
+        status = "timeout"
+        raise
+    finally:
+        upstream_latency.labels(provider=provider, status=status).observe(time.perf_counter() - start)
+
+
 class APIFetcher:
     def __init__(self):
         if not OPENWEATHER_API_KEY:
@@ -29,8 +48,8 @@ class APIFetcher:
     def get_coordinates(self, location: str) -> Optional[Dict[str, float]]:
         """Convert location name into latitude & longitude using OpenWeather Geocoding API"""
         try:
-            url = f"http://api.openweathermap.org/geo/1.0/direct?q={location}&limit=1&appid={OPENWEATHER_API_KEY}"
-            resp = requests.get(url, timeout=10)
+            url = f"{settings.OPENWEATHER_BASE_URL}/geo/1.0/direct?q={location}&limit=1&appid={OPENWEATHER_API_KEY}"
+            resp = _request("openweather_geocoding", "GET", url, timeout=10)
             resp.raise_for_status()
             data = resp.json()
 
@@ -46,8 +65,8 @@ class APIFetcher:
     def get_weather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
         """Fetch current weather for given coordinates"""
         try:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-            resp = requests.get(url, timeout=10)
+            url = f"{settings.OPENWEATHER_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+            resp = _request("openweather", "GET", url, timeout=10)
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
@@ -65,8 +84,8 @@ class APIFetcher:
 
         try:
             # Example: soil data endpoint
-            url = f"http://api.agromonitoring.com/agro/1.0/soil?lat={lat}&lon={lon}&appid={AGRO_API_KEY}"
-            resp = requests.get(url, timeout=10)
+            url = f"{settings.AGRO_BASE_URL}/agro/1.0/soil?lat={lat}&lon={lon}&appid={AGRO_API_KEY}"
+            resp = _request("agromonitoring", "GET", url, timeout=10)
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
@@ -83,7 +102,7 @@ class APIFetcher:
             return None
 
         try:
-            url = "https://api.plant.id/v2/identify"
+            url = f"{settings.PLANT_ID_BASE_URL}/v2/identify"
             headers = {"Api-Key": PLANT_ID_API_KEY}
             
             files = [("images", open(image_path, "rb"))]
@@ -91,7 +110,7 @@ class APIFetcher:
                 "organs": ["leaf", "flower", "fruit"],
             }
 
-            resp = requests.post(url, headers=headers, files=files, data=data, timeout=20)
+            resp = _request("plant_id", "POST", url, headers=headers, files=files, data=data, timeout=20)
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
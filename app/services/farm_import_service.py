@@ -0,0 +1,169 @@
+import io
+import csv
+import json
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+FARM_COLUMNS = ("farm_name", "location", "soil_type", "area", "latitude", "longitude", "created_at", "owner_id")
+
+
+class FarmImportService:
+    """
+    Bulk farm onboarding: parses CSV/NDJSON as a stream, validates each row
+    with schemas.FarmCreate, geocodes each distinct location once and writes
+    rows in chunks (Postgres COPY when available, multi-row INSERT otherwise).
+    """
+
+    def __init__(self,
+                 geocoder: Optional[Callable[[str], Optional[Dict[str, float]]]] = None,
+                 chunk_size: int = 1000,
+                 max_reported_errors: int = 1000):
+        """
+        Args:
+            geocoder: location -> {"lat", "lon"} (e.g. APIFetcher.get_coordinates); None skips geocoding
+            chunk_size: rows written per INSERT/COPY batch
+            max_reported_errors: cap on per-row errors kept in the result
+        """
+        self.geocoder = geocoder
+        self.chunk_size = chunk_size
+        self.max_reported_errors = max_reported_errors
+        self._coords: Dict[str, Optional[Dict[str, float]]] = {}
+
+    # ---------------------------
+    # Parsing
+    # ---------------------------
+    @staticmethod
+    def parse(stream: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, Any]]:
+        """Yield (row_number, raw_record) without reading the whole upload into memory."""
+        if fmt == "csv":
+            for row_number, record in enumerate(csv.DictReader(stream), start=1):
+                yield row_number, {k: (v if v != "" else None) for k, v in record.items() if k}
+        elif fmt == "ndjson":
+            for row_number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield row_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield row_number, e
+        else:
+            raise ValueError(f"Unsupported format '{fmt}', expected one of {IMPORT_FORMATS}")
+
+    # ---------------------------
+    # Import
+    # ---------------------------
+    def import_farms(self, db: Session, owner_id: int, records: Iterable[Tuple[int, Any]]) -> Dict[str, Any]:
+        result = {"imported": 0, "failed": 0, "geocoded": 0, "errors": []}
+        chunk: List[Dict[str, Any]] = []
+
+        for row_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f"Invalid JSON: {record}")
+                if not isinstance(record, dict):
+                    raise ValueError("Row must be an object")
+                farm = schemas.FarmCreate(**record)
+            except (ValidationError, ValueError, TypeError) as e:
+                self._record_error(result, row_number, e)
+                continue
+
+            chunk.append({**farm.dict(), "owner_id": owner_id})
+            if len(chunk) >= self.chunk_size:
+                self._flush(db, chunk, result)
+                chunk = []
+
+        if chunk:
+            self._flush(db, chunk, result)
+        db.commit()
+        return result
+
+    def _record_error(self, result: Dict[str, Any], row_number: int, error: Exception):
+        result["failed"] += 1
+        if len(result["errors"]) < self.max_reported_errors:
+            message = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors()
+            ) if isinstance(error, ValidationError) else str(error)
+            result["errors"].append({"row": row_number, "error": message})
+
+    def _flush(self, db: Session, chunk: List[Dict[str, Any]], result: Dict[str, Any]):
+        self._geocode(chunk, result)
+        now = datetime.utcnow()
+        rows = []
+        for farm in chunk:
+            if farm["latitude"] is None or farm["longitude"] is None:
+                coords = self._coords.get(farm["location"]) if farm["location"] else None
+                farm["latitude"], farm["longitude"] = (coords["lat"], coords["lon"]) if coords else (None, None)
+            rows.append({**farm, "created_at": now})
+
+        if db.bind.dialect.name == "postgresql":
+            self._copy(db, rows)
+        else:
+            db.execute(insert(models.Farm).values(rows))
+        result["imported"] += len(rows)
+
+    def _copy(self, db: Session, rows: List[Dict[str, Any]]):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            # \N is COPY's NULL marker; empty strings stay distinguishable from NULL
+            writer.writerow(["\\N" if row[c] is None else row[c] for c in FARM_COLUMNS])
+        buf.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {models.Farm.__tablename__} ({', '.join(FARM_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buf,
+            )
+        finally:
+            cursor.close()
+
+    def _geocode(self, chunk: List[Dict[str, Any]], result: Dict[str, Any]):
+        """Resolve every location not seen yet in this import, once each, concurrently."""
+        if not self.geocoder:
+            return
+        pending = {
+            f["location"] for f in chunk if f["location"] and (f["latitude"] is None or f["longitude"] is None)
+        } - self._coords.keys()
+        if not pending:
+            return
+        with ThreadPoolExecutor(max_workers=settings.API_CONCURRENCY_LIMIT) as pool:
+            for location, coords in zip(pending, pool.map(self.geocoder, pending)):
+                self._coords[location] = coords
+                if coords:
+                    result["geocoded"] += 1
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def export_farms(db: Session, owner_id: int, fmt: str) -> Iterator[str]:
+    """Stream every farm of `owner_id` as CSV or NDJSON."""
+    rows = crud.iter_farms(db, owner_id, fields=crud.FARM_LIST_FIELDS)
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(row, default=str) + "\n"
+    elif fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=crud.FARM_LIST_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {IMPORT_FORMATS}")
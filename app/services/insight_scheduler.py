@@ -0,0 +1,331 @@
+"""
+Background precompute of ProcessingService.analyze_data for every farm.
+
+Farms are grouped by grid cell, so weather and soil are fetched once per
+cell rather than once per farm. A snapshot is only rewritten when the
+fingerprint of its cell's readings changes. Upstream requests are spread
+over a window with random offsets. Every worker on a host may run the
+scheduler: an flock on INSIGHT_LOCK_PATH lets one pass run at a time, and a
+worker skips its turn when another finished a pass within the interval.
+Cells can be sharded across hosts (INSIGHT_WORKER_COUNT / INSIGHT_WORKER_INDEX).
+"""
+import os
+import json
+import time
+import fcntl
+import zlib
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app import models
+from app.database import SessionLocal
+from app.services.api_fetcher import APIFetcher
+from app.services.alert_hub import AlertHub, cell_alerts, get_alert_hub
+from app.services.processing_service import ProcessingService
+from app.services.spatial_index import get_spatial_index
+from app.services.timeseries_store import TimeSeriesStore, get_timeseries_store
+from app.utils import grid_cell, grid_cell_center
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value: Any, step: float) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return round(float(value) / step) * step
+    except (TypeError, ValueError):
+        return None
+
+
+def readings_fingerprint(weather: Optional[Dict[str, Any]], soil: Optional[Dict[str, Any]]) -> str:
+    """
+    Hash of the readings analyze_data depends on, rounded so sensor noise
+    (a tenth of a degree, a percent of humidity) doesn't force a recompute.
+    """
+    weather = weather or {}
+    soil = soil or {}
+    main = weather.get("main") or {}
+    conditions = weather.get("weather") or [{}]
+    parts = [
+        _bucket(main.get("temp"), 1.0),
+        _bucket(main.get("humidity"), 5.0),
+        conditions[0].get("description") if conditions else None,
+        _bucket((weather.get("rain") or {}).get("1h", 0), 0.5),
+        _bucket(soil.get("moisture"), 0.01),
+        _bucket(soil.get("t0"), 1.0),
+        _bucket(soil.get("t10"), 1.0),
+    ]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class InsightScheduler:
+    """
+    Keeps the farm_insights table fresh. Use refresh_once() for a single
+    pass (e.g. from a cron job) or start()/stop() for a daemon thread that
+    runs every interval_seconds, +/- jitter.
+    """
+
+    def __init__(self,
+                 fetcher: Optional[APIFetcher] = None,
+                 processing: Optional[ProcessingService] = None,
+                 timeseries: Optional[TimeSeriesStore] = None,
+                 session_factory: Callable = SessionLocal,
+                 alerts: Optional[AlertHub] = None,
+                 interval_seconds: int = settings.INSIGHT_REFRESH_SECONDS,
+                 jitter: float = settings.INSIGHT_REFRESH_JITTER,
+                 spread_seconds: float = settings.INSIGHT_REFRESH_SPREAD_SECONDS,
+                 worker_index: int = settings.INSIGHT_WORKER_INDEX,
+                 worker_count: int = settings.INSIGHT_WORKER_COUNT,
+                 lock_path: str = settings.INSIGHT_LOCK_PATH):
+        self.fetcher = fetcher or APIFetcher()
+        self.processing = processing or ProcessingService()
+        self.timeseries = timeseries or get_timeseries_store()
+        self.session_factory = session_factory
+        self.alerts = alerts or get_alert_hub()
+        self.interval_seconds = interval_seconds
+        self.jitter = jitter
+        self.spread_seconds = spread_seconds
+        self.worker_index = worker_index
+        self.worker_count = max(1, worker_count)
+        # One lock file per shard, so shards placed on the same host don't exclude each other
+        if lock_path and self.worker_count > 1:
+            lock_path = f"{lock_path}.{self.worker_index}-of-{self.worker_count}"
+        self.lock_path = lock_path
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pass_lock = threading.Lock()
+
+    def owns(self, cell: str) -> bool:
+        """Whether this shard refreshes a cell (stable across restarts)."""
+        return zlib.crc32(cell.encode("utf-8")) % self.worker_count == self.worker_index
+
+    # ---------------------------
+    # One refresh pass
+    # ---------------------------
+    def _geocode_missing(self, db) -> int:
+        """Give coordinates to a batch of farms that only have a location name."""
+        farms = (
+            db.query(models.Farm)
+            .filter(models.Farm.latitude.is_(None), models.Farm.location.isnot(None), models.Farm.location != "")
+            .order_by(models.Farm.id)
+            .limit(settings.INSIGHT_GEOCODE_BATCH)
+            .all()
+        )
+        located = []
+        for farm in farms:
+            coords = self.fetcher.get_coordinates(farm.location)
+            if coords:
+                farm.latitude, farm.longitude = coords["lat"], coords["lon"]
+                located.append((farm.id, farm.latitude, farm.longitude))
+        if located:
+            db.commit()
+            index = get_spatial_index()
+            for farm_id, lat, lon in located:
+                index.farm_changed(farm_id, lat, lon)
+        return len(located)
+
+    def _fetch_cell(self, cell: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        lat, lon = grid_cell_center(cell, settings.GRID_CELL_DEGREES)
+        weather, soil = self.fetcher.get_weather(lat, lon), self.fetcher.get_agro_data(lat, lon)
+        # Keep the readings as history instead of discarding them after analysis
+        try:
+            self.timeseries.record_weather(cell, weather)
+            self.timeseries.record_soil(cell, soil)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Recording history for cell {cell} failed: {e}")
+        return weather, soil
+
+    def _fetch_spread(self, cells: List[str], spread_seconds: float) -> Dict[str, Tuple[Optional[Dict], Optional[Dict]]]:
+        """Fetch every cell, starting each request at a random offset within spread_seconds."""
+        offsets = sorted((random.uniform(0, spread_seconds), cell) for cell in cells)
+        results = {}
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=settings.API_CONCURRENCY_LIMIT, thread_name_prefix="insights") as pool:
+            futures = {}
+            for offset, cell in offsets:
+                if self._stop.wait(max(0.0, start + offset - time.monotonic())):
+                    break
+                futures[cell] = pool.submit(self._fetch_cell, cell)
+            for cell, future in futures.items():
+                try:
+                    results[cell] = future.result()
+                except Exception as e:
+                    logger.warning(f"Fetching readings for cell {cell} failed: {e}")
+        return results
+
+    @contextmanager
+    def _host_lock(self) -> Iterator[Optional[IO]]:
+        """
+        The shard's lock file, exclusively locked for the pass; RuntimeError
+        if a worker holds it. Yields None when no lock path is configured.
+        """
+        if not self.lock_path:
+            yield None
+            return
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a+", encoding="utf-8") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError("An insight refresh pass is already running in another worker")
+            try:
+                yield f
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _last_finished(lock: IO) -> float:
+        """When the last pass on this host finished, as stored in the lock file (0 if never)."""
+        lock.seek(0)
+        try:
+            return float(lock.read().strip() or 0)
+        except ValueError:
+            return 0.0
+
+    def refresh_once(self, min_interval: float = 0.0, spread_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Recompute snapshots whose cell readings changed (or that don't exist yet).
+        Returns counts for the pass. One pass at a time per shard on this host
+        (RuntimeError otherwise): overlapping passes would fetch every cell
+        twice and maintain the same time series concurrently. With
+        min_interval, a pass that another worker finished less than that many
+        seconds ago also counts as busy. spread_seconds overrides the window
+        upstream requests are spread over (0 for a pass someone is waiting on).
+        """
+        if not self._pass_lock.acquire(blocking=False):
+            raise RuntimeError("An insight refresh pass is already running")
+        try:
+            with self._host_lock() as lock:
+                if lock is not None and min_interval > 0:
+                    age = time.time() - self._last_finished(lock)
+                    if age < min_interval:
+                        raise RuntimeError(f"Another worker refreshed insights {age:.0f}s ago")
+                result = self._refresh(self.spread_seconds if spread_seconds is None else spread_seconds)
+                if lock is not None:
+                    lock.seek(0)
+                    lock.truncate()
+                    lock.write(f"{time.time()}\n")
+                    lock.flush()
+                return result
+        finally:
+            self._pass_lock.release()
+
+    def _refresh(self, spread_seconds: float) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self.session_factory() as db:
+            geocoded = self._geocode_missing(db)
+            farms = (
+                db.query(models.Farm.id, models.Farm.latitude, models.Farm.longitude)
+                .filter(models.Farm.latitude.isnot(None), models.Farm.longitude.isnot(None))
+                .all()
+            )
+            hashes = dict(db.query(models.FarmInsight.farm_id, models.FarmInsight.input_hash).all())
+
+        cells: Dict[str, List[int]] = {}
+        for farm_id, lat, lon in farms:
+            cell = grid_cell(lat, lon, settings.GRID_CELL_DEGREES)
+            if self.owns(cell):
+                cells.setdefault(cell, []).append(farm_id)
+
+        readings = self._fetch_spread(list(cells), spread_seconds)
+        updated = unchanged = failed = alerted = 0
+        with self.session_factory() as db:
+            for cell, (weather, soil) in readings.items():
+                farm_ids = cells[cell]
+                if not weather and not soil:
+                    failed += len(farm_ids)
+                    continue
+                fingerprint = readings_fingerprint(weather, soil)
+                stale = [farm_id for farm_id in farm_ids if hashes.get(farm_id) != fingerprint]
+                unchanged += len(farm_ids) - len(stale)
+                if not stale:
+                    continue
+                # Farms in a cell share readings, so one analysis serves them all
+                analysis = self.processing.analyze_data(weather_data=weather, agro_data=soil)
+                if self.alerts.publish(cell, cell_alerts(analysis)):
+                    alerted += 1
+                insights = json.dumps(analysis)
+                now = datetime.utcnow()
+                for farm_id in stale:
+                    db.merge(models.FarmInsight(
+                        farm_id=farm_id, grid_cell=cell, input_hash=fingerprint,
+                        insights=insights, computed_at=now,
+                    ))
+                try:
+                    db.commit()
+                    updated += len(stale)
+                except Exception as e:
+                    # e.g. a farm deleted since the pass started
+                    db.rollback()
+                    failed += len(stale)
+                    logger.warning(f"Storing insights for cell {cell} failed: {e}")
+            failed += sum(len(cells[cell]) for cell in cells if cell not in readings)
+
+        history = self.timeseries.maintain(list(cells))
+
+        self.last_run = {
+            "cells": len(cells),
+            "farms": sum(len(ids) for ids in cells.values()),
+            "updated": updated,
+            "unchanged": unchanged,
+            "failed": failed,
+            "geocoded": geocoded,
+            "alerted_cells": alerted,
+            "history": history,
+            "seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        logger.info(f"Insight refresh: {self.last_run}")
+        return self.last_run
+
+    # ---------------------------
+    # Background thread
+    # ---------------------------
+    def _next_delay(self) -> float:
+        return self.interval_seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        # Stagger the first pass so restarted workers don't hit upstream together
+        if self._stop.wait(random.uniform(0, self.interval_seconds * self.jitter)):
+            return
+        while not self._stop.is_set():
+            try:
+                # Workers share the schedule: whoever wakes first runs, the rest skip this round
+                self.refresh_once(min_interval=self.interval_seconds * (1 - self.jitter))
+            except RuntimeError as e:
+                logger.info(f"Skipping scheduled insight refresh: {e}")
+            except Exception as e:
+                logger.error(f"Insight refresh failed: {e}", exc_info=True)
+            self._stop.wait(self._next_delay())
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="insight-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_scheduler: Optional[InsightScheduler] = None
+
+
+def get_insight_scheduler() -> InsightScheduler:
+    """Process-wide scheduler (raises ValueError when upstream API keys are missing)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = InsightScheduler()
+    return _scheduler
@@ -0,0 +1,560 @@
+"""
+Local retrieval over agronomy documents: a BM25 inverted index whose hits
+are the `ranked_results` ResponseService.assemble expects.
+
+Documents (.md, .txt, or .json lists of {title, body, source, type}) are split
+into passages and written to immutable, memory-mapped segment files. Indexing
+is incremental: new or changed files go into a new segment, and the passages
+of changed or removed files are tombstoned until the next compaction.
+
+    python -m app.services.knowledge_base build --docs data/knowledge
+    python -m app.services.knowledge_base query "when to water tomatoes"
+"""
+import os
+import re
+import json
+import mmap
+import fcntl
+import time
+import struct
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.config import settings
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"AFKB1\n"
+_TOKEN = re.compile(r"[^\W_]+")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its my of on or our
+should so that the their them then there these they this to was what when where which who why will
+with you your
+""".split())
+DOC_EXTENSIONS = (".md", ".txt", ".json")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, with plurals folded ("tomatoes" -> "tomato")."""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if word in _STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _title_from_path(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ").strip().capitalize()
+
+
+def split_passages(text: str, source: str, max_words: int = 120) -> List[Dict[str, str]]:
+    """
+    Split a text/markdown document into passages of about max_words words.
+    Paragraphs are kept whole where possible; markdown headings become the
+    passage title (prefixed by the document title).
+    """
+    doc_title = _title_from_path(source)
+    section = None
+    passages: List[Dict[str, str]] = []
+    buffer: List[str] = []
+
+    def flush():
+        if buffer:
+            title = f"{doc_title}: {section}" if section and section != doc_title else doc_title
+            passages.append({"title": title, "body": " ".join(buffer), "source": source, "type": "document"})
+            buffer.clear()
+
+    for block in re.split(r"\n\s*\n", text):
+        lines = [line for line in block.strip().splitlines() if line.strip()]
+        body_lines = []
+        for line in lines:
+            heading = _HEADING.match(line)
+            if heading:
+                flush()
+                if not passages and section is None and doc_title == _title_from_path(source):
+                    doc_title = heading.group(1) or doc_title  # first heading names the document
+                section = heading.group(1)
+            else:
+                body_lines.append(line.strip())
+        if not body_lines:
+            continue
+        paragraph = " ".join(body_lines)
+        words = paragraph.split()
+        if buffer and sum(len(p.split()) for p in buffer) + len(words) > max_words:
+            flush()
+        while len(words) > max_words:
+            buffer.append(" ".join(words[:max_words]))
+            flush()
+            words = words[max_words:]
+        buffer.append(" ".join(words))
+    flush()
+    return passages
+
+
+def load_passages(path: str, source: str) -> List[Dict[str, str]]:
+    """Passages of one document file; `source` is its path relative to the docs folder."""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = [records]
+        return [
+            {
+                "title": str(r.get("title") or ""),
+                "body": str(r.get("body") or ""),
+                "source": str(r.get("source") or source),
+                "type": str(r.get("type") or "document"),
+            }
+            for r in records if r.get("body") or r.get("title")
+        ]
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return split_passages(f.read(), source)
+
+
+class Segment:
+    """
+    One immutable index file, memory-mapped. Only the term dictionary is
+    parsed; postings, lengths and stored passages are read from the map.
+
+    Layout: magic | u32 header length | JSON header | arrays | stored passages.
+    The header maps term -> [first posting, df] and gives the byte offsets
+    of doc_ids (u32), tfs (u16), doc_len (u32) and passage offsets (u64).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"Not a knowledge base segment: {path}")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(_MAGIC))
+        start = len(_MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_len].decode("utf-8"))
+        self.n_docs: int = header["n_docs"]
+        self.terms: Dict[str, List[int]] = header["terms"]
+        offsets = header["offsets"]
+        n_postings = header["n_postings"]
+        self.doc_ids = np.frombuffer(self._mmap, dtype="<u4", count=n_postings, offset=offsets["doc_ids"])
+        self.tfs = np.frombuffer(self._mmap, dtype="<u2", count=n_postings, offset=offsets["tfs"])
+        self.doc_len = np.frombuffer(self._mmap, dtype="<u4", count=self.n_docs, offset=offsets["doc_len"])
+        self._stored = np.frombuffer(self._mmap, dtype="<u8", count=self.n_docs + 1, offset=offsets["stored"])
+        self._blob_start = offsets["blob"]
+        self.norm: Optional[np.ndarray] = None
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        first, df = entry
+        return self.doc_ids[first:first + df], self.tfs[first:first + df]
+
+    def passage(self, doc_id: int) -> Dict[str, str]:
+        lo, hi = int(self._stored[doc_id]), int(self._stored[doc_id + 1])
+        return json.loads(self._mmap[self._blob_start + lo:self._blob_start + hi].decode("utf-8"))
+
+    @staticmethod
+    def write(path: str, passages: List[Dict[str, str]]):
+        """Tokenize passages and write them as a new segment file."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_len = np.zeros(len(passages), dtype="<u4")
+        blob = bytearray()
+        stored = [0]
+        for doc_id, passage in enumerate(passages):
+            tokens = tokenize(f"{passage['title']} {passage['body']}")
+            doc_len[doc_id] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, min(tf, 0xFFFF)))
+            blob.extend(json.dumps(passage, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            stored.append(len(blob))
+
+        terms: Dict[str, List[int]] = {}
+        ids: List[int] = []
+        tfs: List[int] = []
+        for term in sorted(postings):
+            entries = postings[term]
+            terms[term] = [len(ids), len(entries)]
+            ids.extend(d for d, _ in entries)
+            tfs.extend(t for _, t in entries)
+
+        arrays = [
+            ("doc_ids", np.asarray(ids, dtype="<u4")),
+            ("tfs", np.asarray(tfs, dtype="<u2")),
+            ("doc_len", doc_len),
+            ("stored", np.asarray(stored, dtype="<u8")),
+        ]
+        header = {"n_docs": len(passages), "n_postings": len(ids), "terms": terms, "offsets": {}}
+        # Offsets depend on the header length, which depends on the offsets: size it with
+        # placeholders wide enough for any file, then pad the header to that size
+        probe = dict(header, offsets={name: 10 ** 15 for name, _ in arrays + [("blob", None)]})
+        header_len = len(json.dumps(probe, separators=(",", ":")).encode("utf-8"))
+        position = len(_MAGIC) + 4 + header_len
+        for name, array in arrays:
+            position += -position % 8
+            header["offsets"][name] = position
+            position += array.nbytes
+        header["offsets"]["blob"] = position
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8").ljust(header_len)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", header_len))
+            f.write(header_bytes)
+            for name, array in arrays:
+                f.write(b"\0" * (header["offsets"][name] - f.tell()))
+                f.write(array.tobytes())
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+
+class KnowledgeBase:
+    """
+    BM25 (k1, b) search over all segments of an index directory. A manifest
+    records which file produced which passages, so re-indexing a folder only
+    reads files whose size or mtime changed.
+
+    Several workers may share the index directory. Writers hold an flock on
+    it and start from the manifest on disk; readers reopen the index when
+    the manifest file has been replaced since they last read it.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Any] = {"next_segment": 1, "segments": [], "files": {}, "deleted": {}}
+        self._segments: List[Segment] = []
+        self._deleted: Dict[str, np.ndarray] = {}
+        self._df: Dict[str, int] = {}
+        self._n_live = 0
+        self._manifest_path = os.path.join(index_dir, "manifest.json")
+        self._lock_path = os.path.join(index_dir, ".lock")
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self.refresh()
+
+    # ---------------------------
+    # Index state
+    # ---------------------------
+    def _manifest_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the manifest file on disk; os.replace gives every write a new inode."""
+        try:
+            st = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        """Re-read the manifest and reopen segments if the file changed since the last read."""
+        stamp = self._manifest_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with open(self._manifest_path, encoding="utf-8") as f:
+            self._manifest = json.load(f)
+        self._stamp = stamp
+        self._load()
+
+    @contextmanager
+    def _flocked(self, operation: int) -> Iterator[None]:
+        """This thread alone in the index, holding the directory's lock file in `operation` mode."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self._lock, open(self._lock_path, "a") as f:
+            fcntl.flock(f.fileno(), operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Exclusive hold on the index across workers, starting from the manifest on disk."""
+        with self._flocked(fcntl.LOCK_EX):
+            self._reload()
+            yield
+
+    def refresh(self):
+        """Pick up segments another worker indexed or compacted; one stat() when nothing changed."""
+        if self._manifest_stamp() == self._stamp:
+            return
+        # Shared lock: a compaction can't delete segments of the manifest being read
+        with self._flocked(fcntl.LOCK_SH):
+            self._reload()
+
+    def _load(self):
+        """(Re)open segments from the manifest and recompute collection statistics."""
+        segments = [Segment(os.path.join(self.index_dir, name)) for name in self._manifest["segments"]]
+        deleted = {}
+        for segment in segments:
+            ranges = self._manifest["deleted"].get(segment.name)
+            if ranges:
+                mask = np.zeros(segment.n_docs, dtype=bool)
+                for lo, hi in ranges:
+                    mask[lo:hi] = True
+                deleted[segment.name] = mask
+
+        # Tombstoned passages are left out of n/avgdl/df so that idf stays positive
+        live_len = {s.name: s.doc_len[~deleted[s.name]] if s.name in deleted else s.doc_len for s in segments}
+        n_live = sum(len(lengths) for lengths in live_len.values())
+        total_len = sum(int(lengths.sum(dtype=np.int64)) for lengths in live_len.values())
+        avgdl = total_len / n_live if n_live else 1.0
+        df: Dict[str, int] = {}
+        for segment in segments:
+            segment.norm = (self.k1 * (1 - self.b + self.b * segment.doc_len / avgdl)).astype(np.float32)
+            mask = deleted.get(segment.name)
+            if mask is None:
+                for term, (_, count) in segment.terms.items():
+                    df[term] = df.get(term, 0) + count
+                continue
+            # live postings before each position, so a term's live df is one subtraction
+            live = np.concatenate(([0], np.cumsum(~mask[segment.doc_ids], dtype=np.int64)))
+            for term, (first, count) in segment.terms.items():
+                count = int(live[first + count] - live[first])
+                if count:
+                    df[term] = df.get(term, 0) + count
+
+        self._segments, self._deleted, self._df, self._n_live = segments, deleted, df, n_live
+
+    def _save_manifest(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, "manifest.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(f"{path}.tmp", path)
+        self._stamp = self._manifest_stamp()
+
+    def _new_segment_name(self) -> str:
+        name = f"seg-{self._manifest['next_segment']:06d}.kb"
+        self._manifest["next_segment"] += 1
+        return name
+
+    def _tombstone(self, source: str):
+        entry = self._manifest["files"].pop(source, None)
+        if entry and entry["docs"][1] > entry["docs"][0]:
+            self._manifest["deleted"].setdefault(entry["segment"], []).append(entry["docs"])
+
+    @property
+    def version(self) -> int:
+        """Changes whenever passages are added, removed or compacted (by any worker)."""
+        self.refresh()
+        return self._manifest["next_segment"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "segments": len(self._segments),
+            "passages": self._n_live,
+            "deleted": sum(int(m.sum()) for m in self._deleted.values()),
+            "terms": len(self._df),
+            "files": len(self._manifest["files"]),
+        }
+
+    # ---------------------------
+    # Indexing
+    # ---------------------------
+    def add_documents(self, documents: Iterable[Tuple[str, List[Dict[str, str]], str]]) -> int:
+        """
+        Index (source, passages, signature) triples as one new segment,
+        replacing earlier passages from the same sources. Returns passages added.
+        """
+        with self._writing():
+            return self._add_documents(documents)
+
+    def _add_documents(self, documents: Iterable[Tuple[str, List[Dict[str, str]], str]]) -> int:
+        passages: List[Dict[str, str]] = []
+        placements = []
+        for source, doc_passages, signature in documents:
+            self._tombstone(source)
+            placements.append((source, signature, len(passages), len(passages) + len(doc_passages)))
+            passages.extend(doc_passages)
+        if not placements:
+            return 0
+
+        name = self._new_segment_name()
+        if passages:
+            Segment.write(os.path.join(self.index_dir, name), passages)
+            self._manifest["segments"].append(name)
+        for source, signature, lo, hi in placements:
+            self._manifest["files"][source] = {"sig": signature, "segment": name, "docs": [lo, hi]}
+        self._save_manifest()
+        self._load()
+        return len(passages)
+
+    def index_folder(self, docs_dir: str) -> Dict[str, int]:
+        """
+        Bring the index in line with a folder: index new and changed files,
+        drop passages of removed files, and compact when tombstones pile up.
+        """
+        seen = {}
+        for root, _, files in os.walk(docs_dir):
+            for filename in sorted(files):
+                if filename.endswith(DOC_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    st = os.stat(path)
+                    seen[os.path.relpath(path, docs_dir)] = (path, f"{st.st_size}:{st.st_mtime_ns}")
+
+        # Compared with the manifest on disk: another worker may have indexed these already
+        with self._writing():
+            changed = [
+                (source, path, signature) for source, (path, signature) in sorted(seen.items())
+                if self._manifest["files"].get(source, {}).get("sig") != signature
+            ]
+            removed = [source for source in self._manifest["files"] if source not in seen]
+
+            documents = []
+            for source, path, signature in changed:
+                try:
+                    documents.append((source, load_passages(path, source), signature))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping {source}: {e}")
+            added = self._add_documents(documents)
+            if removed:
+                for source in removed:
+                    self._tombstone(source)
+                self._save_manifest()
+                self._load()
+
+            stats = self.stats()
+            if stats["deleted"] > 0.3 * (stats["passages"] + stats["deleted"]) or stats["segments"] > 8:
+                self._compact()
+        return {"files_indexed": len(documents), "files_removed": len(removed), "passages_added": added}
+
+    def compact(self):
+        """Rewrite all live passages into a single segment and delete the old files."""
+        with self._writing():
+            self._compact()
+
+    def _compact(self):
+        old = list(self._manifest["segments"])
+        passages: List[Dict[str, str]] = []
+        files = {}
+        by_segment = {s.name: s for s in self._segments}
+        for source, entry in sorted(self._manifest["files"].items()):
+            segment = by_segment.get(entry["segment"])
+            lo, hi = entry["docs"]
+            start = len(passages)
+            if segment is not None:
+                passages.extend(segment.passage(i) for i in range(lo, hi))
+            files[source] = {"sig": entry["sig"], "docs": [start, len(passages)]}
+
+        name = self._new_segment_name()
+        if passages:
+            Segment.write(os.path.join(self.index_dir, name), passages)
+        for entry in files.values():
+            entry["segment"] = name
+        self._manifest.update(segments=[name] if passages else [], files=files, deleted={})
+        self._save_manifest()
+        self._load()
+        for stale in old:
+            try:
+                os.remove(os.path.join(self.index_dir, stale))
+            except OSError:
+                pass
+
+    # ---------------------------
+    # Query
+    # ---------------------------
+    @timed("kb_search")
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Top-k passages for an English query, best first, as
+        {title, body, source, score, type} dicts ready for ResponseService.assemble.
+        """
+        self.refresh()
+        segments, deleted, df, n_live = self._segments, self._deleted, self._df, self._n_live
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not segments or not terms or k <= 0:
+            return []
+        idf = {t: float(np.log(1 + (n_live - df[t] + 0.5) / (df[t] + 0.5))) for t in terms if t in df}
+        if not idf:
+            return []
+
+        candidates: List[Tuple[float, Segment, int]] = []
+        for segment in segments:
+            scores = None
+            for term, weight in idf.items():
+                hit = segment.postings(term)
+                if hit is None:
+                    continue
+                ids, tfs = hit
+                tf = tfs.astype(np.float32)
+                if scores is None:
+                    scores = np.zeros(segment.n_docs, dtype=np.float32)
+                # doc ids are unique within a posting list, so fancy-index += is safe
+                scores[ids] += weight * tf * (self.k1 + 1) / (tf + segment.norm[ids])
+            if scores is None:
+                continue
+            mask = deleted.get(segment.name)
+            if mask is not None:
+                scores[mask] = 0.0
+            top = np.flatnonzero(scores)
+            if len(top) > k:
+                top = top[np.argpartition(scores[top], -k)[-k:]]
+            candidates.extend((float(scores[i]), segment, int(i)) for i in top)
+
+        candidates.sort(key=lambda c: -c[0])
+        results = []
+        for score, segment, doc_id in candidates[:k]:
+            passage = segment.passage(doc_id)
+            passage["score"] = round(score, 3)
+            results.append(passage)
+        return results
+
+
+_knowledge_base: Optional[KnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Process-wide knowledge base opened from settings.KNOWLEDGE_INDEX_DIR (empty if not built)."""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase(settings.KNOWLEDGE_INDEX_DIR)
+    return _knowledge_base
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the agronomy knowledge base")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="index new/changed documents in a folder")
+    build.add_argument("--docs", default=settings.KNOWLEDGE_DOCS_DIR)
+    build.add_argument("--index", default=settings.KNOWLEDGE_INDEX_DIR)
+    build.add_argument("--compact", action="store_true", help="merge all segments afterwards")
+    query = sub.add_parser("query", help="print the top passages for a question")
+    query.add_argument("text")
+    query.add_argument("--index", default=settings.KNOWLEDGE_INDEX_DIR)
+    query.add_argument("-k", type=int, default=settings.KNOWLEDGE_TOP_K)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    kb = KnowledgeBase(args.index)
+    if args.command == "build":
+        start = time.perf_counter()
+        print(kb.index_folder(args.docs))
+        if args.compact:
+            kb.compact()
+        print(f"{kb.stats()} in {time.perf_counter() - start:.1f}s")
+    else:
+        start = time.perf_counter()
+        hits = kb.search(args.text, args.k)
+        print(f"{len(hits)} results in {(time.perf_counter() - start) * 1000:.2f} ms")
+        for hit in hits:
+            print(f"{hit['score']:>8}  {hit['source']}  {hit['title']}\n          {hit['body'][:160]}")
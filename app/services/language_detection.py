@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+from app.utils.config import settings
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Scripts used by exactly one supported language: decided from code points alone
+_UNIQUE_SCRIPTS = [
+    (0x0C00, 0x0C7F, "te"),  # Telugu
+    (0x0B80, 0x0BFF, "ta"),  # Tamil
+    (0x0C80, 0x0CFF, "kn"),  # Kannada
+    (0x0D00, 0x0D7F, "ml"),  # Malayalam
+    (0x0A80, 0x0AFF, "gu"),  # Gujarati
+    (0x0A00, 0x0A7F, "pa"),  # Gurmukhi
+    (0x0980, 0x09FF, "bn"),  # Bengali
+    (0x0E00, 0x0E7F, "th"),  # Thai
+    (0x0370, 0x03FF, "el"),  # Greek
+    (0x0590, 0x05FF, "he"),  # Hebrew
+    (0xAC00, 0xD7AF, "ko"),  # Hangul
+    (0x3040, 0x30FF, "ja"),  # Hiragana / Katakana
+]
+# Scripts shared by several languages: the n-gram model picks among these
+_SHARED_SCRIPTS = [
+    (0x0900, 0x097F, ("hi", "mr", "ne")),          # Devanagari
+    (0x0600, 0x06FF, ("ar", "ur", "fa")),          # Arabic
+    (0x0400, 0x04FF, ("ru", "uk", "bg", "mk")),    # Cyrillic
+    (0x4E00, 0x9FFF, ("zh-cn", "zh-tw")),          # CJK ideographs
+]
+_LATIN_LANGUAGES = (
+    "af", "ca", "cs", "cy", "da", "de", "en", "es", "et", "fi", "fr", "hr", "hu", "id", "it",
+    "lt", "lv", "nl", "no", "pl", "pt", "ro", "sk", "sl", "so", "sq", "sv", "sw", "tl", "tr", "vi",
+)
+# Combining marks (Devanagari vowel signs, Arabic harakat, ...) are part of
+# words, but not \w; without them words would split mid-syllable
+_MARKS = "".join(
+    chr(cp) for lo, hi in ((0x0300, 0x036F), (0x0590, 0x0DFF), (0x0E00, 0x0E7F))
+    for cp in range(lo, hi + 1) if unicodedata.category(chr(cp)).startswith("M")
+)
+_NON_LETTERS = re.compile(r"(?:[^\w" + re.escape(_MARKS) + r"]|[\d_])+")
+
+
+class LanguageDetector(Protocol):
+    def detect(self, text: str) -> str:
+        ...
+
+
+class LangdetectDetector:
+    """The original langdetect-based detector (slow, kept as a fallback backend)."""
+
+    def __init__(self, default: str = "en"):
+        from langdetect import DetectorFactory
+        DetectorFactory.seed = 0
+        self.default = default
+
+    def detect(self, text: str) -> str:
+        from langdetect import detect
+        try:
+            if len(text.strip()) < 3:
+                return self.default
+            return detect(text)
+        except Exception:
+            return self.default
+
+    def detect_many(self, texts: Sequence[str]) -> List[str]:
+        return [self.detect(t) for t in texts]
+
+
+class NgramModel:
+    """
+    Naive-Bayes character n-gram (1-3) model: log P(ngram | language) for the
+    most frequent n-grams of each language, stored as a dense float32 matrix.
+    """
+
+    def __init__(self, languages: List[str], ngrams: List[str], logprobs: np.ndarray, floor: np.ndarray):
+        self.languages = languages
+        self.lang_index = {lang: i for i, lang in enumerate(languages)}
+        self.ngram_index = {ng: i for i, ng in enumerate(ngrams)}
+        self.ngrams = ngrams
+        self.logprobs = logprobs
+        self.floor = floor
+
+    # Added to every P(ngram | language), like langdetect's smoothing: one
+    # value for all languages, so none is favoured on n-grams it lacks
+    SMOOTHING = 1e-5
+
+    @classmethod
+    def from_langdetect_profiles(cls, top_k: int = 1500) -> "NgramModel":
+        """
+        Derive the model from the n-gram profiles shipped with langdetect
+        (offline). The vocabulary is the union of each language's top_k
+        n-grams; every language is scored on all of it from its full profile.
+        """
+        import langdetect
+        profile_dir = os.path.join(os.path.dirname(langdetect.__file__), "profiles")
+        languages, profiles = [], []
+        for name in sorted(os.listdir(profile_dir)):
+            with open(os.path.join(profile_dir, name), encoding="utf-8") as f:
+                profile = json.load(f)
+            profiles.append(profile)
+            languages.append(profile["name"])
+
+        vocabulary = set()
+        for profile in profiles:
+            top = sorted((kv for kv in profile["freq"].items() if 0 < len(kv[0]) <= 3), key=lambda kv: -kv[1])
+            vocabulary.update(ng for ng, _ in top[:top_k])
+        ngrams = sorted(vocabulary)
+        order = np.array([len(ng) - 1 for ng in ngrams])
+        logprobs = np.empty((len(ngrams), len(languages)), dtype=np.float32)
+        for j, profile in enumerate(profiles):
+            freq = profile["freq"]
+            counts = np.array([freq.get(ng, 0) for ng in ngrams], dtype=np.float64)
+            totals = np.asarray(profile["n_words"], dtype=np.float64)[order]
+            logprobs[:, j] = np.log(counts / totals + cls.SMOOTHING)
+        floor = np.full(len(languages), np.log(cls.SMOOTHING), dtype=np.float32)
+        return cls(languages, ngrams, logprobs, floor)
+
+    @classmethod
+    def load(cls, path: str) -> "NgramModel":
+        data = np.load(path, allow_pickle=False)
+        return cls(data["languages"].tolist(), data["ngrams"].tolist(), data["logprobs"], data["floor"])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                languages=np.array(self.languages),
+                ngrams=np.array(self.ngrams),
+                logprobs=self.logprobs,
+                floor=self.floor,
+            )
+
+    def ngram_ids(self, text: str) -> List[int]:
+        ids = []
+        for word in _NON_LETTERS.split(text.lower()):
+            if not word:
+                continue
+            padded = f" {word} "
+            for n in (1, 2, 3):
+                for i in range(len(padded) - n + 1):
+                    idx = self.ngram_index.get(padded[i:i + n])
+                    if idx is not None:
+                        ids.append(idx)
+        return ids
+
+    def scores(self, text: str, candidates: Sequence[str]) -> Optional[Dict[str, float]]:
+        ids = self.ngram_ids(text)
+        cols = [self.lang_index[c] for c in candidates if c in self.lang_index]
+        if not ids or not cols:
+            return None
+        totals = self.logprobs[np.asarray(ids)][:, cols].sum(axis=0)
+        return {self.languages[c]: float(s) for c, s in zip(cols, totals)}
+
+
+class FastLanguageDetector:
+    """
+    Offline detector: Unicode-script shortcuts first, then the n-gram model
+    restricted to languages that use the text's script. Results are memoized.
+    Short text without a clear winner falls back to the script's preferred
+    language (`default` for Latin script).
+    """
+
+    def __init__(self, model: NgramModel, default: str = "en",
+                 short_text_chars: int = 12, short_text_margin: float = 8.0, memo_size: int = 4096):
+        self.model = model
+        self.default = default
+        self.short_text_chars = short_text_chars
+        self.short_text_margin = short_text_margin
+        self._memo = TTLCache(default_ttl_seconds=24 * 3600, max_entries=memo_size)
+
+    @staticmethod
+    def _script_candidates(text: str) -> Optional[Sequence[str]]:
+        """
+        Returns the candidate languages implied by the dominant script, or
+        None when Latin letters are at least as common (a non-Latin word
+        quoted in a Latin sentence must not decide its language).
+        """
+        latin = 0
+        counts: Dict[object, int] = {}
+        for ch in text:
+            cp = ord(ch)
+            if cp < 0x0370 or 0x1E00 <= cp <= 0x1EFF:
+                latin += ch.isalpha()
+                continue
+            for lo, hi, lang in _UNIQUE_SCRIPTS:
+                if lo <= cp <= hi:
+                    counts[lang] = counts.get(lang, 0) + 1
+                    break
+            else:
+                for lo, hi, langs in _SHARED_SCRIPTS:
+                    if lo <= cp <= hi:
+                        counts[langs] = counts.get(langs, 0) + 1
+                        break
+        if not counts:
+            return None
+        best = max(counts, key=counts.get)
+        if counts[best] <= latin:
+            return None
+        return (best,) if isinstance(best, str) else best
+
+    def _detect(self, text: str) -> str:
+        stripped = text.strip()
+        if not stripped:
+            return self.default
+
+        candidates = self._script_candidates(stripped)
+        if candidates and len(candidates) == 1:
+            return candidates[0]
+        if candidates is None and len(_NON_LETTERS.sub("", stripped)) < 3:
+            return self.default  # too short to tell
+
+        scores = self.model.scores(stripped, candidates or _LATIN_LANGUAGES)
+        if not scores:
+            return candidates[0] if candidates else self.default
+        best = max(scores, key=scores.get)
+        # Little evidence in short text: keep the script's preferred language
+        # (the default for Latin, e.g. hi for Devanagari) unless clearly beaten
+        preferred = candidates[0] if candidates else self.default
+        if len(stripped) <= self.short_text_chars and preferred in scores:
+            if scores[best] - scores[preferred] < self.short_text_margin:
+                return preferred
+        return best
+
+    def detect(self, text: str) -> str:
+        key = " ".join(text.lower().split())
+        lang = self._memo.get(key)
+        if lang is None:
+            lang = self._detect(text)
+            self._memo.set(key, lang)
+        return lang
+
+    def detect_many(self, texts: Sequence[str]) -> List[str]:
+        return [self.detect(t) for t in texts]
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_language_detector():
+    """
+    Process-wide detector chosen by settings.LANGUAGE_DETECTOR ("fast" or
+    "langdetect"). Call once at startup so the model load is off the request path.
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = _build_detector()
+    return _detector
+
+
+def _build_detector():
+    if settings.LANGUAGE_DETECTOR == "langdetect":
+        return LangdetectDetector()
+    start = time.perf_counter()
+    path = settings.LANGID_MODEL_PATH
+    if path and os.path.exists(path):
+        model = NgramModel.load(path)
+    else:
+        model = NgramModel.from_langdetect_profiles()
+    logger.info("Language id model ready: %d languages, %d n-grams in %.0f ms",
+                len(model.languages), len(model.ngrams), (time.perf_counter() - start) * 1000)
+    return FastLanguageDetector(model)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the n-gram language id model")
+    parser.add_argument("--out", default=settings.LANGID_MODEL_PATH)
+    parser.add_argument("--top-k", type=int, default=1500)
+    args = parser.parse_args()
+
+    model = NgramModel.from_langdetect_profiles(top_k=args.top_k)
+    model.save(args.out)
+    print(f"Saved {len(model.ngrams)} n-grams x {len(model.languages)} languages to {args.out}")
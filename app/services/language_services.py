@@ -1,11 +1,186 @@
 import os
-import speech_recognition as sr
-from langdetect import detect, DetectorFactory
+import re
+import time
+import asyncio
+import functools
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Protocol, Tuple
+
+import httpx
+from bs4 import BeautifulSoup
 from deep_translator import GoogleTranslator
 
+from app.services.language_detection import LanguageDetector, get_language_detector
+from app.services.speech_service import GoogleSpeechBackend, SpeechBackend, StreamingTranscriber
+from app.utils.config import settings
+from app.utils.metrics import timed, upstream_latency
+from app.utils.translation_cache import TranslationCache, get_translation_cache
+
+
+# Sentence ends (Latin and Devanagari danda) followed by whitespace
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?\u0964])(\s+)")
+# Segments are packed into one provider request separated by newlines
+_PACK_SEPARATOR = "\n"
+
+# The mobile Google Translate page that deep_translator scrapes, and where the
+# translation sits in it; kept here so the async path needs none of its internals
+GOOGLE_TRANSLATE_URL = "https://translate.google.com/m"
+_GOOGLE_RESULT_ELEMENTS = (("div", {"class": "t0"}), ("div", {"class": "result-container"}))
+
+# Blocking work done on behalf of async callers never runs on the event loop.
+# Each kind gets its own pool so that one can't starve another: provider calls
+# (at most API_CONCURRENCY_LIMIT at a time), speech jobs, which hold a thread
+# for as long as recognition takes, and the quick translation-cache lookups.
+_blocking_pool = ThreadPoolExecutor(max_workers=settings.API_CONCURRENCY_LIMIT, thread_name_prefix="language-io")
+_speech_pool = ThreadPoolExecutor(max_workers=settings.SPEECH_CONCURRENCY_LIMIT, thread_name_prefix="speech-io")
+_cache_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translation-cache")
+
+
+async def _offload(pool: ThreadPoolExecutor, fn, *args, timeout: Optional[float] = None):
+    """
+    Await a blocking call on one of the pools above. Timing out or cancelling
+    the caller drops the call if it is still queued; one already running is
+    left to finish in its thread and its result discarded. The call runs in
+    a copy of the caller's context, so its spans land in the request trace.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(pool, contextvars.copy_context().run, functools.partial(fn, *args))
+    return await asyncio.wait_for(future, timeout or settings.API_TIMEOUT_SECONDS)
+
+
+def _split_segments(text: str, max_chars: int) -> List[Tuple[bool, str]]:
+    """
+    Split text into (translatable, piece) tuples: sentences to translate and
+    the whitespace between them, which is kept verbatim. Sentences longer
+    than max_chars are cut on word boundaries.
+    """
+    pieces: List[Tuple[bool, str]] = []
+    for part in re.split(r"(\s*\n\s*)", text):
+        if not part:
+            continue
+        if not part.strip():
+            pieces.append((False, part))
+            continue
+        for sentence in _SENTENCE_BREAK.split(part):
+            if not sentence.strip():
+                pieces.append((False, sentence))
+                continue
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                if cut > 0:
+                    pieces.append((True, sentence[:cut]))
+                    pieces.append((False, " "))
+                    sentence = sentence[cut + 1:]
+                else:
+                    pieces.append((True, sentence[:max_chars]))
+                    sentence = sentence[max_chars:]
+            pieces.append((True, sentence))
+    return pieces
+
+
+def _pack(segments: List[str], max_chars: int) -> List[List[str]]:
+    """Greedily group segments into requests that stay under max_chars."""
+    packs: List[List[str]] = []
+    size = 0
+    for segment in segments:
+        extra = len(segment) + len(_PACK_SEPARATOR)
+        if packs and size + extra <= max_chars:
+            packs[-1].append(segment)
+            size += extra
+        else:
+            packs.append([segment])
+            size = extra
+    return packs
+
+
+class TranslatorBackend(Protocol):
+    """
+    Anything that can translate a string; swap in a fake for offline runs.
+    Backends may also define `async atranslate(text, source, target)`; the
+    async API uses it instead of offloading `translate` to a thread.
+    """
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        ...
+
+
+class GoogleTranslatorBackend:
+    """
+    deep_translator's GoogleTranslator, one client per language pair and
+    thread (the client keeps the request text in shared state), plus a
+    native async path against the same endpoint.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self.base_url = settings.TRANSLATE_BASE_URL or GOOGLE_TRANSLATE_URL
+
+    def _client(self, source: str, target: str) -> GoogleTranslator:
+        clients = self._local.__dict__.setdefault("clients", {})
+        client = clients.get((source, target))
+        if client is None:
+            client = clients[(source, target)] = GoogleTranslator(source=source, target=target)
+            if settings.TRANSLATE_BASE_URL:
+                client._base_url = settings.TRANSLATE_BASE_URL
+        return client
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            translated = self._client(source, target).translate(text)
+            status = "ok"
+            return translated
+        finally:
+            upstream_latency.labels(provider="google_translate", status=status).observe(time.perf_counter() - start)
+
+    async def atranslate(self, text: str, source: str, target: str) -> str:
+        client = self._client(source, target)  # validates and maps the language codes
+        text = text.strip()
+        if not text:
+            return text
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=settings.API_TIMEOUT_SECONDS)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._async_client.get(
+                self.base_url, params={"sl": client.source, "tl": client.target, "q": text},
+            )
+            status = response.status_code
+        finally:
+            upstream_latency.labels(provider="google_translate", status=status).observe(time.perf_counter() - start)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "html.parser")
+        for tag, attrs in _GOOGLE_RESULT_ELEMENTS:
+            element = soup.find(tag, attrs)
+            if element is not None:
+                return element.get_text(strip=True)
+        raise ValueError(f"No translation found for: {text[:50]}")
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
 
-# To ensure consistent language detection
-DetectorFactory.seed = 0
+class EchoTranslatorBackend:
+    """Offline stand-in: returns the text unchanged, tagged with the target language."""
+
+    def __init__(self, tag: bool = True):
+        self.tag = tag
+        self.calls = 0
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        self.calls += 1
+        return f"[{target}] {text}" if self.tag else text
+
+    async def atranslate(self, text: str, source: str, target: str) -> str:
+        return self.translate(text, source, target)
 
 
 class LanguageProcessor:
@@ -16,8 +191,107 @@ class LanguageProcessor:
     3. Translating AI answers back to user's language
     """
 
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
+    def __init__(self,
+                 translator: Optional[TranslatorBackend] = None,
+                 cache: Optional[TranslationCache] = None,
+                 detector: Optional[LanguageDetector] = None,
+                 speech_backend: Optional[SpeechBackend] = None):
+        self.speech_backend = speech_backend or GoogleSpeechBackend()
+        self.translator = translator or GoogleTranslatorBackend()
+        self.cache = cache if cache is not None else get_translation_cache()
+        self.detector = detector or get_language_detector()
+
+    def _translate(self, text: str, source: str, target: str) -> str:
+        """Cached call into the translator backend. Failures are not cached."""
+        if source == target:
+            return text
+        cached = self.cache.get(text, source, target)
+        if cached is not None:
+            return cached
+        translated = self.translator.translate(text, source, target)
+        if translated:
+            self.cache.set(text, source, target, translated)
+        return translated
+
+    def _translate_pack(self, pack: List[str], source: str, target: str) -> List[Optional[str]]:
+        """One provider request for a pack; per-segment retry if the split doesn't line up."""
+        if len(pack) > 1:
+            try:
+                joined = self.translator.translate(_PACK_SEPARATOR.join(pack), source, target)
+                parts = joined.split(_PACK_SEPARATOR) if joined else []
+                if len(parts) == len(pack):
+                    return [p.strip() for p in parts]
+            except Exception:
+                pass
+        results: List[Optional[str]] = []
+        for segment in pack:
+            try:
+                results.append(self.translator.translate(segment, source, target))
+            except Exception:
+                results.append(None)
+        return results
+
+    def _plan_batch(self, texts: List[str], source: str, target: str):
+        """Split texts into segments, resolve cached ones and pack the rest into requests."""
+        max_chars = settings.TRANSLATE_MAX_CHARS
+        split = [_split_segments(text or "", max_chars) for text in texts]
+
+        translations: Dict[str, str] = {}
+        pending: List[str] = []
+        for pieces in split:
+            for translatable, piece in pieces:
+                if not translatable or piece in translations or piece in pending:
+                    continue
+                cached = self.cache.get(piece, source, target)
+                if cached is not None:
+                    translations[piece] = cached
+                else:
+                    pending.append(piece)
+        return split, translations, _pack(pending, max_chars)
+
+    def _store_pack(self, pack: List[str], translated: List[Optional[str]], source: str, target: str,
+                    translations: Dict[str, str]):
+        for segment, value in zip(pack, translated):
+            if value:
+                self.cache.set(segment, source, target, value)
+                translations[segment] = value
+
+    @staticmethod
+    def _assemble(split, translations: Dict[str, str]) -> List[str]:
+        return [
+            "".join(translations.get(piece, piece) if translatable else piece for translatable, piece in pieces)
+            for pieces in split
+        ]
+
+    @staticmethod
+    def _complete(split, translations: Dict[str, str]) -> bool:
+        return all(piece in translations for pieces in split for translatable, piece in pieces if translatable)
+
+    def translate_batch(self, texts: List[str], target_lang: str, source_lang: str = "en") -> List[str]:
+        """
+        Translate many texts with as few provider requests as the length limit
+        allows: texts are split on sentence boundaries, identical and cached
+        sentences are translated once, the rest are packed into requests of at
+        most settings.TRANSLATE_MAX_CHARS and sent concurrently. Results come
+        back in input order; untranslatable sentences stay in the source language.
+        """
+        return self.translate_batch_checked(texts, target_lang, source_lang)[0]
+
+    @timed("translate_batch")
+    def translate_batch_checked(self, texts: List[str], target_lang: str,
+                                source_lang: str = "en") -> Tuple[List[str], bool]:
+        """translate_batch, plus whether every sentence got translated (False: some fell back to the source)."""
+        if source_lang == target_lang:
+            return list(texts), True
+        split, translations, packs = self._plan_batch(texts, source_lang, target_lang)
+        if packs:
+            with ThreadPoolExecutor(max_workers=min(len(packs), settings.API_CONCURRENCY_LIMIT)) as pool:
+                # Each pack in its own copy of the context (one can't be entered twice at once)
+                futures = [pool.submit(contextvars.copy_context().run, self._translate_pack, p, source_lang, target_lang)
+                           for p in packs]
+                for pack, future in zip(packs, futures):
+                    self._store_pack(pack, future.result(), source_lang, target_lang, translations)
+        return self._assemble(split, translations), self._complete(split, translations)
 
     def process_input(self, input_data: str, is_audio: bool = False):
         """
@@ -42,7 +316,7 @@ class LanguageProcessor:
         if detected_lang == "en":
             return text, detected_lang
 
-        translated = GoogleTranslator(source=detected_lang, target="en").translate(text)
+        translated = self._translate(text, detected_lang, "en")
         return translated, detected_lang
 
     def _process_audio(self, audio_file: str):
@@ -52,29 +326,39 @@ class LanguageProcessor:
         if not os.path.exists(audio_file):
             raise FileNotFoundError(f"Audio file not found: {audio_file}")
 
-        with sr.AudioFile(audio_file) as source:
-            audio = self.recognizer.record(source)
-
-        try:
-            recognized_text = self.recognizer.recognize_google(audio)
-        except sr.UnknownValueError:
+        # Decoded and recognized segment by segment; only the final event is needed here
+        final = deque(self.stream_audio(audio_file, translate=False), maxlen=1)[0]
+        if not final["text"]:
             raise ValueError("Speech Recognition could not understand the audio")
-        except sr.RequestError as e:
-            raise ConnectionError(f"Speech Recognition API error: {e}")
 
-        return self._process_text(recognized_text)
+        return self._process_text(final["text"])
+
+    def stream_audio(self, audio, language: str = "en-US", translate: bool = True):
+        """
+        Transcribe an audio file or file object incrementally, yielding partial
+        transcripts (translated to English when `translate`) and a final event.
+        """
+        transcriber = StreamingTranscriber(
+            backend=self.speech_backend,
+            language_processor=self if translate else None,
+        )
+        return transcriber.transcribe(audio, language=language)
 
     def _detect_language(self, text: str) -> str:
         """
         Detect the language of a text string.
         """
         try:
-            if len(text.strip()) < 3:
-                return "en"  # too short → default to English
-            return detect(text)
+            return self.detector.detect(text)
         except Exception:
             return "en"
 
+    def detect_many(self, texts: List[str]) -> List[str]:
+        """
+        Detect the language of several strings at once.
+        """
+        return [self._detect_language(t) for t in texts]
+
     def translate_to_language(self, text: str, target_lang: str, source_lang: str = "en"):
         """
         Translate text into any target language.
@@ -83,11 +367,154 @@ class LanguageProcessor:
             raise ValueError("No text provided for translation")
 
         try:
-            translated = GoogleTranslator(source=source_lang, target=target_lang).translate(text)
+            if len(text) > settings.TRANSLATE_MAX_CHARS:
+                # Over the provider limit: translate sentence by sentence in packed requests
+                return self.translate_batch([text], target_lang, source_lang)[0]
+            translated = self._translate(text, source_lang, target_lang)
             return translated
         except Exception:
             return text  # fallback: return original text if translation fails
 
+    # ---------------------------
+    # Async API (for async routes)
+    # ---------------------------
+    async def _call_translator(self, text: str, source: str, target: str) -> str:
+        """One provider call: the backend's native async path if any, else the I/O pool."""
+        atranslate = getattr(self.translator, "atranslate", None)
+        if atranslate is not None:
+            return await asyncio.wait_for(atranslate(text, source, target), settings.API_TIMEOUT_SECONDS)
+        return await _offload(_blocking_pool, self.translator.translate, text, source, target)
+
+    async def _atranslate(self, text: str, source: str, target: str) -> str:
+        if source == target:
+            return text
+        # The cache is SQLite: off the event loop, on its own pool so it never queues behind speech
+        cached = await _offload(_cache_pool, self.cache.get, text, source, target)
+        if cached is not None:
+            return cached
+        translated = await self._call_translator(text, source, target)
+        if translated:
+            await _offload(_cache_pool, self.cache.set, text, source, target, translated)
+        return translated
+
+    async def _atranslate_pack(self, pack: List[str], source: str, target: str) -> List[Optional[str]]:
+        if len(pack) > 1:
+            try:
+                joined = await self._call_translator(_PACK_SEPARATOR.join(pack), source, target)
+                parts = joined.split(_PACK_SEPARATOR) if joined else []
+                if len(parts) == len(pack):
+                    return [p.strip() for p in parts]
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+        results = await asyncio.gather(
+            *(self._call_translator(segment, source, target) for segment in pack),
+            return_exceptions=True,
+        )
+        return [None if isinstance(r, BaseException) else r for r in results]
+
+    @timed("translate_batch")
+    async def atranslate_batch(self, texts: List[str], target_lang: str, source_lang: str = "en") -> List[str]:
+        """Async translate_batch: packs are sent concurrently, bounded by API_CONCURRENCY_LIMIT."""
+        if source_lang == target_lang:
+            return list(texts)
+        split, translations, packs = await _offload(_cache_pool, self._plan_batch, texts, source_lang, target_lang)
+        if packs:
+            limit = asyncio.Semaphore(settings.API_CONCURRENCY_LIMIT)
+
+            async def run(pack):
+                async with limit:
+                    return await self._atranslate_pack(pack, source_lang, target_lang)
+
+            results = await asyncio.gather(*(run(p) for p in packs))
+
+            def store():
+                for pack, translated in zip(packs, results):
+                    self._store_pack(pack, translated, source_lang, target_lang, translations)
+
+            await _offload(_cache_pool, store)
+        return self._assemble(split, translations)
+
+    async def aclose(self):
+        """Close the translator's async HTTP client, if it has one."""
+        aclose = getattr(self.translator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def atranslate_to_language(self, text: str, target_lang: str, source_lang: str = "en"):
+        """
+        Async translate_to_language; falls back to the original text on
+        provider errors and timeouts.
+        """
+        if not text:
+            raise ValueError("No text provided for translation")
+
+        try:
+            if len(text) > settings.TRANSLATE_MAX_CHARS:
+                return (await self.atranslate_batch([text], target_lang, source_lang))[0]
+            return await self._atranslate(text, source_lang, target_lang)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return text
+
+    async def aprocess_input(self, input_data: str, is_audio: bool = False):
+        """
+        Async process_input. Language detection is local and runs inline;
+        translation and speech recognition never block the event loop.
+        """
+        if not input_data:
+            raise ValueError("Input text/audio path is empty")
+
+        if is_audio:
+            return await _offload(_speech_pool, self._process_audio, input_data, timeout=settings.SPEECH_TIMEOUT_SECONDS)
+
+        detected_lang = self._detect_language(input_data)
+        if detected_lang == "en":
+            return input_data, detected_lang
+        return await self._atranslate(input_data, detected_lang, "en"), detected_lang
+
+    async def astream_audio(self, audio, language: str = "en-US", translate: bool = True) -> AsyncIterator[dict]:
+        """
+        Async stream_audio: decoding and recognition advance on the speech pool
+        one event at a time, so a slow recognizer only delays its own stream.
+        """
+        events = iter(self.stream_audio(audio, language=language, translate=translate))
+        done = object()
+        try:
+            while True:
+                event = await _offload(_speech_pool, next, events, done, timeout=settings.SPEECH_TIMEOUT_SECONDS)
+                if event is done:
+                    break
+                yield event
+        finally:
+            # Stop the generator (and its recognizer threads) if the client went away
+            try:
+                await asyncio.get_running_loop().run_in_executor(_speech_pool, events.close)
+            except ValueError:
+                pass  # a timed-out next() is still running; the generator is dropped with it
+
+
+_language_processor: Optional[LanguageProcessor] = None
+_language_processor_lock = threading.Lock()
+
+
+def get_language_processor() -> LanguageProcessor:
+    """Process-wide LanguageProcessor with the default (Google) backends."""
+    global _language_processor
+    if _language_processor is None:
+        with _language_processor_lock:
+            if _language_processor is None:
+                _language_processor = LanguageProcessor()
+    return _language_processor
+
+
+async def close_language_processor():
+    """Release the process-wide processor's HTTP clients (app shutdown)."""
+    if _language_processor is not None:
+        await _language_processor.aclose()
+
 
 # ------------------- TESTING -------------------
 if __name__ == "__main__":
@@ -2,7 +2,9 @@ import logging
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 from enum import Enum
-from api_fetcher import APIFetcher
+from app.services.api_fetcher import APIFetcher
+from app.services.advice_catalog import advice_message, render_all_en, render_en
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +72,7 @@ class ProcessingService:
         self.wet_threshold = wet_threshold
         logger.info("ProcessingService initialized with custom thresholds")
 
+    @timed("analyze_data")
     def analyze_data(
         self, 
         weather_data: Optional[Dict[str, Any]] = None, 
@@ -111,11 +114,13 @@ class ProcessingService:
                     insights["plant"] = plant_insight
             
             # Generate combined recommendations
-            insights["combined_recommendations"] = self._generate_combined_recommendations(
+            messages = self._generate_combined_messages(
                 insights.get("weather"),
                 insights.get("soil"),
                 insights.get("plant")
             )
+            insights["combined_recommendations"] = [render_en(m) for m in messages]
+            insights["combined_recommendation_messages"] = messages
             
             return insights
             
@@ -163,13 +168,13 @@ class ProcessingService:
             rainfall = rain.get("1h", 0)
             
             # Generate temperature-based advice
-            advice = self._get_temperature_advice(temp)
+            messages = [self._temperature_message(temp)]
             
             # Add humidity-based advice
             if humidity and humidity > 80:
-                advice += " High humidity may increase disease risk."
+                messages.append(advice_message("humidity.high"))
             elif humidity and humidity < 30:
-                advice += " Low humidity may stress plants."
+                messages.append(advice_message("humidity.low"))
             
             return {
                 "temperature": temp,
@@ -177,7 +182,8 @@ class ProcessingService:
                 "humidity": humidity,
                 "condition": condition,
                 "rainfall": rainfall,
-                "advice": advice.strip()
+                "advice": render_all_en(messages),
+                "advice_messages": messages
             }
             
         except Exception as e:
@@ -186,15 +192,19 @@ class ProcessingService:
 
     def _get_temperature_advice(self, temp: Optional[float]) -> str:
         """Generate advice based on temperature"""
+        return render_en(self._temperature_message(temp))
+
+    def _temperature_message(self, temp: Optional[float]) -> Dict[str, Any]:
+        """Advice message ID for a temperature reading"""
         if not temp:
-            return "Temperature data unavailable."
+            return advice_message("temp.unavailable")
         
         if temp < self.cold_threshold:
-            return "Cold conditions detected. Protect sensitive crops and consider frost protection measures."
+            return advice_message("temp.cold")
         elif temp > self.hot_threshold:
-            return "High temperature alert. Ensure adequate irrigation and consider shade for sensitive plants."
+            return advice_message("temp.hot")
         else:
-            return "Temperature is favorable for most crops."
+            return advice_message("temp.favorable")
 
     def _analyze_soil(self, agro_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -212,25 +222,28 @@ class ProcessingService:
             nitrogen = agro_data.get("t0") or agro_data.get("nitrogen")
             temperature = agro_data.get("t10")  # Soil temperature
             
-            advice = []
+            messages = []
             
             # Moisture analysis
             if soil_moisture is not None:
-                moisture_advice = self._get_moisture_advice(soil_moisture)
-                advice.append(moisture_advice)
+                messages.append(self._moisture_message(soil_moisture))
             
             # Soil temperature analysis
             if temperature is not None:
                 if temperature < 10:
-                    advice.append("Soil temperature is low, which may slow seed germination.")
+                    messages.append(advice_message("soil_temp.low"))
                 elif temperature > 30:
-                    advice.append("Soil temperature is high, monitor for heat stress.")
+                    messages.append(advice_message("soil_temp.high"))
+            
+            if not messages:
+                messages.append(advice_message("soil.normal"))
             
             return {
                 "moisture": soil_moisture,
                 "nitrogen": nitrogen,
                 "soil_temperature": temperature,
-                "advice": " ".join(advice) if advice else "Soil conditions appear normal."
+                "advice": render_all_en(messages),
+                "advice_messages": messages
             }
             
         except Exception as e:
@@ -239,12 +252,16 @@ class ProcessingService:
 
     def _get_moisture_advice(self, moisture: float) -> str:
         """Generate advice based on soil moisture level"""
+        return render_en(self._moisture_message(moisture))
+
+    def _moisture_message(self, moisture: float) -> Dict[str, Any]:
+        """Advice message ID for a soil moisture level"""
         if moisture < self.dry_threshold:
-            return "Soil moisture is critically low. Immediate irrigation recommended."
+            return advice_message("moisture.dry")
         elif moisture > self.wet_threshold:
-            return "Soil moisture is excessive. Reduce irrigation and ensure proper drainage."
+            return advice_message("moisture.wet")
         else:
-            return "Soil moisture levels are optimal."
+            return advice_message("moisture.optimal")
 
     def _analyze_plant(self, plant_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -260,10 +277,12 @@ class ProcessingService:
             suggestions = plant_info.get("suggestions", [])
             
             if not suggestions:
+                message = advice_message("plant.no_match")
                 return {
                     "identified_as": "Unknown",
                     "confidence": 0.0,
-                    "message": "No plant identification matches found."
+                    "message": render_en(message),
+                    "advice_messages": [message]
                 }
             
             best_match = suggestions[0]
@@ -333,6 +352,16 @@ class ProcessingService:
         Returns:
             List of prioritized recommendations
         """
+        return [render_en(m) for m in self._generate_combined_messages(weather, soil, plant)]
+
+    def _generate_combined_messages(self,
+                                    weather: Optional[Dict],
+                                    soil: Optional[Dict],
+                                    plant: Optional[Dict]) -> List[Dict[str, Any]]:
+        """
+        Same as _generate_combined_recommendations, as localizable advice
+        message IDs with parameters.
+        """
         recommendations = []
         
         # Critical weather + soil combination
@@ -342,15 +371,9 @@ class ProcessingService:
             
             if temp and moisture is not None:
                 if temp > self.hot_threshold and moisture < self.dry_threshold:
-                    recommendations.append(
-                        "🚨 URGENT: High temperature and low soil moisture detected. "
-                        "Increase irrigation immediately to prevent crop stress."
-                    )
+                    recommendations.append(advice_message("combined.heat_dry"))
                 elif temp < self.cold_threshold and moisture > self.wet_threshold:
-                    recommendations.append(
-                        "⚠️ WARNING: Cold and wet conditions increase disease risk. "
-                        "Ensure proper drainage and consider fungicide application."
-                    )
+                    recommendations.append(advice_message("combined.cold_wet"))
         
         # Rainfall and moisture correlation
         if weather and soil:
@@ -358,18 +381,14 @@ class ProcessingService:
             moisture = soil.get("moisture")
             
             if rainfall > 5 and moisture and moisture > self.wet_threshold:
-                recommendations.append(
-                    "Recent rainfall with high soil moisture. Skip irrigation and monitor for waterlogging."
-                )
+                recommendations.append(advice_message("combined.rain_wet"))
         
         # Plant-specific recommendations
         if plant and plant.get("confidence_level") in ["high", "very high"]:
             plant_name = plant.get("identified_as")
-            recommendations.append(
-                f"Plant identified as {plant_name}. Adjust care based on species-specific requirements."
-            )
+            recommendations.append(advice_message("combined.plant_identified", plant_name=plant_name))
         
         if not recommendations:
-            recommendations.append("Continue regular monitoring and maintenance schedules.")
+            recommendations.append(advice_message("combined.monitor"))
         
         return recommendations
\ No newline at end of file
@@ -1,26 +1,74 @@
 # backend/app/services/response_service.py
+import copy
 import logging
-from typing import List, Dict
-from ..services.language_service import LanguageProcessor  # adjust import path if needed
+from typing import Any, List, Dict, Optional, Tuple
+from .language_services import LanguageProcessor
+from .advice_catalog import AdviceCatalog, advice_message, get_advice_catalog, render_en
+from .knowledge_base import KnowledgeBase, get_knowledge_base
+from .answer_cache import AnswerCache, AnswerContext, get_answer_cache
+from app.utils.config import settings
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
 class ResponseService:
-    def __init__(self, language_processor: LanguageProcessor):
+    def __init__(self, language_processor: LanguageProcessor, catalog: Optional[AdviceCatalog] = None,
+                 knowledge_base: Optional[KnowledgeBase] = None, answer_cache: Optional[AnswerCache] = None):
         self.lang_proc = language_processor
+        self.catalog = catalog or get_advice_catalog()
+        self.knowledge_base = knowledge_base or get_knowledge_base()
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
 
-    def assemble(self, query: str, ranked_results: List[Dict], user_lang: str) -> Dict:
+    def localize_message(self, message: Dict[str, Any], user_lang: str) -> str:
+        """Catalog lookup for an advice message; machine translation only if the catalog lacks it."""
+        localized = self.catalog.localize(message, user_lang)
+        if localized is None:
+            localized = self.lang_proc.translate_to_language(render_en(message), user_lang)
+        return localized
+
+    def localize_insights(self, insights: Dict[str, Any], user_lang: str) -> Dict[str, Any]:
+        """
+        Add `advice_local` to each insight section and `combined_recommendations_local`
+        to ProcessingService.analyze_data output, in the user's language.
+        """
+        localized = copy.deepcopy(insights)
+        for section in ("weather", "soil", "plant"):
+            part = localized.get(section)
+            if part and part.get("advice_messages"):
+                part["advice_local"] = " ".join(
+                    self.localize_message(m, user_lang) for m in part["advice_messages"]
+                )
+        messages = localized.get("combined_recommendation_messages")
+        if messages:
+            localized["combined_recommendations_local"] = [self.localize_message(m, user_lang) for m in messages]
+        return localized
+
+    def _translate_back(self, texts: List[str], user_lang: str) -> Tuple[List[str], bool]:
+        """(texts in the user's language, whether all of it got translated); English where it didn't."""
+        try:
+            # One batched call: shared sentences are translated once, long text is split
+            return self.lang_proc.translate_batch_checked(texts, user_lang)
+        except Exception as e:
+            logger.warning(f"Translation back to user language failed: {e}")
+            return list(texts), False
+
+    @timed("assemble_answer")
+    def assemble(self, query: str, ranked_results: List[Dict], user_lang: str) -> Tuple[Dict, bool]:
         """
         Build a user-facing response:
           - short_answer (one-liner)
           - detailed (top N results compiled)
           - meta (sources)
-        Then translate to user's language and return both en + translated.
+        Then translate to user's language and return both en + translated,
+        and whether the translation succeeded (False: *_local fell back to English).
         """
         if not ranked_results:
-            fallback = "I'm sorry — I couldn't find a clear answer. Try rephrasing or ask about something else."
-            translated = self.lang_proc.translate_to_language(fallback, user_lang)
-            return {"answer_en": fallback, "answer_local": translated, "sources": []}
+            message = advice_message("response.no_answer")
+            fallback = render_en(message)
+            translated, complete = self.catalog.localize(message, user_lang), True
+            if translated is None:
+                (translated,), complete = self._translate_back([fallback], user_lang)
+            return {"answer_en": fallback, "answer_local": translated, "sources": []}, complete
 
         top = ranked_results[0]
         short_answer_en = top["title"] or (top["body"][:200] + "...")
@@ -32,12 +80,7 @@ class ResponseService:
 
         # Optionally post-process / shorten the detailed text
         # Translate back to user language
-        try:
-            short_local = self.lang_proc.translate_to_language(short_answer_en, user_lang)
-            detailed_local = self.lang_proc.translate_to_language(detailed_en, user_lang)
-        except Exception as e:
-            logger.warning(f"Translation back to user language failed: {e}")
-            short_local, detailed_local = short_answer_en, detailed_en
+        (short_local, detailed_local), complete = self._translate_back([short_answer_en, detailed_en], user_lang)
 
         sources = [{"source": r["source"], "type": r["type"], "score": r["score"]} for r in ranked_results]
 
@@ -47,4 +90,32 @@ class ResponseService:
             "detailed_en": detailed_en,
             "detailed_local": detailed_local,
             "sources": sources
-        }
+        }, complete
+
+    def cached_answer(self, query_en: str, user_lang: str,
+                      context: Optional[AnswerContext] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """Answer cache lookup: (key, cached answer or None). Cached answers are shared, don't mutate them."""
+        key = self.answer_cache.make_key(query_en, user_lang, context, self.knowledge_base.version)
+        return key, self.answer_cache.get(key)
+
+    def build_answer(self, query_en: str, user_lang: str, context: Optional[AnswerContext] = None,
+                     key: Optional[str] = None) -> Dict:
+        """Retrieve the best passages for an English query, assemble the localized answer and cache it under key."""
+        query = query_en
+        if context is not None and context.crop and context.crop.lower() not in query_en.lower():
+            query = f"{query_en} {context.crop}"  # favour passages about the user's crop
+        ranked_results = self.knowledge_base.search(query, settings.KNOWLEDGE_TOP_K)
+        answer, complete = self.assemble(query_en, ranked_results, user_lang)
+        if complete:
+            self.answer_cache.set(key, answer)
+        else:
+            # Not cached: the English fallback would be served to every user asking this for hours
+            logger.info(f"Answer for {user_lang} not cached, translation incomplete")
+        return answer
+
+    def answer(self, query_en: str, user_lang: str, context: Optional[AnswerContext] = None) -> Dict:
+        """Localized answer to an English query, from the answer cache when possible."""
+        key, cached = self.cached_answer(query_en, user_lang, context)
+        if cached is not None:
+            return cached
+        return self.build_answer(query_en, user_lang, context, key)
@@ -0,0 +1,390 @@
+"""
+In-memory spatial index over farm coordinates, for proximity queries and
+grid grouping without scanning the farms table.
+
+    index = get_spatial_index()
+    index.within_radius(28.61, 77.21, radius_km=10)       # [(farm_id, km), ...] nearest first
+    index.within_bbox(28.0, 76.5, 29.0, 78.0)             # [farm_id, ...]
+    index.nearest(28.61, 77.21, k=5)                      # [(farm_id, km), ...] nearest first
+    index.group_by_cell(settings.GRID_CELL_DEGREES)       # {grid_cell: [farm_id, ...]}
+
+Coordinates live in NumPy arrays (one slot per farm, freed slots reused)
+and slots are bucketed by SPATIAL_INDEX_CELL_DEGREES cells, so a query
+only gathers the cells it overlaps and measures haversine distances over
+those candidates in one vectorized pass.
+
+The index loads from the farms table on first use. Writers call
+farm_changed() / owner_changed() after committing; the change is applied
+locally and announced through the shared cache's invalidation log, and
+other workers reload the announced farms on their next query (or rebuild
+if they fell behind the log). Without a shared cache each worker only
+sees its own writes after loading.
+"""
+import math
+import sqlite3
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app import models
+from app.database import SessionLocal
+from app.utils.config import settings
+from app.utils.shared_cache import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Namespace of the change announcements in the shared invalidation log
+NAMESPACE = "farm_locations"
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one point to arrays of points."""
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Farm id -> (lat, lon), queryable by radius, bounding box and nearest neighbours. Thread-safe."""
+
+    def __init__(self, cell_degrees: float = settings.SPATIAL_INDEX_CELL_DEGREES,
+                 session_factory: Callable = SessionLocal, capacity: int = 1024):
+        self.cell_degrees = cell_degrees
+        self.session_factory = session_factory
+        self._rows = int(math.ceil(180 / cell_degrees)) + 1
+        self._cols = int(math.ceil(360 / cell_degrees))
+        self._lock = threading.RLock()
+        self._reset(capacity)
+        # shared log position, plus our own announcements (already applied here)
+        self._seq = 0
+        self._own: Set[int] = set()
+        self._checked_at = 0.0
+        self._sync_lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+
+    def _reset(self, capacity: int):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lat = np.full(capacity, np.nan)
+        self._lon = np.full(capacity, np.nan)
+        self._size = 0                      # slots in use or freed
+        self._free: List[int] = []
+        self._slots: Dict[int, int] = {}    # farm id -> slot
+        self._cells: Dict[int, Set[int]] = {}
+        self._cell_arrays: Dict[int, np.ndarray] = {}  # cached np.array(self._cells[key])
+
+    # ---------------------------
+    # Cells
+    # ---------------------------
+    def _row(self, lat: float) -> int:
+        return min(int((lat + 90) // self.cell_degrees), self._rows - 1)
+
+    def _col(self, lon: float) -> int:
+        return int(((lon + 180) % 360) // self.cell_degrees) % self._cols
+
+    def _cell_slots(self, key: int) -> Optional[np.ndarray]:
+        array = self._cell_arrays.get(key)
+        if array is None:
+            slots = self._cells.get(key)
+            if not slots:
+                return None
+            array = self._cell_arrays[key] = np.fromiter(slots, dtype=np.int64, count=len(slots))
+        return array
+
+    def _candidates(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """Slots of every cell overlapping the box; min_lon > max_lon wraps the antimeridian."""
+        rows = range(self._row(max(min_lat, -90.0)), self._row(min(max_lat, 90.0)) + 1)
+        if max_lon - min_lon >= 360 - self.cell_degrees:
+            cols = range(self._cols)
+        else:
+            first = self._col(min_lon)
+            cols = [(first + offset) % self._cols for offset in range((self._col(max_lon) - first) % self._cols + 1)]
+        if len(rows) * len(cols) > len(self._cells):
+            # Sparser to walk the occupied cells than the box
+            row_set, col_set = set(rows), set(cols)
+            keys = [key for key in self._cells if key // self._cols in row_set and key % self._cols in col_set]
+        else:
+            keys = [row * self._cols + col for row in rows for col in cols]
+        arrays = [array for array in map(self._cell_slots, keys) if array is not None]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    # ---------------------------
+    # Updates
+    # ---------------------------
+    def load(self, rows: Iterable[Tuple[int, float, float]]):
+        """Replace the contents with (farm_id, lat, lon) rows."""
+        ids, lats, lons = [], [], []
+        for farm_id, lat, lon in rows:
+            if lat is not None and lon is not None:
+                ids.append(farm_id)
+                lats.append(lat)
+                lons.append(lon)
+        count = len(ids)
+        ids_array = np.array(ids, dtype=np.int64)
+        lat_array, lon_array = np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64)
+        rows_index = np.minimum(((lat_array + 90) // self.cell_degrees).astype(np.int64), self._rows - 1)
+        cols_index = (((lon_array + 180) % 360) // self.cell_degrees).astype(np.int64) % self._cols
+        keys = rows_index * self._cols + cols_index
+        order = np.argsort(keys, kind="stable")
+        boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+        with self._lock:
+            self._reset(max(1024, count + count // 4))
+            self._ids[:count], self._lat[:count], self._lon[:count] = ids_array, lat_array, lon_array
+            self._size = count
+            self._slots = dict(zip(ids, range(count)))
+            for group in np.split(order, boundaries) if count else []:
+                key = int(keys[group[0]])
+                self._cells[key] = set(group.tolist())
+                self._cell_arrays[key] = group
+            self.loaded_at = time.time()
+
+    def upsert(self, farm_id: int, latitude: Optional[float], longitude: Optional[float]):
+        """Add or move a farm in this process only; missing coordinates remove it."""
+        if latitude is None or longitude is None:
+            self.remove(farm_id)
+            return
+        with self._lock:
+            slot = self._slots.get(farm_id)
+            if slot is not None:
+                self._unlink(slot)
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                if self._size == len(self._ids):
+                    self._grow()
+                slot = self._size
+                self._size += 1
+            self._slots[farm_id] = slot
+            self._ids[slot], self._lat[slot], self._lon[slot] = farm_id, latitude, longitude
+            key = self._row(latitude) * self._cols + self._col(longitude)
+            self._cells.setdefault(key, set()).add(slot)
+            self._cell_arrays.pop(key, None)
+
+    def remove(self, farm_id: int):
+        with self._lock:
+            slot = self._slots.pop(farm_id, None)
+            if slot is not None:
+                self._unlink(slot)
+                self._lat[slot] = self._lon[slot] = np.nan
+                self._free.append(slot)
+
+    def _unlink(self, slot: int):
+        key = self._row(self._lat[slot]) * self._cols + self._col(self._lon[slot])
+        slots = self._cells.get(key)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del self._cells[key]
+            self._cell_arrays.pop(key, None)
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        self._lat = np.concatenate([self._lat, np.full(capacity - len(self._lat), np.nan)])
+        self._lon = np.concatenate([self._lon, np.full(capacity - len(self._lon), np.nan)])
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def within_radius(self, latitude: float, longitude: float, radius_km: float,
+                      limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(farm_id, distance_km) of farms within radius_km, nearest first."""
+        self._ensure_current()
+        dlat = radius_km / KM_PER_DEGREE
+        min_lat, max_lat = latitude - dlat, latitude + dlat
+        if min_lat <= -90 or max_lat >= 90:
+            dlon = 360.0  # the circle contains a pole
+        else:
+            dlon = min(360.0, dlat / max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-9))
+        with self._lock:
+            slots = self._candidates(min_lat, max_lat, longitude - dlon, longitude + dlon)
+            distances = haversine_km(latitude, longitude, self._lat[slots], self._lon[slots])
+            inside = distances <= radius_km
+            slots, distances = slots[inside], distances[inside]
+            if limit is not None and limit < len(slots):
+                first = np.argpartition(distances, limit)[:limit]
+                slots, distances = slots[first], distances[first]
+            order = np.argsort(distances, kind="stable")
+            ids = self._ids[slots[order]]
+        return list(zip(ids.tolist(), np.round(distances[order], 3).tolist()))
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    limit: Optional[int] = None) -> List[int]:
+        """Ids of farms inside the box; min_lon > max_lon means the box crosses the antimeridian."""
+        self._ensure_current()
+        with self._lock:
+            slots = self._candidates(min_lat, max_lat, min_lon, max_lon)
+            lats, lons = self._lat[slots], self._lon[slots]
+            inside = (lats >= min_lat) & (lats <= max_lat)
+            if min_lon <= max_lon:
+                inside &= (lons >= min_lon) & (lons <= max_lon)
+            else:
+                inside &= (lons >= min_lon) | (lons <= max_lon)
+            ids = self._ids[slots[inside]]
+        ids.sort()
+        return ids[:limit].tolist() if limit is not None else ids.tolist()
+
+    def nearest(self, latitude: float, longitude: float, k: int = 10) -> List[Tuple[int, float]]:
+        """The k farms closest to a point, as (farm_id, distance_km), nearest first."""
+        radius = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            found = self.within_radius(latitude, longitude, radius, limit=k)
+            if len(found) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return found
+            radius *= 4
+
+    def group_by_cell(self, size_degrees: float = settings.GRID_CELL_DEGREES) -> Dict[str, List[int]]:
+        """Farm ids per grid_cell() key, for cells of size_degrees."""
+        self._ensure_current()
+        with self._lock:
+            live = np.flatnonzero(~np.isnan(self._lat[:self._size]))
+            ids = self._ids[live]
+            rows = np.floor_divide(self._lat[live], size_degrees).astype(np.int64)
+            cols = np.floor_divide(self._lon[live], size_degrees).astype(np.int64)
+        if not len(ids):
+            return {}
+        keys = (rows - rows.min()) * (int(cols.max() - cols.min()) + 1) + (cols - cols.min())
+        order = np.argsort(keys, kind="stable")
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(keys[order])) + 1])
+        first = order[starts]
+        labels = (f"{row}:{col}" for row, col in zip(rows[first].tolist(), cols[first].tolist()))
+        return dict(zip(labels, (group.tolist() for group in np.split(ids[order], starts[1:]))))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = [len(slots) for slots in self._cells.values()]
+            return {
+                "farms": len(self._slots),
+                "cells": len(sizes),
+                "max_per_cell": max(sizes, default=0),
+                "cell_degrees": self.cell_degrees,
+                "capacity": len(self._ids),
+                "memory_bytes": self._ids.nbytes + self._lat.nbytes + self._lon.nbytes,
+                "loaded_at": self.loaded_at,
+                "log_seq": self._seq,
+            }
+
+    # ---------------------------
+    # Database and other workers
+    # ---------------------------
+    def reload(self):
+        """Rebuild from the farms table."""
+        store = get_shared_store()
+        with self._sync_lock:
+            # Log position first: changes committed during the load are replayed, not lost
+            seq = store.last_seq() if store is not None else 0
+            with self.session_factory() as db:
+                rows = (
+                    db.query(models.Farm.id, models.Farm.latitude, models.Farm.longitude)
+                    .filter(models.Farm.latitude.isnot(None), models.Farm.longitude.isnot(None))
+                    .yield_per(10000)
+                )
+                self.load(rows)
+            self._seq = seq
+            # Local updates made while loading may have been overwritten: replay ours too
+            self._own.clear()
+        logger.info(f"Farm spatial index loaded: {len(self)} farms in {len(self._cells)} cells")
+
+    def _ensure_current(self):
+        if self.loaded_at is None:
+            with self._sync_lock:
+                if self.loaded_at is None:
+                    self.reload()
+        self._sync()
+
+    def _refresh(self, farm_ids: Iterable[int] = (), owner_id: Optional[int] = None):
+        """Re-read some farms (by id or owner) from the database."""
+        farm_ids = set(farm_ids)
+        with self.session_factory() as db:
+            q = db.query(models.Farm.id, models.Farm.latitude, models.Farm.longitude)
+            q = q.filter(models.Farm.owner_id == owner_id) if owner_id is not None else \
+                q.filter(models.Farm.id.in_(farm_ids))
+            rows = q.all()
+        for farm_id, lat, lon in rows:
+            self.upsert(farm_id, lat, lon)
+            farm_ids.discard(farm_id)
+        for farm_id in farm_ids:  # deleted
+            self.remove(farm_id)
+
+    def _sync(self):
+        """Apply farm changes other workers announced since the last poll."""
+        store = get_shared_store()
+        now = time.monotonic()
+        if store is None or now - self._checked_at < settings.SHARED_CACHE_POLL_SECONDS \
+                or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            changes = store.invalidations_since(self._seq)
+            if changes and changes[0][0] > self._seq + 1:
+                # The log was pruned past our position: some changes are gone
+                self.reload()
+                return
+            farm_ids, owners, rebuild = set(), set(), False
+            for seq, namespace, key in changes:
+                self._seq = seq
+                if seq in self._own:
+                    self._own.discard(seq)
+                elif namespace != NAMESPACE:
+                    continue
+                elif key is None:
+                    rebuild = True
+                elif key.startswith("owner:"):
+                    owners.add(int(key[len("owner:"):]))
+                else:
+                    farm_ids.add(int(key))
+            if rebuild:
+                self.reload()
+                return
+            if farm_ids:
+                self._refresh(farm_ids)
+            for owner_id in owners:
+                self._refresh(owner_id=owner_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Spatial index poll failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def _announce(self, key: str):
+        store = get_shared_store()
+        if store is None:
+            return
+        try:
+            self._own.add(store.announce(NAMESPACE, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Announcing farm change {key} failed: {e}")
+
+    # Announce before applying locally, so a reload() racing with the update replays it
+    def farm_changed(self, farm_id: int, latitude: Optional[float], longitude: Optional[float]):
+        """A farm was added, moved or deleted (no coordinates); call after the commit."""
+        self._announce(str(farm_id))
+        if self.loaded_at is not None:
+            self.upsert(farm_id, latitude, longitude)
+
+    def owner_changed(self, owner_id: int):
+        """Many farms of one owner changed (e.g. a bulk import); call after the commit."""
+        self._announce(f"owner:{owner_id}")
+        if self.loaded_at is not None:
+            self._refresh(owner_id=owner_id)
+
+
+_index: Optional[SpatialIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index() -> SpatialIndex:
+    """Process-wide index; loads from the database on its first query."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SpatialIndex()
+    return _index
@@ -0,0 +1,244 @@
+import time
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Protocol, Union
+
+import numpy as np
+import soundfile as sf
+import speech_recognition as sr
+
+from app.utils.config import settings
+from app.utils.metrics import upstream_latency
+
+logger = logging.getLogger(__name__)
+
+# Recognizer calls of every stream share these threads, so concurrent
+# recognitions (and recognizer quota) are bounded per process, not per stream
+_recognition_pool = ThreadPoolExecutor(max_workers=settings.API_CONCURRENCY_LIMIT, thread_name_prefix="speech")
+
+
+class SpeechBackend(Protocol):
+    """Turns one mono 16-bit PCM segment into text; swap in a fake for offline runs."""
+
+    def recognize(self, pcm: bytes, sample_rate: int, language: str) -> str:
+        ...
+
+
+class GoogleSpeechBackend:
+    """speech_recognition's free Google Web Speech endpoint."""
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, pcm: bytes, sample_rate: int, language: str) -> str:
+        audio = sr.AudioData(pcm, sample_rate, 2)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            text = self.recognizer.recognize_google(audio, language=language)
+            status = "ok"
+            return text
+        except sr.UnknownValueError:
+            status = "no_speech"
+            return ""
+        except sr.RequestError as e:
+            raise ConnectionError(f"Speech Recognition API error: {e}")
+        finally:
+            upstream_latency.labels(provider="google_speech", status=status).observe(time.perf_counter() - start)
+
+
+class FakeSpeechBackend:
+    """Offline stand-in: returns canned transcripts in order (or a duration marker)."""
+
+    def __init__(self, transcripts: Optional[List[str]] = None):
+        self.transcripts = list(transcripts or [])
+        self.calls = 0
+
+    def recognize(self, pcm: bytes, sample_rate: int, language: str) -> str:
+        self.calls += 1
+        if self.transcripts:
+            return self.transcripts.pop(0)
+        return f"segment of {len(pcm) / 2 / sample_rate:.1f}s"
+
+
+class EnergyVAD:
+    """
+    Streaming energy-based voice activity detector. Feed it blocks of float
+    samples; it yields speech segments as soon as a long enough pause ends
+    them (or they hit max_segment_seconds).
+    """
+
+    def __init__(self,
+                 sample_rate: int,
+                 frame_ms: int = 30,
+                 min_silence_ms: int = 500,
+                 min_speech_ms: int = 200,
+                 padding_ms: int = 200,
+                 max_segment_seconds: float = 15.0,
+                 threshold_ratio: float = 3.0,
+                 min_rms: float = 0.01):
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_segment_frames = max(1, int(max_segment_seconds * 1000 // frame_ms))
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.noise_floor = min_rms / threshold_ratio
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=max(1, padding_ms // frame_ms))
+        self._segment: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    def _is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame * frame)))
+        speech = rms > max(self.min_rms, self.noise_floor * self.threshold_ratio)
+        if not speech:
+            # Track background noise so the threshold adapts to the recording
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+    def _emit(self) -> Optional[np.ndarray]:
+        segment = None
+        if self._speech_frames >= self.min_speech_frames:
+            keep = len(self._segment) - max(0, self._silence_run - self._preroll.maxlen)
+            segment = np.concatenate(self._segment[:keep])
+        self._segment, self._speech_frames, self._silence_run = [], 0, 0
+        return segment
+
+    def feed(self, samples: np.ndarray) -> Iterator[np.ndarray]:
+        data = np.concatenate([self._pending, samples.astype(np.float32, copy=False)])
+        n_frames = len(data) // self.frame_len
+        self._pending = data[n_frames * self.frame_len:]
+
+        for i in range(n_frames):
+            frame = data[i * self.frame_len:(i + 1) * self.frame_len]
+            speech = self._is_speech(frame)
+            if not self._segment:
+                if speech:
+                    self._segment = list(self._preroll) + [frame]
+                    self._speech_frames = 1
+                    self._preroll.clear()
+                else:
+                    self._preroll.append(frame)
+                continue
+
+            self._segment.append(frame)
+            if speech:
+                self._speech_frames += 1
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+
+            if self._silence_run >= self.min_silence_frames or len(self._segment) >= self.max_segment_frames:
+                segment = self._emit()
+                if segment is not None:
+                    yield segment
+
+    def flush(self) -> Iterator[np.ndarray]:
+        if len(self._pending) and self._segment:
+            self._segment.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        if self._segment:
+            segment = self._emit()
+            if segment is not None:
+                yield segment
+
+
+def iter_audio_blocks(source: Union[str, BinaryIO], block_seconds: float = 0.5) -> Iterator[tuple]:
+    """Decode audio incrementally as (mono float32 block, sample_rate) pairs."""
+    info = sf.info(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    blocksize = max(1, int(info.samplerate * block_seconds))
+    for block in sf.blocks(source, blocksize=blocksize, dtype="float32", always_2d=True):
+        yield block.mean(axis=1), info.samplerate
+
+
+def _to_pcm16(samples: np.ndarray) -> bytes:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class StreamingTranscriber:
+    """
+    Chunked speech-to-text: decodes audio block by block, splits it on
+    silence, recognizes segments concurrently and yields events in order:
+
+        {"type": "partial", "index", "text", "text_en", "language"}  per segment
+        {"type": "final", "text", "text_en", "language"}             at the end
+    """
+
+    def __init__(self, backend: Optional[SpeechBackend] = None, language_processor=None,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            backend: speech recognizer (defaults to GoogleSpeechBackend)
+            language_processor: LanguageProcessor used to detect/translate each
+                segment to English; None skips translation
+            max_workers: this stream's share of the process-wide recognition pool;
+                at most twice this many segments are queued (defaults to API_CONCURRENCY_LIMIT)
+        """
+        self.backend = backend or GoogleSpeechBackend()
+        self.language_processor = language_processor
+        self.max_workers = max_workers or settings.API_CONCURRENCY_LIMIT
+
+    def _recognize(self, segment: np.ndarray, sample_rate: int, language: str) -> Dict[str, Any]:
+        text = self.backend.recognize(_to_pcm16(segment), sample_rate, language).strip()
+        text_en, detected = text, None
+        if text and self.language_processor is not None:
+            text_en, detected = self.language_processor.process_input(text)
+        return {"text": text, "text_en": text_en, "language": detected}
+
+    def transcribe(self, source: Union[str, BinaryIO], language: str = "en-US") -> Iterator[Dict[str, Any]]:
+        futures = deque()
+        results: List[Dict[str, Any]] = []
+        vad = None
+        # Queued segments hold their audio: decoding waits once this many are in flight
+        max_in_flight = 2 * self.max_workers
+
+        def emit() -> Dict[str, Any]:
+            result = futures.popleft().result()
+            result.update({"type": "partial", "index": len(results)})
+            results.append(result)
+            return result
+
+        def ready(block: bool):
+            # Yield finished segments in order; wait for the head only when draining
+            while futures and (block or futures[0].done()):
+                yield emit()
+
+        def submit(segment: np.ndarray, sample_rate: int):
+            while len(futures) >= max_in_flight:
+                yield emit()
+            # In the caller's context, so recognizer spans reach the request trace
+            futures.append(_recognition_pool.submit(
+                contextvars.copy_context().run, self._recognize, segment, sample_rate, language))
+
+        try:
+            for samples, sample_rate in iter_audio_blocks(source):
+                if vad is None:
+                    vad = EnergyVAD(sample_rate)
+                for segment in vad.feed(samples):
+                    yield from submit(segment, sample_rate)
+                yield from ready(block=False)
+            if vad is not None:
+                for segment in vad.flush():
+                    yield from submit(segment, sample_rate)
+            yield from ready(block=True)
+        finally:
+            # Closed early (client gone): drop queued recognitions rather than
+            # spend recognizer quota on them; running ones finish in the background
+            for future in futures:
+                future.cancel()
+
+        spoken = [r for r in results if r["text"]]
+        languages = [r["language"] for r in spoken if r["language"]]
+        yield {
+            "type": "final",
+            "text": " ".join(r["text"] for r in spoken),
+            "text_en": " ".join(r["text_en"] for r in spoken),
+            "language": max(set(languages), key=languages.count) if languages else None,
+        }
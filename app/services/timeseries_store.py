@@ -0,0 +1,390 @@
+"""
+Weather/soil history per grid cell, stored as flat arrays of fixed-size
+records so range queries are a memory map plus a slice.
+
+    <TIMESERIES_DIR>/<source>/<cell>/raw-YYYYMMDD.bin    every reading
+    <TIMESERIES_DIR>/<source>/<cell>/hour-YYYYMM.bin     hourly mean/min/max
+    <TIMESERIES_DIR>/<source>/<cell>/day-YYYY.bin        daily mean/min/max
+    <TIMESERIES_DIR>/<source>/<cell>/state.json          rollup watermarks
+
+maintain() rolls completed hours and days up and deletes partitions past
+their retention. Readings that arrive after their hour was rolled up stay
+in the raw tier only. Appends, rollups and retention hold an flock on the
+cell directory, so workers sharing TIMESERIES_DIR neither store the same
+reading twice nor roll the same hour up twice.
+"""
+import os
+import json
+import fcntl
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fields kept per source, extracted from the OpenWeather / AgroMonitoring payloads
+SOURCE_FIELDS: Dict[str, Sequence[str]] = {
+    "weather": ("temp", "humidity", "pressure", "wind_speed", "clouds", "rain_1h"),
+    "soil": ("moisture", "t0", "t10"),
+}
+RESOLUTIONS = ("raw", "hour", "day")
+_HOUR = 3600
+_DAY = 86400
+
+
+def _raw_dtype(source: str) -> np.dtype:
+    return np.dtype([("time", "<f8")] + [(f, "<f4") for f in SOURCE_FIELDS[source]])
+
+
+def _rollup_dtype(source: str) -> np.dtype:
+    fields = [("time", "<f8"), ("count", "<u4")]
+    for f in SOURCE_FIELDS[source]:
+        fields += [(f, "<f4"), (f"{f}_min", "<f4"), (f"{f}_max", "<f4")]
+    return np.dtype(fields)
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _partition(resolution: str, ts: float) -> str:
+    day = _utc(ts)
+    if resolution == "raw":
+        return f"raw-{day:%Y%m%d}.bin"
+    if resolution == "hour":
+        return f"hour-{day:%Y%m}.bin"
+    return f"day-{day:%Y}.bin"
+
+
+def _partition_start(name: str) -> float:
+    """Start of the period a partition file covers (UTC epoch seconds)."""
+    stem = name.split("-", 1)[1].split(".", 1)[0]
+    fmt = {8: "%Y%m%d", 6: "%Y%m", 4: "%Y"}[len(stem)]
+    return datetime.strptime(stem, fmt).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _value(data: Dict[str, Any], *path: str) -> float:
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return np.nan
+        data = data[key]
+    try:
+        return float(data)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def extract_weather(weather: Dict[str, Any]) -> Dict[str, float]:
+    """OpenWeather current-weather payload -> weather fields (rain defaults to 0)."""
+    rain = _value(weather, "rain", "1h")
+    return {
+        "temp": _value(weather, "main", "temp"),
+        "humidity": _value(weather, "main", "humidity"),
+        "pressure": _value(weather, "main", "pressure"),
+        "wind_speed": _value(weather, "wind", "speed"),
+        "clouds": _value(weather, "clouds", "all"),
+        "rain_1h": 0.0 if np.isnan(rain) else rain,
+    }
+
+
+def extract_soil(soil: Dict[str, Any]) -> Dict[str, float]:
+    """AgroMonitoring soil payload -> soil fields (temperatures in Kelvin, as sent)."""
+    return {f: _value(soil, f) for f in SOURCE_FIELDS["soil"]}
+
+
+def _aggregate(records: np.ndarray, source: str, bucket_seconds: int, from_rollup: bool = False) -> np.ndarray:
+    """
+    Group time-sorted records into buckets and compute count and NaN-aware
+    mean/min/max per field. Rolling up a rollup (from_rollup) weights means
+    by count and combines the min/max columns.
+    """
+    out_dtype = _rollup_dtype(source)
+    if len(records) == 0:
+        return np.zeros(0, dtype=out_dtype)
+    buckets = np.floor(records["time"] / bucket_seconds) * bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    out = np.zeros(len(starts), dtype=out_dtype)
+    out["time"] = buckets[starts]
+    weights = records["count"].astype(np.float64) if "count" in records.dtype.names else np.ones(len(records))
+    out["count"] = np.add.reduceat(weights, starts).astype(np.uint32)
+
+    for f in SOURCE_FIELDS[source]:
+        values = records[f].astype(np.float64)
+        valid = ~np.isnan(values)
+        total = np.add.reduceat(np.where(valid, values * weights, 0.0), starts)
+        n = np.add.reduceat(np.where(valid, weights, 0.0), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f] = np.where(n > 0, total / n, np.nan)
+        low = records[f"{f}_min"] if from_rollup else records[f]
+        high = records[f"{f}_max"] if from_rollup else records[f]
+        out[f"{f}_min"] = np.fmin.reduceat(low, starts)
+        out[f"{f}_max"] = np.fmax.reduceat(high, starts)
+    return out
+
+
+class TimeSeriesStore:
+    """Append readings, roll them up, and read ranges back as NumPy arrays."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._last_time: Dict[tuple, float] = {}
+
+    def _dir(self, source: str, cell: str) -> str:
+        return os.path.join(self.root, source, cell.replace(":", "_"))
+
+    def cells(self, source: str) -> List[str]:
+        base = os.path.join(self.root, source)
+        if not os.path.isdir(base):
+            return []
+        return sorted(name.replace("_", ":") for name in os.listdir(base))
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def _last_recorded(self, source: str, directory: str) -> float:
+        """Time of the cell's latest raw reading on disk (0 if none); call under the cell lock."""
+        raw = sorted(n for n in os.listdir(directory) if n.startswith("raw-"))
+        dtype = _raw_dtype(source)
+        for name in reversed(raw):
+            with open(os.path.join(directory, name), "rb") as f:
+                size = os.fstat(f.fileno()).st_size // dtype.itemsize
+                if size:
+                    f.seek((size - 1) * dtype.itemsize)
+                    return float(np.frombuffer(f.read(dtype.itemsize), dtype=dtype)["time"][0])
+        return 0.0
+
+    def record(self, source: str, cell: str, values: Dict[str, float], ts: Optional[float] = None) -> bool:
+        """
+        Append one reading. Readings at or before the cell's latest one are
+        dropped (the same observation fetched twice, possibly by another
+        worker). Returns whether it was stored.
+        """
+        ts = float(ts if ts else time.time())
+        key = (source, cell)
+        with self._lock:
+            # Seen here already: no need to look at the disk
+            if ts <= self._last_time.get(key, 0.0):
+                return False
+        record = np.zeros(1, dtype=_raw_dtype(source))
+        record["time"] = ts
+        for f in SOURCE_FIELDS[source]:
+            record[f] = values.get(f, np.nan)
+        directory = self._dir(source, cell)
+        os.makedirs(directory, exist_ok=True)
+        # Other workers append to the same files; the check and the append form one step
+        with self._cell_lock(directory):
+            last = self._last_recorded(source, directory)
+            stored = ts > last
+            if stored:
+                # One fixed-size record per write keeps concurrent appends whole
+                with open(os.path.join(directory, _partition("raw", ts)), "ab") as f:
+                    f.write(record.tobytes())
+        with self._lock:
+            self._last_time[key] = max(self._last_time.get(key, 0.0), ts if stored else last)
+        return stored
+
+    def record_weather(self, cell: str, weather: Optional[Dict[str, Any]]) -> bool:
+        if not weather:
+            return False
+        return self.record("weather", cell, extract_weather(weather), weather.get("dt"))
+
+    def record_soil(self, cell: str, soil: Optional[Dict[str, Any]]) -> bool:
+        if not soil:
+            return False
+        return self.record("soil", cell, extract_soil(soil), soil.get("dt"))
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def _read(self, source: str, cell: str, resolution: str, start: float, end: float) -> np.ndarray:
+        directory = self._dir(source, cell)
+        dtype = _raw_dtype(source) if resolution == "raw" else _rollup_dtype(source)
+        if not os.path.isdir(directory):
+            return np.zeros(0, dtype=dtype)
+        prefix = f"{resolution}-"
+        first, last = _partition(resolution, start), _partition(resolution, end)
+        parts = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith(prefix) and first <= name <= last:
+                path = os.path.join(directory, name)
+                size = os.path.getsize(path) // dtype.itemsize
+                if size:
+                    records = np.memmap(path, dtype=dtype, mode="r", shape=(size,))
+                    lo, hi = np.searchsorted(records["time"], [start, end])
+                    parts.append(np.array(records[lo:hi]))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    def query(self, source: str, cell: str, start: float, end: float, resolution: str = "auto",
+              fields: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Readings for a cell in [start, end) (UTC epoch seconds) as column
+        arrays: "time" plus each field, and for rollups "count" and
+        "<field>_min"/"<field>_max". "auto" picks raw for up to two days,
+        hourly for up to two months and daily beyond that.
+        """
+        if source not in SOURCE_FIELDS:
+            raise ValueError(f"Unknown source {source!r}, expected one of {', '.join(SOURCE_FIELDS)}")
+        if resolution == "auto":
+            span = end - start
+            resolution = "raw" if span <= 2 * _DAY else "hour" if span <= 62 * _DAY else "day"
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}, expected one of {', '.join(RESOLUTIONS)}")
+        records = self._read(source, cell, resolution, start, end)
+        names = [
+            n for n in records.dtype.names
+            if fields is None or n in ("time", "count") or n in fields
+            or (n.endswith(("_min", "_max")) and n[:-4] in fields)
+        ]
+        result = {name: np.ascontiguousarray(records[name]) for name in names}
+        result["resolution"] = resolution
+        return result
+
+    # ---------------------------
+    # Rollups and retention
+    # ---------------------------
+    def _state(self, directory: str) -> Dict[str, float]:
+        path = os.path.join(directory, "state.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self, directory: str, state: Dict[str, float]):
+        path = os.path.join(directory, "state.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _append(self, directory: str, resolution: str, records: np.ndarray):
+        for partition in sorted({_partition(resolution, t) for t in records["time"]}):
+            chunk = records[[_partition(resolution, t) == partition for t in records["time"]]]
+            with open(os.path.join(directory, partition), "ab") as f:
+                f.write(chunk.tobytes())
+
+    @staticmethod
+    @contextmanager
+    def _cell_lock(directory: str) -> Iterator[None]:
+        """Exclusive lock on a cell directory, across threads and processes (waits for the holder)."""
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def rollup(self, source: str, cell: str, now: Optional[float] = None) -> Dict[str, int]:
+        """Roll completed hours up from raw, and completed days up from hourly."""
+        now = now or time.time()
+        directory = self._dir(source, cell)
+        # The state read, the appends and the state save form one step
+        with self._cell_lock(directory):
+            return self._rollup(source, cell, directory, now)
+
+    def _rollup(self, source: str, cell: str, directory: str, now: float) -> Dict[str, int]:
+        state = self._state(directory)
+        written = {}
+
+        current_hour = now // _HOUR * _HOUR
+        raw = self._read(source, cell, "raw", state.get("hour", 0.0), current_hour)
+        hours = _aggregate(raw, source, _HOUR)
+        if len(hours):
+            self._append(directory, "hour", hours)
+        state["hour"] = current_hour
+        written["hour"] = len(hours)
+
+        current_day = now // _DAY * _DAY
+        hourly = self._read(source, cell, "hour", state.get("day", 0.0), current_day)
+        days = _aggregate(hourly, source, _DAY, from_rollup=True)
+        if len(days):
+            self._append(directory, "day", days)
+        state["day"] = current_day
+        written["day"] = len(days)
+        self._save_state(directory, state)
+        return written
+
+    def apply_retention(self, source: str, cell: str, now: Optional[float] = None) -> int:
+        """Delete partitions whose whole period is older than its tier's retention. Returns files removed."""
+        now = now or time.time()
+        retention = {
+            "raw": (settings.TIMESERIES_RAW_RETENTION_DAYS, _DAY),
+            "hour": (settings.TIMESERIES_HOURLY_RETENTION_DAYS, 31 * _DAY),
+            "day": (settings.TIMESERIES_DAILY_RETENTION_DAYS, 366 * _DAY),
+        }
+        directory = self._dir(source, cell)
+        with self._cell_lock(directory):
+            return self._apply_retention(directory, retention, now)
+
+    def _apply_retention(self, directory: str, retention: Dict[str, tuple], now: float) -> int:
+        state = self._state(directory)
+        removed = 0
+        for name in os.listdir(directory):
+            resolution = name.split("-", 1)[0]
+            if resolution not in retention:
+                continue
+            days, period = retention[resolution]
+            period_end = _partition_start(name) + period
+            # Raw data is only dropped once it has been rolled up
+            if period_end < now - days * _DAY and (resolution != "raw" or period_end <= state.get("hour", 0.0)):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+        return removed
+
+    def maintain(self, cells: Optional[Sequence[str]] = None, now: Optional[float] = None) -> Dict[str, int]:
+        """Roll up and apply retention for every (or the given) cell of every source."""
+        totals = {"cells": 0, "hour": 0, "day": 0, "removed": 0}
+        for source in SOURCE_FIELDS:
+            for cell in cells if cells is not None else self.cells(source):
+                if not os.path.isdir(self._dir(source, cell)):
+                    continue
+                try:
+                    written = self.rollup(source, cell, now)
+                    totals["removed"] += self.apply_retention(source, cell, now)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Time-series maintenance of {source}/{cell} failed: {e}")
+                    continue
+                totals["cells"] += 1
+                totals["hour"] += written["hour"]
+                totals["day"] += written["day"]
+        return totals
+
+    # ---------------------------
+    # Analyses
+    # ---------------------------
+    def cumulative_rainfall(self, cell: str, start: float, end: float) -> float:
+        """Rain (mm) over a range: each hour's mean 1h accumulation, summed."""
+        hourly = self.query("weather", cell, start, end, resolution="hour", fields=["rain_1h"])
+        return float(np.nansum(hourly["rain_1h"]))
+
+    def growing_degree_days(self, cell: str, start: float, end: float, base: float = 10.0) -> float:
+        """Sum over days of max(0, (Tmax + Tmin) / 2 - base), from daily air temperature."""
+        daily = self.query("weather", cell, start, end, resolution="day", fields=["temp"])
+        mean = (daily["temp_max"].astype(np.float64) + daily["temp_min"]) / 2
+        return float(np.nansum(np.clip(mean - base, 0, None)))
+
+    def moisture_trend(self, cell: str, start: float, end: float) -> Optional[float]:
+        """Least-squares slope of daily mean soil moisture, per day (None with < 2 days)."""
+        daily = self.query("soil", cell, start, end, resolution="day", fields=["moisture"])
+        valid = ~np.isnan(daily["moisture"])
+        if valid.sum() < 2:
+            return None
+        slope, _ = np.polyfit(daily["time"][valid] / _DAY, daily["moisture"][valid].astype(np.float64), 1)
+        return float(slope)
+
+
+_store: Optional[TimeSeriesStore] = None
+
+
+def get_timeseries_store() -> TimeSeriesStore:
+    """Process-wide store rooted at settings.TIMESERIES_DIR."""
+    global _store
+    if _store is None:
+        _store = TimeSeriesStore(settings.TIMESERIES_DIR)
+    return _store
@@ -0,0 +1,230 @@
+"""
+Resumable uploads behind /media/uploads (app/routes/media_routes.py), for
+clients on links that drop mid-file: create a session, PUT chunks at
+offsets, ask for the offset after a drop, then complete.
+
+A session is two files in the staging directory:
+
+    <user_id>-<hex>.json   owner, extension, declared size (and sha256)
+    <user_id>-<hex>.part   the bytes received so far
+
+The size of the .part file is the offset, so every worker sharing the
+directory sees the same progress, and so does a restarted one. Chunks are
+verified against their SHA-256 before being appended, fsync'ed, and
+written under an exclusive lock on the .part file. Sessions idle for longer
+than the TTL are deleted by a sweep that runs on session creation.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+from uuid import uuid4
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID = re.compile(r"^\d+-[0-9a-f]{32}$")
+
+
+class UploadConflict(Exception):
+    """The request doesn't fit the session's state; `offset` is where the client should resume."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadSessions:
+    def __init__(self, staging_dir: str, max_size: int,
+                 chunk_max: int = settings.UPLOAD_CHUNK_MAX_BYTES,
+                 ttl_seconds: int = settings.UPLOAD_SESSION_TTL_SECONDS,
+                 max_per_user: int = settings.UPLOAD_MAX_SESSIONS_PER_USER):
+        """
+        Args:
+            staging_dir: where sessions live; must be on the same filesystem as the final uploads
+            max_size: largest file accepted, in bytes
+            chunk_max: largest chunk accepted per PUT, in bytes
+            ttl_seconds: sessions without a chunk for this long are deleted
+            max_per_user: unfinished sessions allowed per user
+        """
+        self.staging_dir = staging_dir
+        self.max_size = max_size
+        self.chunk_max = chunk_max
+        self.ttl_seconds = ttl_seconds
+        self.max_per_user = max_per_user
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(staging_dir, exist_ok=True)
+
+    # ---------------------------
+    # Paths and state
+    # ---------------------------
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.staging_dir, upload_id)
+        return f"{base}.json", f"{base}.part"
+
+    def _load(self, upload_id: str, user_id: int) -> Dict[str, Any]:
+        """The session's metadata; LookupError when unknown, expired or someone else's."""
+        if not _SESSION_ID.match(upload_id):
+            raise LookupError("Upload not found")
+        meta_path, part_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise LookupError("Upload not found")
+        if meta["user_id"] != user_id:
+            raise LookupError("Upload not found")
+        if time.time() - self._last_activity(meta_path, part_path) > self.ttl_seconds:
+            self._remove(upload_id)
+            raise LookupError("Upload expired")
+        return meta
+
+    @staticmethod
+    def _last_activity(meta_path: str, part_path: str) -> float:
+        times = [os.path.getmtime(p) for p in (meta_path, part_path) if os.path.exists(p)]
+        return max(times) if times else 0.0
+
+    def _status(self, upload_id: str, meta: Dict[str, Any], offset: int) -> Dict[str, Any]:
+        meta_path, part_path = self._paths(upload_id)
+        expires = self._last_activity(meta_path, part_path) + self.ttl_seconds
+        return {
+            "upload_id": upload_id,
+            "offset": offset,
+            "size": meta["size"],
+            "chunk_max": self.chunk_max,
+            "expires_at": datetime.fromtimestamp(expires, timezone.utc).isoformat(timespec="seconds"),
+        }
+
+    @contextmanager
+    def _locked(self, upload_id: str, mode: str = "ab") -> Iterator[Any]:
+        """The .part file, exclusively locked; UploadConflict if another request holds it."""
+        _, part_path = self._paths(upload_id)
+        with open(part_path, mode) as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict("Another chunk of this upload is being written", os.fstat(f.fileno()).st_size)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _remove(self, upload_id: str):
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ---------------------------
+    # Protocol
+    # ---------------------------
+    def create(self, user_id: int, extension: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+        if size > self.max_size:
+            raise ValueError(f"File too large. Max {self.max_size // (1024 * 1024)} MB allowed.")
+        self.sweep()
+        prefix = f"{user_id}-"
+        open_sessions = sum(1 for name in os.listdir(self.staging_dir)
+                            if name.startswith(prefix) and name.endswith(".json"))
+        if open_sessions >= self.max_per_user:
+            raise OverflowError(f"Too many unfinished uploads (max {self.max_per_user})")
+        upload_id = f"{user_id}-{uuid4().hex}"
+        meta = {"user_id": user_id, "extension": extension, "size": size,
+                "sha256": sha256.lower() if sha256 else None, "created_at": time.time()}
+        meta_path, part_path = self._paths(upload_id)
+        open(part_path, "wb").close()
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        return self._status(upload_id, meta, 0)
+
+    def status(self, upload_id: str, user_id: int) -> Dict[str, Any]:
+        meta = self._load(upload_id, user_id)
+        _, part_path = self._paths(upload_id)
+        return self._status(upload_id, meta, os.path.getsize(part_path))
+
+    def append(self, upload_id: str, user_id: int, offset: int, data: bytes, sha256: str) -> Dict[str, Any]:
+        """
+        Write `data` at `offset`, which must be the current end of the
+        upload: a retried chunk that already arrived gets UploadConflict with
+        the offset to continue from, never a second copy of its bytes.
+        """
+        meta = self._load(upload_id, user_id)
+        if hashlib.sha256(data).hexdigest() != sha256.lower():
+            raise ValueError("Chunk checksum mismatch")
+        with self._locked(upload_id) as f:
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise UploadConflict(f"Upload is at offset {current}", current)
+            if offset + len(data) > meta["size"]:
+                raise ValueError(f"Chunk runs past the declared size of {meta['size']} bytes")
+            f.write(data)
+            f.flush()
+            # The offset we report must survive a crash, or the client would skip bytes
+            os.fsync(f.fileno())
+            offset = current + len(data)
+        return self._status(upload_id, meta, offset)
+
+    def complete(self, upload_id: str, user_id: int, destination: str) -> int:
+        """Move the finished file to `destination`; returns its size."""
+        meta = self._load(upload_id, user_id)
+        with self._locked(upload_id, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != meta["size"]:
+                raise UploadConflict(f"Upload incomplete: {size} of {meta['size']} bytes", size)
+            if meta["sha256"]:
+                digest = hashlib.sha256()
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+                if digest.hexdigest() != meta["sha256"]:
+                    # The chunks all matched, so the client hashed something else; start over
+                    self._remove(upload_id)
+                    raise ValueError("File checksum mismatch, upload discarded")
+            meta_path, part_path = self._paths(upload_id)
+            os.replace(part_path, destination)
+            os.remove(meta_path)
+        return size
+
+    def abort(self, upload_id: str, user_id: int):
+        self._load(upload_id, user_id)
+        self._remove(upload_id)
+
+    def extension(self, upload_id: str, user_id: int) -> str:
+        return self._load(upload_id, user_id)["extension"]
+
+    def sweep(self, force: bool = False) -> int:
+        """Delete sessions idle for longer than the TTL; runs at most every TTL/24 unless forced."""
+        now = time.time()
+        with self._sweep_lock:
+            if not force and now < self._next_sweep:
+                return 0
+            self._next_sweep = now + self.ttl_seconds / 24
+        removed = 0
+        for name in os.listdir(self.staging_dir):
+            upload_id, ext = os.path.splitext(name)
+            if ext not in (".json", ".part") or not _SESSION_ID.match(upload_id):
+                continue
+            meta_path, part_path = self._paths(upload_id)
+            if ext == ".part" and os.path.exists(meta_path):
+                continue  # judged with its .json
+            last = self._last_activity(meta_path, part_path)
+            if not last or now - last <= self.ttl_seconds:
+                continue  # already gone, or still in use
+            try:
+                with self._locked(upload_id):
+                    self._remove(upload_id)
+                removed += 1
+            except (UploadConflict, FileNotFoundError):
+                pass  # a chunk is arriving right now: not abandoned
+        if removed:
+            logger.info(f"Removed {removed} expired upload sessions")
+        return removed
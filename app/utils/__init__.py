@@ -0,0 +1,58 @@
+# app/utils/__init__.py
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .fast_json import dumps
+
+UPLOAD_DIR = Path("data/uploads")
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+def save_upload_file_tmp(upload_file, destination: Path = None) -> str:
+    """
+    Save FastAPI UploadFile to disk and return filepath.
+    """
+    if destination is None:
+        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        filename = f"{timestamp}_{upload_file.filename}"
+        destination = UPLOAD_DIR / filename
+    else:
+        filename = destination.name
+
+    with destination.open("wb") as buffer:
+        for chunk in iter(lambda: upload_file.file.read(1024 * 1024), b""):
+            buffer.write(chunk)
+    return str(destination)
+
+def stream_json_array(items: Iterable, batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Serialize an iterable of rows as a JSON array, `batch_size` rows per
+    chunk, so the response goes out in a few large body messages instead
+    of one per row.
+    """
+    yield b"["
+    batch = []
+    separator = b""
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield separator + dumps(batch)[1:-1]
+            batch.clear()
+            separator = b","
+    if batch:
+        yield separator + dumps(batch)[1:-1]
+    yield b"]"
+
+def grid_cell(latitude: float, longitude: float, size_degrees: float) -> str:
+    """
+    Key of the square lat/lon grid cell containing a point, e.g. "113:311"
+    for 28.4, 77.9 with 0.25 degree cells.
+    """
+    return f"{int(latitude // size_degrees)}:{int(longitude // size_degrees)}"
+
+
+def grid_cell_center(cell: str, size_degrees: float) -> tuple[float, float]:
+    """(latitude, longitude) of the center of a grid_cell() key."""
+    lat_index, lon_index = (int(part) for part in cell.split(":"))
+    return (lat_index + 0.5) * size_degrees, (lon_index + 0.5) * size_degrees
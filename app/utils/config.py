@@ -5,7 +5,104 @@ class Settings(BaseSettings):
     # concurrency limits
     API_CONCURRENCY_LIMIT: int = 8
     API_TIMEOUT_SECONDS: int = 10
+    # per-event budget for speech recognition awaited from async routes
+    SPEECH_TIMEOUT_SECONDS: int = 60
+    # voice requests/streams recognized at once from async routes (own threads, apart from translation)
+    SPEECH_CONCURRENCY_LIMIT: int = 4
     TRANSlator_CACHE_SIZE: int = 512
+    # provider request size limit (GoogleTranslator rejects > 5000 chars)
+    TRANSLATE_MAX_CHARS: int = 4500
+    # persistent translation tier (sqlite file); empty disables it
+    TRANSLATION_CACHE_PATH: str = "data/translation_cache.sqlite3"
+    TRANSLATION_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+
+    # language identification: "fast" (offline n-gram model) or "langdetect"
+    LANGUAGE_DETECTOR: str = "fast"
+    LANGID_MODEL_PATH: str = "data/langid_model.npz"
+
+    # pre-translated advice catalog (built by `python -m app.services.advice_catalog`)
+    ADVICE_CATALOG_PATH: str = "data/advice_catalog.bin"
+    ADVICE_LANGUAGES: str = "hi,te,ta,kn,mr,bn,gu,ml,pa,ur"
+
+    # agronomy knowledge base (built by `python -m app.services.knowledge_base build`)
+    KNOWLEDGE_DOCS_DIR: str = "data/knowledge"
+    KNOWLEDGE_INDEX_DIR: str = "data/knowledge_index"
+    KNOWLEDGE_TOP_K: int = 5
+    # host-wide cache file shared by all workers (sqlite, WAL); empty keeps caches per process
+    SHARED_CACHE_PATH: str = "data/shared_cache.sqlite3"
+    # per-process tier in front of it, and how often workers pick up each other's changes
+    SHARED_CACHE_L1_ENTRIES: int = 256
+    SHARED_CACHE_L1_TTL_SECONDS: float = 5.0
+    SHARED_CACHE_POLL_SECONDS: float = 1.0
+    # answers to repeated questions, keyed on query terms + language + coarse context
+    ANSWER_CACHE_SIZE: int = 4096
+    ANSWER_CACHE_TTL_SECONDS: int = 6 * 3600
+    # size of the lat/lon cells used to group farms and cache location-dependent data
+    GRID_CELL_DEGREES: float = 0.25
+    # bucket size of the in-memory farm spatial index; ~11 km of latitude at 0.1
+    SPATIAL_INDEX_CELL_DEGREES: float = 0.1
+
+    # background precompute of per-farm insights; 0 disables the scheduler
+    INSIGHT_REFRESH_SECONDS: int = 0
+    # each run starts +/- this fraction of the interval from schedule
+    INSIGHT_REFRESH_JITTER: float = 0.1
+    # upstream requests of one run are spread over this window
+    INSIGHT_REFRESH_SPREAD_SECONDS: int = 60
+    # workers on one host take turns through this lock file; empty runs every worker's passes
+    INSIGHT_LOCK_PATH: str = "data/insight_refresh.lock"
+    # grid cells are sharded across this many hosts (each sets its own index)
+    INSIGHT_WORKER_COUNT: int = 1
+    INSIGHT_WORKER_INDEX: int = 0
+    # farms with a location but no coordinates geocoded per run
+    INSIGHT_GEOCODE_BATCH: int = 50
+
+    # weather/soil history per grid cell, recorded by the insight scheduler
+    TIMESERIES_DIR: str = "data/timeseries"
+    TIMESERIES_RAW_RETENTION_DAYS: int = 14
+    TIMESERIES_HOURLY_RETENTION_DAYS: int = 180
+    TIMESERIES_DAILY_RETENTION_DAYS: int = 3650
+
+    # image model (app/ml/inference.py); measure options with `python -m benchmarks.inference_bench`
+    INFERENCE_PRECISION: str = "fp32"   # fp32, bf16 or int8
+    INFERENCE_PREPROCESS: str = "standard"   # standard or draft
+    # torch intra-op threads; 0 keeps torch's default (all cores)
+    INFERENCE_THREADS: int = 0
+
+    # load language models and the knowledge base in the background after startup
+    # (otherwise on first use); see also `python -m app.utils.startup_profiler`
+    STARTUP_WARMUP: bool = True
+
+    # push of urgent alerts (app/services/alert_hub.py): undelivered cells kept per
+    # connection, connection cap per worker, keep-alive interval and send timeout
+    ALERT_QUEUE_SIZE: int = 16
+    ALERT_MAX_CONNECTIONS: int = 50000
+    ALERT_HEARTBEAT_SECONDS: float = 30.0
+    ALERT_SEND_TIMEOUT_SECONDS: float = 10.0
+    # how long a cell's last alert state is kept for clients connecting later
+    ALERT_TTL_SECONDS: int = 24 * 3600
+
+    # resumable uploads (/media/uploads): largest chunk per PUT, how long an
+    # idle session is kept, and unfinished sessions allowed per user
+    UPLOAD_CHUNK_MAX_BYTES: int = 4 * 1024 * 1024
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600
+    UPLOAD_MAX_SESSIONS_PER_USER: int = 5
+
+    # requests at least this slow are kept with their span breakdown on
+    # /admin/trace/slow (last SLOW_REQUEST_LOG_SIZE of them); 0 turns tracing off
+    SLOW_REQUEST_THRESHOLD_MS: float = 1000.0
+    SLOW_REQUEST_LOG_SIZE: int = 100
+    # longest run allowed for the /admin/profile sampling profiler
+    PROFILE_MAX_SECONDS: int = 60
+    # workers publish their /metrics samples to the shared cache this often, so
+    # any worker can report all of them; 0 (or no shared cache) reports only its own
+    METRICS_PUBLISH_SECONDS: float = 5.0
+
+    # upstream endpoints; point these at local stand-ins for offline runs (see benchmarks/)
+    OPENWEATHER_BASE_URL: str = "https://api.openweathermap.org"
+    AGRO_BASE_URL: str = "http://api.agromonitoring.com"
+    PLANT_ID_BASE_URL: str = "https://api.plant.id"
+    # empty keeps deep_translator's default Google endpoint
+    TRANSLATE_BASE_URL: str = ""
 
     # Example API keys (set these in env)
     WEATHER_API_KEY: str | None = None
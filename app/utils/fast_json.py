@@ -0,0 +1,46 @@
+# backend/app/utils/fast_json.py
+"""
+JSON encoding for list-heavy responses. Uses orjson when it is installed
+(optional, `pip install orjson`), the standard library otherwise; both give
+the same output for the rows we serve (datetimes as naive ISO 8601, like
+jsonable_encoder).
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        # Non-native types (Decimal, pydantic models, ...) go through jsonable_encoder
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default)
+
+    def dumps(content: Any) -> bytes:
+        return _encoder.encode(content).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse without the jsonable_encoder pass: content must already be
+    plain rows (dicts of str/number/datetime/None), as the crud list helpers return.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
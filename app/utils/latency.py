@@ -0,0 +1,58 @@
+# backend/app/utils/latency.py
+import bisect
+import threading
+from typing import Optional
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram (seconds). Cheap enough to call on every
+    request; percentiles are estimated from bucket upper bounds.
+    """
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.bucket_counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            # Index of the first bound >= seconds; len(buckets) is the overflow bucket
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, n in zip(self.buckets, self.bucket_counts):
+                seen += n
+                if seen >= rank:
+                    return bound
+            return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.total, 6),
+            "max_seconds": round(self.max, 6),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {
+                **{f"le_{b}": c for b, c in zip(self.buckets, self.bucket_counts)},
+                "le_inf": self.bucket_counts[-1],
+            },
+        }
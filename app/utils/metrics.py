@@ -0,0 +1,414 @@
+# backend/app/utils/metrics.py
+"""
+In-process metrics exposed in Prometheus text format on /metrics.
+
+    from app.utils.metrics import metrics, timed
+
+    with timed("kb_search"):                 # stage latency histogram
+        ...
+
+    @timed("advice_render")
+    def render(...): ...
+
+    jobs = metrics.counter("jobs_total", "Jobs run", ("kind",))
+    jobs.labels(kind="import").inc()
+
+Gauges of values kept elsewhere (pool usage, cache hit counters) are read
+at scrape time through collectors, so the hot path pays nothing for them.
+
+Every registry is per process. Under `uvicorn --workers N` a
+WorkerMetricsPublisher writes each worker's samples to the shared store,
+and /metrics, whichever worker serves it, reports all workers: counters
+and histograms summed, gauges labelled worker="<pid>".
+"""
+import os
+import time
+import logging
+import inspect
+import threading
+import functools
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .latency import LatencyHistogram
+from .tracing import add_span, slow_requests, span_kind
+
+logger = logging.getLogger(__name__)
+
+Sample = Tuple[str, Dict[str, str], float]
+# (name, kind, help, samples)
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child(())
+
+    def _new_child(self, key: Tuple[str, ...]):
+        raise NotImplementedError
+
+    def _child(self, key: Tuple[str, ...]):
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child(key)
+        return child
+
+    def labels(self, **labels):
+        return self._child(tuple(str(labels[name]) for name in self.labelnames))
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self, key):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, key)), child.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _TracedHistogram(LatencyHistogram):
+    """Also adds every observation as a span of the request being traced (app.utils.tracing)."""
+
+    def __init__(self, buckets, kind: str, name: str):
+        super().__init__(buckets)
+        self.span_kind = span_kind(kind, name)
+        self.span_name = name
+
+    def observe(self, seconds: float):
+        super().observe(seconds)
+        add_span(self.span_kind, self.span_name, seconds)
+
+
+class Histogram(_Metric):
+    """
+    Each label set is a LatencyHistogram; buckets need not be seconds.
+    With span="kind", observations are also request trace spans, named
+    after the first label value.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LatencyHistogram.DEFAULT_BUCKETS, span: Optional[str] = None):
+        self.buckets = tuple(sorted(buckets))
+        self.span = span
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self, key):
+        if self.span:
+            return _TracedHistogram(self.buckets, self.span, key[0] if key else self.name)
+        return LatencyHistogram(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            yield from histogram_samples(self.name, labels, child)
+
+
+def histogram_samples(name: str, labels: Dict[str, str], histogram: LatencyHistogram) -> Iterator[Sample]:
+    """Prometheus samples (cumulative buckets, sum, count) for a LatencyHistogram."""
+    with histogram._lock:
+        counts = list(histogram.bucket_counts)
+        total, count = histogram.total, histogram.count
+    cumulative = 0
+    for bound, n in zip(histogram.buckets, counts):
+        cumulative += n
+        yield f"{name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+    yield f"{name}_bucket", {**labels, "le": "+Inf"}, count
+    yield f"{name}_sum", labels, total
+    yield f"{name}_count", labels, count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LatencyHistogram.DEFAULT_BUCKETS, span: Optional[str] = None) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets, span=span)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        """
+        collector() yields (name, kind, help, samples) families at scrape
+        time. Exceptions are swallowed so one broken source can't hide the rest.
+        """
+        self._collectors.append(collector)
+
+    def collect(self) -> List[Family]:
+        """This process's metric families, collectors included."""
+        families = [(m.name, m.kind, m.help, list(m.samples())) for m in list(self._metrics.values())]
+        for collector in self._collectors:
+            try:
+                families.extend((name, kind, help, list(samples)) for name, kind, help, samples in collector())
+            except Exception:
+                continue
+        return families
+
+    def render(self, families: Optional[Iterable[Family]] = None) -> str:
+        """Text exposition of `families` (default: this process's)."""
+        lines: List[str] = []
+        for name, kind, help, samples in (self.collect() if families is None else families):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_families(by_worker: Dict[str, List[Family]]) -> List[Family]:
+    """
+    Combine the families of several workers. Counter and histogram samples
+    with equal labels are summed, so totals only move backwards when a
+    worker goes away; gauges (and anything untyped) get a worker label.
+    """
+    merged: Dict[str, Tuple[str, str, Dict[tuple, Sample]]] = {}
+    for worker, families in sorted(by_worker.items()):
+        for name, kind, help, samples in families:
+            _, _, out = merged.setdefault(name, (kind, help, {}))
+            for sample_name, labels, value in samples:
+                if kind in ("counter", "histogram"):
+                    key = (sample_name, tuple(sorted(labels.items())))
+                    previous = out.get(key)
+                    out[key] = (sample_name, labels, value + (previous[2] if previous else 0))
+                else:
+                    labels = {**labels, "worker": worker}
+                    out[(sample_name, tuple(sorted(labels.items())))] = (sample_name, labels, value)
+    return [(name, kind, help, list(out.values())) for name, (kind, help, out) in merged.items()]
+
+
+class WorkerMetricsPublisher:
+    """
+    Keeps this worker's samples in the shared store (namespace "metrics",
+    keyed by pid) every interval_seconds, and renders the merged view of
+    every worker that published within the last few intervals.
+    """
+    NAMESPACE = "metrics"
+
+    def __init__(self, registry: "MetricsRegistry", store, interval_seconds: float):
+        self.registry = registry
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.worker = str(os.getpid())
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, families: Optional[List[Family]] = None):
+        families = self.registry.collect() if families is None else families
+        # Entries of a worker that stopped publishing (crashed, recycled) expire
+        self.store.set(self.NAMESPACE, self.worker, families, ttl=3 * self.interval_seconds)
+
+    def render(self) -> str:
+        """All workers' samples; a worker's own are current, the others' at most one interval old."""
+        own = self.registry.collect()
+        try:
+            self.publish(own)
+            by_worker = self.store.values(self.NAMESPACE)
+        except Exception as e:
+            logger.warning(f"Reading other workers' metrics failed, reporting this worker only: {e}")
+            by_worker = {}
+        by_worker[self.worker] = own
+        return self.registry.render(merge_families(by_worker))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.publish()
+            except Exception as e:
+                logger.warning(f"Publishing metrics failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.store.delete(self.NAMESPACE, self.worker)
+        except Exception:
+            pass
+
+
+metrics = MetricsRegistry()
+
+route_latency = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+upstream_latency = metrics.histogram(
+    "upstream_request_duration_seconds", "Latency of calls to external providers", ("provider", "status"),
+    span="upstream")
+stage_latency = metrics.histogram(
+    "stage_duration_seconds", "Latency of internal processing stages", ("stage",), span="stage")
+db_query_latency = metrics.histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("statement",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0), span="db")
+inference_latency = metrics.histogram(
+    "inference_duration_seconds", "Image model inference time per batch", ("backend",), span="inference")
+inference_batch_size = metrics.histogram(
+    "inference_batch_size", "Images per inference batch", ("backend",), buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+class timed:
+    """
+    Record elapsed time into a histogram, as a context manager or decorator
+    (sync and async functions). Defaults to stage_latency with label stage=name.
+    """
+
+    def __init__(self, stage: Optional[str] = None, histogram: Optional[Histogram] = None, **labels):
+        self.histogram = histogram or stage_latency
+        self.labels = labels if histogram is not None else {"stage": stage}
+        self._child = self.histogram.labels(**self.labels) if self.histogram.labelnames else self.histogram._default
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        child = self._child
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request until its response body is
+    sent (streams included). Routes are labelled by path template, and
+    unmatched paths share one label so cardinality stays bounded. Requests
+    over SLOW_REQUEST_THRESHOLD_MS also go to the slow-request log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._templates: Dict[object, str] = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "<unmatched>"
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = "<unmatched>"
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            self._templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        trace, token = slow_requests.begin(scope["method"], scope["path"])
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = self._route_template(scope)
+            route_latency.labels(method=scope["method"], route=route, status=status).observe(elapsed)
+            slow_requests.end(trace, token, route, status, elapsed)
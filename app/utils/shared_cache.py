@@ -0,0 +1,296 @@
+# backend/app/utils/shared_cache.py
+"""
+Host-wide cache shared by all uvicorn workers: a SQLite (WAL) key-value
+file holds the entries once per host, and each process keeps a small
+TTLCache in front of it.
+
+    cache = make_cache("answers", default_ttl_seconds=3600, max_entries=4096)
+    cache.set(key, value)      # same interface as TTLCache
+    cache.get(key)
+
+Entries carry an expiry, and each namespace is bounded by max_entries
+(approximate LRU on a last-access time). set/delete/clear append to an
+invalidation log that every process polls (SHARED_CACHE_POLL_SECONDS), so
+a change made by one worker reaches the others' L1 tiers within about one
+poll. Values are pickled; only the app writes to the file.
+"""
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+from .config import settings
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SharedStore:
+    """The SQLite file. One connection per thread; every statement autocommits."""
+    # A namespace is checked against its bound every this many sets per process
+    EVICT_EVERY = 64
+    # Invalidation log rows older than this are pruned (L1 TTLs are far shorter)
+    LOG_RETENTION_SECONDS = 600
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "namespace TEXT NOT NULL, key TEXT, at REAL NOT NULL)"
+        )
+        self._sets: Dict[str, int] = {}
+        self._sets_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, touch_after: float = 0.0):
+        """(value, expires_at), or None. Refreshes the LRU time at most every touch_after seconds."""
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] > touch_after:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float, max_entries: Optional[int] = None) -> int:
+        """Store and announce a new value; returns the invalidation sequence number."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl, now),
+        )
+        seq = self._publish(conn, namespace, key)
+        with self._sets_lock:
+            count = self._sets[namespace] = self._sets.get(namespace, 0) + 1
+        if count % self.EVICT_EVERY == 0:
+            self.evict(namespace, max_entries)
+        return seq
+
+    def values(self, namespace: str) -> Dict[str, Any]:
+        """Every unexpired entry of a (small) namespace, by key."""
+        rows = self._conn().execute(
+            "SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+        ).fetchall()
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def delete(self, namespace: str, key: Optional[str] = None) -> int:
+        """Delete one key, or the whole namespace when key is None."""
+        conn = self._conn()
+        if key is None:
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        else:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        return self._publish(conn, namespace, key)
+
+    def announce(self, namespace: str, key: Optional[str] = None) -> int:
+        """Log a change without storing a value, for state other processes keep in memory."""
+        return self._publish(self._conn(), namespace, key)
+
+    def _publish(self, conn: sqlite3.Connection, namespace: str, key: Optional[str]) -> int:
+        return conn.execute(
+            "INSERT INTO invalidations (namespace, key, at) VALUES (?, ?, ?)", (namespace, key, time.time())
+        ).lastrowid
+
+    def evict(self, namespace: str, max_entries: Optional[int] = None):
+        """Drop expired entries, then least recently used ones beyond max_entries."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (namespace, now))
+        if max_entries is not None:
+            (count,) = conn.execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)).fetchone()
+            if count > max_entries:
+                conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key IN "
+                    "(SELECT key FROM entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?)",
+                    (namespace, namespace, count - max_entries),
+                )
+        conn.execute("DELETE FROM invalidations WHERE at < ?", (now - self.LOG_RETENTION_SECONDS,))
+
+    def last_seq(self) -> int:
+        (seq,) = self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()
+        return seq
+
+    def invalidations_since(self, seq: int):
+        return self._conn().execute(
+            "SELECT seq, namespace, key FROM invalidations WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        namespaces = dict(conn.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace").fetchall())
+        size = sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix))
+        return {"path": self.path, "bytes": size, "entries": namespaces}
+
+
+class SharedTTLCache:
+    """
+    TTLCache interface over a SharedStore namespace, with a per-process L1.
+    L1 entries live at most l1_ttl_seconds and are dropped early when another
+    process announces a change. negative_ttl_seconds > 0 also remembers
+    misses in L1, for caches that are mostly asked about absent keys.
+    """
+
+    def __init__(self, store: SharedStore, namespace: str, default_ttl_seconds: int = 300,
+                 max_entries: Optional[int] = None, l1_entries: int = settings.SHARED_CACHE_L1_ENTRIES,
+                 l1_ttl_seconds: float = settings.SHARED_CACHE_L1_TTL_SECONDS,
+                 negative_ttl_seconds: float = 0.0, poll_seconds: float = settings.SHARED_CACHE_POLL_SECONDS):
+        self.store = store
+        self.namespace = namespace
+        self._ttl = default_ttl_seconds
+        self._max_entries = max_entries
+        self._l1_ttl = min(l1_ttl_seconds, default_ttl_seconds)
+        self._l1 = TTLCache(default_ttl_seconds=self._l1_ttl,
+                            max_entries=min(l1_entries, max_entries) if max_entries else l1_entries)
+        self._negative_ttl = negative_ttl_seconds
+        self._poll_seconds = poll_seconds
+        self._seq = store.last_seq()
+        self._own: Set[int] = set()
+        self._checked_at = time.monotonic()
+        self._sync_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.l1_hits = 0
+        self.errors = 0
+
+    def _sync(self):
+        """Apply changes announced by other processes since the last poll."""
+        now = time.monotonic()
+        if now - self._checked_at < self._poll_seconds or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            for seq, namespace, key in self.store.invalidations_since(self._seq):
+                self._seq = seq
+                if seq in self._own:
+                    self._own.discard(seq)
+                elif namespace == self.namespace:
+                    if key is None:
+                        self._l1.clear()
+                    else:
+                        self._l1.delete(key)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache poll failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def get(self, key: str):
+        self._sync()
+        value = self._l1.get(key)
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        if value is not None:
+            self.hits += 1
+            self.l1_hits += 1
+            return value
+        try:
+            found = self.store.get(self.namespace, key, touch_after=self._l1_ttl)
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            self.errors += 1
+            logger.warning(f"Shared cache read failed: {e}")
+            found = None
+        if found is None:
+            self.misses += 1
+            if self._negative_ttl:
+                self._l1.set(key, _MISSING, ttl=self._negative_ttl)
+            return None
+        value, expires_at = found
+        self._l1.set(key, value, ttl=min(self._l1_ttl, expires_at - time.time()))
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: int | None = None):
+        ttl = ttl if ttl is not None else self._ttl
+        self._l1.set(key, value, ttl=min(self._l1_ttl, ttl))
+        try:
+            self._own.add(self.store.set(self.namespace, key, value, ttl, self._max_entries))
+        except (sqlite3.Error, pickle.PicklingError) as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def delete(self, key: str):
+        self._l1.delete(key)
+        try:
+            self._own.add(self.store.delete(self.namespace, key))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache delete failed: {e}")
+
+    def clear(self):
+        self._l1.clear()
+        try:
+            self._own.add(self.store.delete(self.namespace))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache clear failed: {e}")
+
+    def __len__(self):
+        try:
+            return self.store.stats()["entries"].get(self.namespace, 0)
+        except sqlite3.Error:
+            return len(self._l1)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "l1_entries": len(self._l1),
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> Optional[SharedStore]:
+    """Process-wide store at settings.SHARED_CACHE_PATH; None when disabled or unusable."""
+    global _store
+    if _store is None and settings.SHARED_CACHE_PATH:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = SharedStore(settings.SHARED_CACHE_PATH)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"Shared cache disabled, using per-process caches: {e}")
+                    settings.SHARED_CACHE_PATH = ""
+    return _store
+
+
+def make_cache(namespace: str, default_ttl_seconds: int = 300, max_entries: Optional[int] = None,
+               **kwargs):
+    """A SharedTTLCache in `namespace`, or a plain TTLCache when the shared store is disabled."""
+    store = get_shared_store()
+    if store is None:
+        return TTLCache(default_ttl_seconds=default_ttl_seconds, max_entries=max_entries)
+    return SharedTTLCache(store, namespace, default_ttl_seconds, max_entries, **kwargs)
@@ -0,0 +1,116 @@
+# backend/app/utils/startup_profiler.py
+"""
+Where worker boot time goes.
+
+Import cost per module, from CPython's -X importtime in a fresh interpreter:
+
+    python -m app.utils.startup_profiler                 # top modules by cumulative time
+    python -m app.utils.startup_profiler --by-package    # self time summed per top-level package
+
+Boot phases of the running process (app import, startup hooks, background
+warm-up steps) are recorded in `boot` and served on /admin/startup.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile_imports(module: str = "app.main", env: Optional[Dict[str, str]] = None) -> List[ImportRecord]:
+    """Import `module` in a fresh interpreter and parse its -X importtime report."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, **(env or {})},
+    )
+    records = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        name = fields[2].rstrip()
+        records.append(ImportRecord(
+            module=name.strip(), self_us=int(fields[0]), cumulative_us=int(fields[1]),
+            depth=(len(name) - len(name.lstrip())) // 2,
+        ))
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+        raise RuntimeError(f"import {module} failed: {error}")
+    return records
+
+
+def by_package(records: List[ImportRecord]) -> Dict[str, int]:
+    """Self time in microseconds per top-level package, largest first."""
+    totals: Dict[str, int] = {}
+    for record in records:
+        package = record.module.split(".")[0]
+        totals[package] = totals.get(package, 0) + record.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+class BootTimeline:
+    """Durations of named boot phases, measured from when this module was imported."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._phases: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, error: Optional[str] = None):
+        """Phase `name` ran from perf_counter() value `start` until now."""
+        with self._lock:
+            self._phases[name] = {
+                "started_ms": round((start - self.started) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                **({"error": error} if error else {}),
+            }
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, start, error=str(e))
+            raise
+        self.record(name, start)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"uptime_s": round(time.perf_counter() - self.started, 1), "phases": dict(self._phases)}
+
+
+boot = BootTimeline()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time profile of a module")
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--by-package", action="store_true", help="sum self time per top-level package")
+    args = parser.parse_args()
+
+    records = profile_imports(args.module)
+    total = max((r.cumulative_us for r in records if r.depth == 0 and r.module == args.module), default=0)
+    print(f"import {args.module}: {total / 1000:.0f} ms, {len(records)} modules")
+    if args.by_package:
+        for package, us in list(by_package(records).items())[:args.top]:
+            print(f"{us / 1000:>9.1f} ms  {package}")
+    else:
+        print(f"{'cumulative':>12} {'self':>9}  module")
+        for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:args.top]:
+            print(f"{record.cumulative_us / 1000:>9.1f} ms {record.self_us / 1000:>6.1f} ms  {record.module}")
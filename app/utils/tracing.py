@@ -0,0 +1,220 @@
+# backend/app/utils/tracing.py
+"""
+Diagnostics that can be switched on in a running worker, through the
+/admin/profile and /admin/trace/slow endpoints.
+
+    sample_stacks(10)          # statistical profiler over all threads;
+    format_collapsed(counts)   # collapsed stacks for flamegraph.pl / speedscope
+
+    slow_requests.snapshot()   # recent requests above the threshold, with
+                               # their db / upstream / inference / translation spans
+
+Spans come from the histograms declared with span=... in metrics.py, so
+anything already timed for /metrics shows up in a trace without extra
+instrumentation. Spans nest (a translate_batch stage encloses its upstream
+calls), so per-kind totals can overlap. Work outside a request (insight
+scheduler, warm-up) is not traced.
+"""
+import sys
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+
+# Span names reported as "translation" whichever histogram timed them
+TRANSLATION_SPANS = {"google_translate", "translate_batch"}
+
+
+def span_kind(kind: str, name: str) -> str:
+    return "translation" if name in TRANSLATION_SPANS else kind
+
+
+# ---------------------------
+# Slow-request tracer
+# ---------------------------
+
+class RequestTrace:
+    """Spans recorded while one request is served; may be appended to from threadpool threads."""
+    MAX_SPANS = 200  # individual spans kept; totals always count every span
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, str, float, float]] = []
+        self.totals: Dict[Tuple[str, str], list] = {}
+        self.dropped = 0
+        self.ignored = False
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, name: str, seconds: float):
+        end = time.perf_counter() - self.started
+        with self._lock:
+            total = self.totals.get((kind, name))
+            if total is None:
+                self.totals[(kind, name)] = [1, seconds]
+            else:
+                total[0] += 1
+                total[1] += seconds
+            if len(self.spans) < self.MAX_SPANS:
+                self.spans.append((kind, name, end - seconds, seconds))
+            else:
+                self.dropped += 1
+
+    def to_dict(self, route: str, status: int, seconds: float) -> dict:
+        ms = lambda v: round(v * 1000, 2)
+        with self._lock:
+            totals = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)
+            spans = list(self.spans)
+        breakdown: Dict[str, dict] = {}
+        for (kind, _), (count, total) in totals:
+            entry = breakdown.setdefault(kind, {"count": 0, "ms": 0.0})
+            entry["count"] += count
+            entry["ms"] = round(entry["ms"] + total * 1000, 2)
+        return {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "method": self.method,
+            "route": route,
+            "path": self.path,
+            "status": status,
+            "duration_ms": ms(seconds),
+            "breakdown": breakdown,
+            "by_name": [{"kind": kind, "name": name, "count": count, "ms": ms(total)}
+                        for (kind, name), (count, total) in totals],
+            "spans": [{"kind": kind, "name": name, "start_ms": ms(start), "ms": ms(duration)}
+                      for kind, name, start, duration in spans],
+            "spans_dropped": self.dropped,
+        }
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def add_span(kind: str, name: str, seconds: float):
+    """Attach a timed span to the request being served, if it is traced."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(kind, name, seconds)
+
+
+def ignore_current_request():
+    """Keep the current request out of the slow log (e.g. a deliberately long profile run)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.ignored = True
+
+
+class SlowRequestLog:
+    """Ring buffer of the last `size` requests that took at least threshold_ms; 0 disables tracing."""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold_ms = threshold_ms
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def begin(self, method: str, path: str):
+        """(trace, token) for a new request, or (None, None) when tracing is off."""
+        if self.threshold_ms <= 0:
+            return None, None
+        trace = RequestTrace(method, path)
+        return trace, _current.set(trace)
+
+    def end(self, trace: Optional[RequestTrace], token, route: str, status: int, seconds: float):
+        if trace is None:
+            return
+        _current.reset(token)
+        if trace.ignored or seconds * 1000 < self.threshold_ms:
+            return
+        entry = trace.to_dict(route, status, seconds)
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+
+    def configure(self, threshold_ms: Optional[float] = None, size: Optional[int] = None):
+        with self._lock:
+            if threshold_ms is not None:
+                self.threshold_ms = threshold_ms
+            if size is not None and size != self._entries.maxlen:
+                self._entries = deque(self._entries, maxlen=size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self, limit: Optional[int] = None) -> dict:
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return {
+            "threshold_ms": self.threshold_ms,
+            "size": self._entries.maxlen,
+            "recorded": self.recorded,
+            "requests": entries[:limit] if limit else entries,
+        }
+
+
+slow_requests = SlowRequestLog(settings.SLOW_REQUEST_THRESHOLD_MS, settings.SLOW_REQUEST_LOG_SIZE)
+
+
+# ---------------------------
+# Sampling profiler
+# ---------------------------
+
+# Leaf frames of threads parked with nothing to do (idle pool workers, the event loop's select)
+IDLE_FRAMES = {
+    "threading:Condition.wait", "threading:Event.wait", "queue:Queue.get",
+    "concurrent.futures.thread:_worker",  # blocked in SimpleQueue.get, which is C
+    "selectors:EpollSelector.select", "selectors:KqueueSelector.select",
+    "selectors:PollSelector.select", "selectors:SelectSelector.select",
+}
+
+_profile_lock = threading.Lock()
+
+
+def sample_stacks(seconds: float, interval: float = 0.01, idle: bool = False) -> Dict[str, int]:
+    """
+    Sample the Python stack of every thread each `interval` seconds for
+    `seconds`; returns {"thread;module:func;...": samples}, root first.
+    Idle threads are left out unless `idle` is set. One run at a time per
+    process (RuntimeError otherwise).
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running in this worker")
+    try:
+        me = threading.get_ident()
+        labels: Dict[object, str] = {}
+        counts: Dict[str, int] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = (
+                            f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+                        )
+                    stack.append(label)
+                    frame = frame.f_back
+                if not stack or (not idle and stack[0] in IDLE_FRAMES):
+                    continue
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(interval)
+        return counts
+    finally:
+        _profile_lock.release()
+
+
+def format_collapsed(counts: Dict[str, int]) -> str:
+    """One "frame;frame;frame count" line per distinct stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
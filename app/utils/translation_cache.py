@@ -0,0 +1,114 @@
+# backend/app/utils/translation_cache.py
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+from .config import settings
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache keyed by (source, target, sha1(text)):
+    a bounded in-memory LRU in front of an optional sqlite file that
+    survives restarts and is shared by workers on the same host.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, path: Optional[str] = None):
+        self._memory = TTLCache(default_ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS translations "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent translation cache disabled: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(text: str, source: str, target: str) -> str:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"{source}:{target}:{digest}"
+
+    def get(self, text: str, source: str, target: str) -> Optional[str]:
+        key = self.make_key(text, source, target)
+        value = self._memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self._db is not None:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+            if row and row[1] > time.time():
+                self.disk_hits += 1
+                self._memory.set(key, row[0], ttl=int(row[1] - time.time()))
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def set(self, text: str, source: str, target: str, value: str):
+        key = self.make_key(text, source, target)
+        self._memory.set(key, value)
+        if self._db is not None:
+            try:
+                with self._lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, time.time() + self._ttl),
+                    )
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist translation: {e}")
+
+    def clear(self):
+        self._memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_translation_cache: Optional[TranslationCache] = None
+
+
+def get_translation_cache() -> TranslationCache:
+    """Process-wide translation cache sized by settings.TRANSlator_CACHE_SIZE."""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = TranslationCache(
+            max_entries=settings.TRANSlator_CACHE_SIZE,
+            ttl_seconds=settings.TRANSLATION_CACHE_TTL_SECONDS,
+            path=settings.TRANSLATION_CACHE_PATH or None,
+        )
+    return _translation_cache
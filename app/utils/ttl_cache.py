@@ -1,25 +1,53 @@
 # backend/app/utils/ttl_cache.py
 import time
+import threading
+from collections import OrderedDict
 from typing import Any
 
 class TTLCache:
-    def __init__(self, default_ttl_seconds: int = 300):
-        self._store: dict[str, tuple[float, Any]] = {}
+    """
+    Dict-backed cache with per-entry expiry. When max_entries is set the
+    cache is bounded and evicts the least recently used entry first.
+    """
+    def __init__(self, default_ttl_seconds: int = 300, max_entries: int | None = None):
+        self._store: OrderedDict[str, tuple[float, Any]] = OrderedDict()
         self._ttl = default_ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
     def get(self, key: str):
-        item = self._store.get(key)
-        if not item:
-            return None
-        expires_at, value = item
-        if time.time() > expires_at:
-            del self._store[key]
-            return None
-        return value
+        with self._lock:
+            item = self._store.get(key)
+            if not item:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if time.time() > expires_at:
+                del self._store[key]
+                self.misses += 1
+                return None
+            self._store.move_to_end(key)
+            self.hits += 1
+            return value
 
     def set(self, key: str, value: Any, ttl: int | None = None):
         ttl = ttl if ttl is not None else self._ttl
-        self._store[key] = (time.time() + ttl, value)
+        with self._lock:
+            self._store[key] = (time.time() + ttl, value)
+            self._store.move_to_end(key)
+            if self._max_entries is not None:
+                while len(self._store) > self._max_entries:
+                    self._store.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._store.pop(key, None)
 
     def clear(self):
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
+
+    def __len__(self):
+        return len(self._store)
@@ -0,0 +1 @@
+"""Load-test harness and local stand-ins for the upstream APIs (see harness.py)."""
@@ -0,0 +1,340 @@
+"""
+Local stand-ins for the upstream providers: OpenWeather (geocoding and
+current weather), AgroMonitoring (soil), Plant.id and the Google translate
+page deep_translator scrapes.
+
+Each provider runs its own HTTP server with a Profile of latency, error
+rate and payload shape. Point the app at them through the *_BASE_URL
+settings; env_for() returns the variables to set.
+
+    with FakeUpstreams(seed=1, profiles={"openweather": Profile(latency_ms=120, error_rate=0.02)}) as fakes:
+        os.environ.update(fakes.env())
+        ...
+        fakes.stats()   # requests/errors per provider
+
+Run standalone to serve them for an app started by hand:
+
+    python -m benchmarks.fake_upstreams --port-base 9100 --latency-ms 80
+"""
+import html
+import json
+import math
+import time
+import random
+import zlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+PAYLOADS = ("stable", "drifting", "large")
+
+
+@dataclass
+class Profile:
+    """
+    latency_ms +/- jitter_ms is added to every response; error_rate is the
+    share of requests answered with error_status. Payloads:
+      stable   - readings depend only on the location
+      drifting - readings also change with wall time, so consecutive
+                 insight passes see new fingerprints
+      large    - stable readings padded with the extra fields the real
+                 APIs return (forecast blocks, alternate names, ...)
+    """
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    payload: str = "stable"
+
+    def __post_init__(self):
+        if self.payload not in PAYLOADS:
+            raise ValueError(f"Unknown payload profile {self.payload!r}, expected one of {PAYLOADS}")
+
+
+def _unit(*parts) -> float:
+    """Deterministic value in [0, 1) for a location or name."""
+    return zlib.crc32(json.dumps(parts).encode("utf-8")) / 2 ** 32
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_ProviderServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, method: str):
+        upstream = self.server.upstream
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        route = upstream.routes.get((method, url.path))
+        status, content_type, body = 404, "application/json", b'{"message": "not found"}'
+        if route is not None:
+            status, content_type, body = upstream.respond(route, query)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class _ProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, upstream: "FakeUpstream"):
+        self.upstream = upstream
+        super().__init__(address, _Handler)
+
+
+class FakeUpstream:
+    """One provider: routes are (method, path) -> handler(query) returning a payload."""
+    name = ""
+
+    def __init__(self, profile: Optional[Profile] = None, seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.profile = profile or Profile()
+        self.host = host
+        self.port = port
+        self._random = random.Random(f"{seed}:{self.name}")
+        self._lock = threading.Lock()
+        self._server: Optional[_ProviderServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self.errors = 0
+        self.routes: Dict[Tuple[str, str], Callable[[Dict[str, str]], object]] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def respond(self, route, query: Dict[str, str]) -> Tuple[int, str, bytes]:
+        profile = self.profile
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, profile.latency_ms + self._random.uniform(-profile.jitter_ms, profile.jitter_ms))
+            failed = self._random.random() < profile.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay / 1000)
+        if failed:
+            return profile.error_status, "application/json", b'{"message": "injected failure"}'
+        payload = route(query)
+        if isinstance(payload, str):
+            return 200, "text/html; charset=utf-8", payload.encode("utf-8")
+        return 200, "application/json", json.dumps(payload).encode("utf-8")
+
+    def start(self) -> "FakeUpstream":
+        self._server = _ProviderServer((self.host, self.port), self)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "base_url": self.base_url}
+
+
+class FakeOpenWeather(FakeUpstream):
+    name = "openweather"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.routes = {
+            ("GET", "/geo/1.0/direct"): self.geocode,
+            ("GET", "/data/2.5/weather"): self.weather,
+        }
+
+    def geocode(self, query):
+        name = query.get("q", "")
+        lat, lon = 8 + _unit(name, "lat") * 27, 68 + _unit(name, "lon") * 29  # somewhere in India
+        result = {"name": name, "lat": round(lat, 4), "lon": round(lon, 4), "country": "IN"}
+        if self.profile.payload == "large":
+            result["local_names"] = {f"l{i}": f"{name}-{i}" for i in range(40)}
+        return [result]
+
+    def weather(self, query):
+        lat, lon = float(query.get("lat", 0)), float(query.get("lon", 0))
+        base = _unit(round(lat, 2), round(lon, 2))
+        if self.profile.payload == "drifting":
+            base = (base + time.time() / 600) % 1.0
+        temp = 8 + base * 32
+        rain = round(max(0.0, math.sin(base * 20)) * 6, 1)
+        descriptions = ["clear sky", "few clouds", "scattered clouds", "light rain", "moderate rain", "haze"]
+        payload = {
+            "coord": {"lat": lat, "lon": lon},
+            "weather": [{"id": 800, "main": "Clear", "description": descriptions[int(base * len(descriptions))]}],
+            "main": {
+                "temp": round(temp, 2), "feels_like": round(temp + 1.5, 2),
+                "temp_min": round(temp - 2, 2), "temp_max": round(temp + 2, 2),
+                "pressure": 1000 + int(base * 25), "humidity": 30 + int(base * 65),
+            },
+            "wind": {"speed": round(1 + base * 9, 1), "deg": int(base * 360)},
+            "clouds": {"all": int(base * 100)},
+            "rain": {"1h": rain},
+            "dt": int(time.time()),
+            "name": "Bench",
+            "cod": 200,
+        }
+        if self.profile.payload == "large":
+            payload["hourly"] = [
+                {"dt": payload["dt"] + 3600 * i, "temp": round(temp + math.sin(i / 4), 2), "humidity": 50}
+                for i in range(48)
+            ]
+        return payload
+
+
+class FakeAgroMonitoring(FakeUpstream):
+    name = "agromonitoring"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.routes = {("GET", "/agro/1.0/soil"): self.soil}
+
+    def soil(self, query):
+        lat, lon = float(query.get("lat", 0)), float(query.get("lon", 0))
+        base = _unit(round(lat, 2), round(lon, 2), "soil")
+        if self.profile.payload == "drifting":
+            base = (base + time.time() / 900) % 1.0
+        payload = {
+            "dt": int(time.time()),
+            "t0": round(285 + base * 25, 2),   # Kelvin, as the real API returns
+            "t10": round(284 + base * 20, 2),
+            "moisture": round(0.05 + base * 0.4, 3),
+        }
+        if self.profile.payload == "large":
+            payload["history"] = [{"dt": payload["dt"] - 3600 * i, "moisture": payload["moisture"]} for i in range(72)]
+        return payload
+
+
+class FakePlantId(FakeUpstream):
+    name = "plant_id"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.routes = {("POST", "/v2/identify"): self.identify}
+
+    def identify(self, query):
+        count = 10 if self.profile.payload == "large" else 3
+        return {
+            "id": self._random.randint(1, 10 ** 9),
+            "is_plant": True,
+            "suggestions": [
+                {"plant_name": f"Solanum lycopersicum var. {i}", "probability": round(0.9 / (i + 1), 3)}
+                for i in range(count)
+            ],
+        }
+
+
+class FakeTranslate(FakeUpstream):
+    """
+    Serves the mobile translate page deep_translator parses. Text found in
+    `glossary` (source text -> translation) is translated, anything else is
+    echoed back, which is what the real page does for untranslatable input.
+    """
+    name = "google_translate"
+
+    def __init__(self, *args, glossary: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.glossary: Dict[str, str] = dict(glossary or {})
+        self.routes = {("GET", "/m"): self.translate}
+
+    def translate(self, query):
+        text = query.get("q", "")
+        translated = self.glossary.get(text.strip(), text)
+        return f'<html><body><div class="result-container">{html.escape(translated)}</div></body></html>'
+
+
+PROVIDERS = {
+    cls.name: cls for cls in (FakeOpenWeather, FakeAgroMonitoring, FakePlantId, FakeTranslate)
+}
+
+
+@dataclass
+class FakeUpstreams:
+    """All providers, started together. Missing profiles use Profile() defaults."""
+    seed: int = 0
+    profiles: Dict[str, Profile] = field(default_factory=dict)
+    port_base: int = 0
+    glossary: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        unknown = set(self.profiles) - set(PROVIDERS)
+        if unknown:
+            raise ValueError(f"Unknown providers: {sorted(unknown)}")
+        self.providers: Dict[str, FakeUpstream] = {}
+        for offset, (name, cls) in enumerate(PROVIDERS.items()):
+            port = self.port_base + offset if self.port_base else 0
+            kwargs = {"glossary": self.glossary} if cls is FakeTranslate else {}
+            self.providers[name] = cls(self.profiles.get(name), seed=self.seed, port=port, **kwargs)
+
+    def start(self) -> "FakeUpstreams":
+        for provider in self.providers.values():
+            provider.start()
+        return self
+
+    def stop(self):
+        for provider in self.providers.values():
+            provider.stop()
+
+    def __enter__(self) -> "FakeUpstreams":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def env(self) -> Dict[str, str]:
+        """Settings that route the app's upstream calls to these servers."""
+        p = self.providers
+        return {
+            "OPENWEATHER_BASE_URL": p["openweather"].base_url,
+            "AGRO_BASE_URL": p["agromonitoring"].base_url,
+            "PLANT_ID_BASE_URL": p["plant_id"].base_url,
+            "TRANSLATE_BASE_URL": f"{p['google_translate'].base_url}/m",
+            "OPENWEATHER_API_KEY": "bench",
+            "AGRO_API_KEY": "bench",
+            "PLANT_ID_API_KEY": "bench",
+        }
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: provider.stats() for name, provider in self.providers.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake upstream providers until interrupted")
+    parser.add_argument("--port-base", type=int, default=9100, help="first port; providers use consecutive ports")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload", choices=PAYLOADS, default="stable")
+    args = parser.parse_args()
+
+    profile = Profile(args.latency_ms, args.jitter_ms, args.error_rate, payload=args.payload)
+    fakes = FakeUpstreams(seed=args.seed, profiles={name: profile for name in PROVIDERS}, port_base=args.port_base)
+    with fakes:
+        for key, value in fakes.env().items():
+            print(f"{key}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,478 @@
+"""
+Offline load test of the API against local upstream stand-ins.
+
+Starts the fake providers (benchmarks.fake_upstreams), points the app at
+them and at a throwaway database, runs scripted scenarios and reports
+throughput and p50/p95/p99 latency per scenario:
+
+    login_storm        concurrent /login for a pool of users (bcrypt pool)
+    upload_burst       concurrent /media/upload/ of small images
+    insight_refresh    full /admin/insights/refresh passes over many farms
+                       (geocoding, per-cell weather + soil, analysis)
+    insight_reads      concurrent /farm/{id}/insights reads afterwards
+    translation_heavy  /knowledge/ask in Hindi, Telugu and Tamil (language
+                       id, translation both ways, retrieval, answer cache)
+
+    python -m benchmarks.harness --out benchmarks/baseline.json
+    python -m benchmarks.harness --compare benchmarks/baseline.json --tolerance 0.15
+
+By default the app runs in-process over ASGI, which needs nothing beyond
+requirements.txt. --spawn runs it under uvicorn in a subprocess instead
+(closer to production, --workers > 1 possible). The database is a SQLite
+file in the work dir unless --database-url or --postgres (a temporary
+cluster via initdb/pg_ctl) is given.
+
+Baselines are only comparable on the same machine with the same options;
+the meta block records both.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.fake_upstreams import PAYLOADS, PROVIDERS, FakeUpstreams, Profile
+
+# ---------------------------
+# Results
+# ---------------------------
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+    def record(self, elapsed: float, status):
+        self.latencies.append(elapsed)
+        self.statuses[str(status)] += 1
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items() if not status.startswith("2"))
+
+    def summary(self) -> dict:
+        values = sorted(self.latencies)
+        ms = lambda v: round(v * 1000, 2)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "concurrency": self.concurrency,
+            "seconds": round(self.seconds, 3),
+            "throughput_rps": round(len(values) / self.seconds, 2) if self.seconds else 0.0,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]) if values else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+async def drive(name: str, request: Callable[[int], Awaitable[httpx.Response]],
+                total: int, concurrency: int) -> ScenarioResult:
+    """Closed loop: `concurrency` workers issue request(i) for i in range(total)."""
+    result = ScenarioResult(name, concurrency)
+    indices = iter(range(total))
+
+    async def worker():
+        for i in indices:
+            start = time.perf_counter()
+            try:
+                status = (await request(i)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            result.record(time.perf_counter() - start, status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+# ---------------------------
+# Environment
+# ---------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def ephemeral_postgres(workdir: str) -> Iterator[str]:
+    """A throwaway Postgres cluster in workdir; yields its SQLAlchemy URL."""
+    for binary in ("initdb", "pg_ctl"):
+        if shutil.which(binary) is None:
+            raise RuntimeError(f"--postgres needs {binary} on PATH")
+    data_dir = os.path.join(workdir, "pgdata")
+    port = _free_port()
+    subprocess.run(["initdb", "-D", data_dir, "-U", "bench", "--auth=trust"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(["pg_ctl", "-D", data_dir, "-w", "-l", os.path.join(workdir, "postgres.log"),
+                    "-o", f"-p {port} -k {workdir} -c listen_addresses='' -c fsync=off", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        subprocess.run(["createdb", "-h", workdir, "-p", str(port), "-U", "bench", "bench"], check=True)
+        yield f"postgresql://bench@/bench?host={workdir}&port={port}"
+    finally:
+        subprocess.run(["pg_ctl", "-D", data_dir, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+
+
+def bench_env(workdir: str, fakes: FakeUpstreams, database_url: str) -> Dict[str, str]:
+    """Settings for a reproducible app: fakes, fresh DB and caches, fixed bcrypt cost."""
+    return {
+        **fakes.env(),
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": os.getenv("SECRET_KEY", "bench-secret"),
+        "BCRYPT_CALIBRATE": "false",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "TRANSLATION_CACHE_PATH": os.path.join(workdir, "translation_cache.sqlite3"),
+        "SHARED_CACHE_PATH": os.path.join(workdir, "shared_cache.sqlite3"),
+        "KNOWLEDGE_DOCS_DIR": os.path.join(workdir, "knowledge"),
+        "KNOWLEDGE_INDEX_DIR": os.path.join(workdir, "knowledge_index"),
+        "TIMESERIES_DIR": os.path.join(workdir, "timeseries"),
+        "INSIGHT_REFRESH_SECONDS": "0",
+        "INSIGHT_REFRESH_SPREAD_SECONDS": "0",
+    }
+
+
+class InProcessApp:
+    """The app imported into this process and called over ASGI."""
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        from app.main import app  # settings are read at import, after the env is set
+        self.app = app
+        await app.router.startup()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+        return self.client
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        await self.app.router.shutdown()
+
+
+class SpawnedApp:
+    """uvicorn in a subprocess, with the bench env."""
+
+    def __init__(self, env: Dict[str, str], workers: int = 1):
+        self.env = env
+        self.workers = workers
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        port = _free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--workers", str(self.workers), "--log-level", "warning"],
+            env={**os.environ, **self.env},
+        )
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120,
+                                        limits=httpx.Limits(max_connections=512))
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if (await self.client.get("/openapi.json")).status_code == 200:
+                    return self.client
+            except httpx.TransportError:
+                pass
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            await asyncio.sleep(0.2)
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+# ---------------------------
+# Scenario data
+# ---------------------------
+
+CROPS = ["tomato", "cotton", "rice", "wheat", "chilli", "groundnut", "maize", "onion", "potato", "sugarcane"]
+TOPICS = {
+    "irrigation": "Water {crop} early in the morning. Check soil moisture at root depth before irrigating; "
+                  "drip irrigation saves water and keeps the leaves dry during flowering.",
+    "pests": "Scout {crop} fields weekly for aphids, whitefly and borers. Yellow sticky traps and neem oil "
+             "control early infestations; spray insecticide only above the economic threshold.",
+    "fertilizer": "Apply nitrogen to {crop} in split doses. A soil test guides phosphorus and potash; "
+                  "well rotted manure improves structure and nutrient supply.",
+    "disease": "Fungal disease in {crop} spreads after rain and humid weather. Remove infected leaves, "
+               "improve drainage and use a copper fungicide as a preventive spray.",
+    "sowing": "Sow {crop} when soil temperature and moisture are right for germination. Treat seed before "
+              "sowing and keep recommended spacing between rows.",
+    "soil": "Sandy soil loses moisture quickly; mulch and organic matter help {crop} retain water. "
+            "Test soil pH every season and correct it with lime or gypsum.",
+}
+# question -> English, served by the fake translator; the answer goes back through it as an echo
+QUESTIONS = {
+    "मुझे अपने टमाटर के पौधों को कब पानी देना चाहिए?": "When should I water my tomato plants?",
+    "कपास पर एफिड्स को कैसे नियंत्रित करें?": "How do I control aphids on cotton?",
+    "धान के लिए सबसे अच्छी खाद कौन सी है?": "Which fertilizer is best for rice?",
+    "मेरे मिर्च के पौधे की पत्तियाँ पीली क्यों हो रही हैं?": "Why are the leaves of my chilli plant turning yellow?",
+    "పుష్పించే సమయంలో గోధుమకు ఎంత నీరు అవసరం?": "How much water does wheat need during flowering?",
+    "వర్షం తర్వాత వేరుశనగలో శిలీంధ్ర వ్యాధిని ఎలా నివారించాలి?": "How can I prevent fungal disease in groundnut after rain?",
+    "மக்காச்சோளம் விதைக்க சரியான நேரம் எது?": "When is the right time to sow maize?",
+    "மணல் மண்ணில் ஈரப்பதத்தை எவ்வாறு தக்கவைப்பது?": "How do I improve soil moisture retention in sandy soil?",
+}
+
+
+def write_knowledge_docs(docs_dir: str):
+    os.makedirs(docs_dir, exist_ok=True)
+    for crop in CROPS:
+        for topic, text in TOPICS.items():
+            with open(os.path.join(docs_dir, f"{crop}-{topic}.md"), "w", encoding="utf-8") as f:
+                f.write(f"# {crop.title()} {topic}\n\n{text.format(crop=crop)}\n")
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+
+class Bench:
+    def __init__(self, client: httpx.AsyncClient, seed: int, scale: float, concurrency: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.scale = scale
+        self.concurrency = concurrency
+        self._users = 0
+        self._admin: Optional[str] = None
+
+    def n(self, base: int) -> int:
+        return max(1, int(base * self.scale))
+
+    async def register(self) -> tuple:
+        self._users += 1
+        username, password = f"bench{self._users}", f"pw-{self._users}"
+        response = await self.client.post("/register", json={
+            "username": username, "email": f"{username}@bench.example", "password": password})
+        response.raise_for_status()
+        return username, password, response.json()["access_token"]
+
+    async def admin(self) -> Dict[str, str]:
+        if self._admin is None:
+            from app import models
+            from app.database import SessionLocal
+            username, password, _ = await self.register()
+            with SessionLocal() as db:
+                db.query(models.User).filter(models.User.username == username).update({"role": "admin"})
+                db.commit()
+            response = await self.client.post("/login", json={"username": username, "password": password})
+            response.raise_for_status()
+            self._admin = response.json()["access_token"]
+        return {"Authorization": f"Bearer {self._admin}"}
+
+    async def login_storm(self) -> List[ScenarioResult]:
+        users = [await self.register() for _ in range(self.n(20))]
+
+        def request(i):
+            username, password, _ = users[i % len(users)]
+            return self.client.post("/login", json={"username": username, "password": password})
+
+        return [await drive("login_storm", request, self.n(200), self.concurrency)]
+
+    async def upload_burst(self) -> List[ScenarioResult]:
+        _, _, token = await self.register()
+        headers = {"Authorization": f"Bearer {token}"}
+        images = [self.rng.randbytes(64 * 1024) for _ in range(8)]
+
+        def request(i):
+            files = {"file": (f"leaf-{i}.jpg", images[i % len(images)], "image/jpeg")}
+            return self.client.post("/media/upload/", files=files, headers=headers)
+
+        return [await drive("upload_burst", request, self.n(200), self.concurrency)]
+
+    async def insight_fanout(self) -> List[ScenarioResult]:
+        admin = await self.admin()
+        _, _, token = await self.register()
+        headers = {"Authorization": f"Bearer {token}"}
+        # Several farms per village, so passes exercise the per-cell grouping
+        villages = [f"Village {i}" for i in range(self.n(60))]
+        farm_ids = []
+        for i in range(self.n(240)):
+            response = await self.client.post("/farm/add", headers=headers, json={
+                "farm_name": f"Farm {i}", "location": self.rng.choice(villages), "area": 2.5})
+            response.raise_for_status()
+            farm_ids.append(response.json()["id"])
+
+        refresh = await drive("insight_refresh",
+                              lambda i: self.client.post("/admin/insights/refresh", headers=admin), 3, 1)
+        reads = await drive("insight_reads",
+                            lambda i: self.client.get(f"/farm/{farm_ids[i % len(farm_ids)]}/insights", headers=headers),
+                            self.n(500), self.concurrency)
+        return [refresh, reads]
+
+    async def translation_heavy(self) -> List[ScenarioResult]:
+        admin = await self.admin()
+        (await self.client.post("/knowledge/reindex", headers=admin)).raise_for_status()
+        _, _, token = await self.register()
+        headers = {"Authorization": f"Bearer {token}"}
+        questions = list(QUESTIONS)
+        # Contexts vary so only part of the traffic is answered from the answer cache
+        contexts = [{"crop": crop, "latitude": 15 + self.rng.random() * 5, "longitude": 75 + self.rng.random() * 5}
+                    for crop in CROPS for _ in range(3)]
+
+        def request(i):
+            body = {"question": questions[i % len(questions)], **contexts[(i * 7) % len(contexts)]}
+            return self.client.post("/knowledge/ask", json=body, headers=headers)
+
+        return [await drive("translation_heavy", request, self.n(300), self.concurrency)]
+
+
+SCENARIOS = {
+    "login_storm": Bench.login_storm,
+    "upload_burst": Bench.upload_burst,
+    "insight_fanout": Bench.insight_fanout,
+    "translation_heavy": Bench.translation_heavy,
+}
+
+
+# ---------------------------
+# Baselines
+# ---------------------------
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Print per-scenario changes against a baseline; returns the regressions
+    (p95 up or throughput down by more than tolerance, or new errors).
+    """
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:<20} (not in baseline)")
+            continue
+
+        def change(key):
+            return (now[key] - before[key]) / before[key] if before[key] else 0.0
+
+        p95, rps = change("p95_ms"), change("throughput_rps")
+        print(f"{name:<20} p95 {before['p95_ms']:>9.1f} -> {now['p95_ms']:>9.1f} ms ({p95:+.0%})   "
+              f"rps {before['throughput_rps']:>8.1f} -> {now['throughput_rps']:>8.1f} ({rps:+.0%})   "
+              f"errors {before['errors']} -> {now['errors']}")
+        if p95 > tolerance:
+            regressions.append(f"{name}: p95 {p95:+.0%}")
+        if rps < -tolerance:
+            regressions.append(f"{name}: throughput {rps:+.0%}")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, env: Dict[str, str]) -> dict:
+    app = SpawnedApp(env, args.workers) if args.spawn else InProcessApp()
+    results: Dict[str, dict] = {}
+    async with app as client:
+        bench = Bench(client, args.seed, args.scale, args.concurrency)
+        for name in args.scenarios:
+            for result in await SCENARIOS[name](bench):
+                results[result.name] = result.summary()
+                print(f"{result.name:<20} {json.dumps(results[result.name])}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test against fake upstream providers")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for users, farms and request counts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="upstream latency (all providers)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests that fail")
+    parser.add_argument("--payload", choices=PAYLOADS, default="stable")
+    parser.add_argument("--database-url", help="use this database instead of a fresh SQLite file")
+    parser.add_argument("--postgres", action="store_true", help="run against a temporary Postgres cluster")
+    parser.add_argument("--spawn", action="store_true", help="run the app under uvicorn in a subprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra app settings, e.g. --env PASSWORD_HASH_WORKERS=8")
+    parser.add_argument("--out", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--keep", action="store_true", help="keep the work dir (DB, uploads, caches)")
+    args = parser.parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="farm-bench-")
+    profile = Profile(args.latency_ms, args.jitter_ms, args.error_rate, payload=args.payload)
+    fakes = FakeUpstreams(seed=args.seed, profiles={name: profile for name in PROVIDERS}, glossary=QUESTIONS)
+    try:
+        with fakes, (ephemeral_postgres(workdir) if args.postgres else nullcontext(args.database_url)) as db_url:
+            env = bench_env(workdir, fakes, db_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+            env.update(item.split("=", 1) for item in args.env)
+            os.environ.update(env)
+            write_knowledge_docs(env["KNOWLEDGE_DOCS_DIR"])
+            scenarios = asyncio.run(run(args, env))
+            upstreams = fakes.stats()
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": "postgres" if args.postgres else ("custom" if args.database_url else "sqlite"),
+            "mode": f"uvicorn x{args.workers}" if args.spawn else "in-process",
+            "options": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep")},
+        },
+        "scenarios": scenarios,
+        "upstreams": {name: {k: v for k, v in stats.items() if k != "base_url"} for name, stats in upstreams.items()},
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
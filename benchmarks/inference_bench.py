@@ -0,0 +1,236 @@
+"""
+Micro-benchmark of app/ml/inference.py across batch size, torch threads,
+preprocessing variant and precision, for sizing CPU inference nodes.
+
+    python -m benchmarks.inference_bench --images ./leaf_photos --out inference-c6i.json
+    python -m benchmarks.inference_bench --synthetic 64 --batch-sizes 1,8,32 --threads 1,2,4 \\
+        --precisions fp32,bf16,int8 --preprocess standard,draft
+
+Every configuration runs in a fresh subprocess, so each one reports its
+own cold start and peak memory:
+
+    images_per_sec    preprocessing + model over all timed batches
+    batch p50/p95/p99 latency of one batch (preprocessing included)
+    preprocess_ms     mean decode/resize time per image
+    ttfp_ms           time to first prediction: torch import, model build
+                      and the first single-image prediction
+    peak_rss_mb       peak resident memory of the process
+
+--weights random (the default) skips the ImageNet download and costs the
+same compute as the pretrained model. Without torch (TORCH_AVAILABLE is
+false) the mock predictor is measured over the batch sizes only.
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import itertools
+import tempfile
+import subprocess
+from typing import Dict, List
+
+from benchmarks.harness import _git_revision, percentile
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_images(folder: str) -> List[bytes]:
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"No {'/'.join(IMAGE_EXTENSIONS)} images under {folder}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def synthetic_images(count: int, seed: int, size=(1600, 1200)) -> List[bytes]:
+    """Phone-camera sized JPEGs: smooth gradients plus noise, so they compress like photos."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    h, w = size[1], size[0]
+    yy, xx = np.mgrid[0:h, 0:w]
+    images = []
+    for _ in range(count):
+        base = np.stack([
+            (np.sin(xx / rng.uniform(40, 200)) + np.cos(yy / rng.uniform(40, 200))) * 60 + rng.uniform(60, 190)
+            for _ in range(3)
+        ], axis=-1)
+        pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype("uint8")
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+# ---------------------------
+# One configuration (subprocess)
+# ---------------------------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(config: Dict, images: List[bytes]) -> Dict:
+    """Run one configuration in this process; call in a fresh interpreter."""
+    started = time.perf_counter()
+    from app.ml import inference
+
+    batch_size = config["batch_size"]
+    if inference.TORCH_AVAILABLE:
+        import torch
+        if config["threads"]:
+            torch.set_num_threads(config["threads"])
+        model = inference.build_model(pretrained=config["weights"] == "pretrained", precision=config["precision"])
+
+        def predict(chunk):
+            t0 = time.perf_counter()
+            batch = torch.stack([inference.preprocess(image, config["preprocess"]) for image in chunk])
+            t1 = time.perf_counter()
+            inference.classify(model, batch, config["precision"])
+            return t1 - t0
+    else:
+        def predict(chunk):
+            inference.predict_batch(chunk)
+            return 0.0
+
+    predict(images[:1])
+    ttfp = time.perf_counter() - started
+
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    for chunk in batches[:config["warmup"]]:
+        predict(chunk)
+
+    latencies, preprocess_seconds, count = [], 0.0, 0
+    start = time.perf_counter()
+    for _ in range(config["iterations"]):
+        for chunk in batches:
+            t0 = time.perf_counter()
+            preprocess_seconds += predict(chunk)
+            latencies.append(time.perf_counter() - t0)
+            count += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        **config,
+        "backend": "torch" if inference.TORCH_AVAILABLE else "mock",
+        "images": count,
+        "images_per_sec": round(count / elapsed, 2) if elapsed else 0.0,
+        "batch_p50_ms": ms(percentile(latencies, 50)),
+        "batch_p95_ms": ms(percentile(latencies, 95)),
+        "batch_p99_ms": ms(percentile(latencies, 99)),
+        "preprocess_ms": ms(preprocess_seconds / count) if count else 0.0,
+        "ttfp_ms": ms(ttfp),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_worker(folder: str, config: Dict) -> Dict:
+    command = [sys.executable, "-m", "benchmarks.inference_bench", "--worker", json.dumps(config), "--images", folder]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {**config, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _csv(value: str, cast=str) -> List:
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inference throughput/latency sweep")
+    parser.add_argument("--images", help="folder of .jpg/.png images (default: synthetic photos)")
+    parser.add_argument("--synthetic", type=int, default=32, help="synthetic images when --images is not given")
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--threads", default="1,2,4", help="torch.set_num_threads values; 0 = torch default")
+    parser.add_argument("--precisions", default="fp32", help="comma separated subset of fp32,bf16,int8")
+    parser.add_argument("--preprocess", default="standard,draft", help="comma separated subset of standard,draft")
+    parser.add_argument("--weights", choices=("random", "pretrained"), default="random")
+    parser.add_argument("--iterations", type=int, default=3, help="timed passes over the image set")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed batches before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(json.loads(args.worker), load_images(args.images))))
+        return 0
+
+    from app.ml.inference import PRECISIONS, PREPROCESS_VARIANTS, TORCH_AVAILABLE
+    batch_sizes, threads = _csv(args.batch_sizes, int), _csv(args.threads, int)
+    precisions, variants = _csv(args.precisions), _csv(args.preprocess)
+    for name, values, allowed in (("precision", precisions, PRECISIONS), ("preprocessing", variants, PREPROCESS_VARIANTS)):
+        unknown = set(values) - set(allowed)
+        if unknown:
+            parser.error(f"unknown {name}: {', '.join(sorted(unknown))}")
+    if not TORCH_AVAILABLE:
+        print("torch is not installed: measuring the mock predictor (threads, precision and preprocessing ignored)")
+        threads, precisions, variants = [0], ["fp32"], ["standard"]
+
+    folder = args.images
+    if folder is None:
+        # Written once to disk so workers don't pay for (or count the memory of) generating them
+        folder = tempfile.mkdtemp(prefix="inference-bench-")
+        for i, image in enumerate(synthetic_images(args.synthetic, args.seed)):
+            with open(os.path.join(folder, f"synthetic-{i:03d}.jpg"), "wb") as f:
+                f.write(image)
+    images = load_images(folder)
+    print(f"{len(images)} images, {sum(map(len, images)) / len(images) / 1024:.0f} KiB average")
+    header = f"{'batch':>5} {'thr':>3} {'prec':>5} {'prep':>8} {'img/s':>9} {'p50 ms':>9} {'p95 ms':>9} " \
+             f"{'p99 ms':>9} {'prep ms':>8} {'ttfp ms':>9} {'rss MB':>7}"
+    print(header)
+    results = []
+    for batch_size, thread_count, precision, variant in itertools.product(batch_sizes, threads, precisions, variants):
+        config = {"batch_size": batch_size, "threads": thread_count, "precision": precision, "preprocess": variant,
+                  "weights": args.weights, "iterations": args.iterations, "warmup": args.warmup}
+        result = _run_worker(folder, config)
+        results.append(result)
+        if "error" in result:
+            print(f"{batch_size:>5} {thread_count:>3} {precision:>5} {variant:>8}  failed: {result['error']}")
+            continue
+        print(f"{batch_size:>5} {thread_count:>3} {precision:>5} {variant:>8} {result['images_per_sec']:>9.1f} "
+              f"{result['batch_p50_ms']:>9.1f} {result['batch_p95_ms']:>9.1f} {result['batch_p99_ms']:>9.1f} "
+              f"{result['preprocess_ms']:>8.2f} {result['ttfp_ms']:>9.0f} {result['peak_rss_mb']:>7.0f}")
+
+    if args.images is None:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if args.out:
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "cpus": os.cpu_count(),
+                "images": len(images),
+                "source": args.images or f"synthetic:{args.synthetic}",
+            },
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
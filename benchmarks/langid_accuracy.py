@@ -0,0 +1,149 @@
+"""
+Accuracy of the offline n-gram language id (app/services/language_detection.py)
+against langdetect, on a fixed set of farming questions in the languages
+that share a script (Latin, Cyrillic, Devanagari, Arabic). Those are the ones
+the model has to tell apart; single-script languages are decided from code
+points, except when a few of their letters sit in a mostly Latin sentence.
+
+    python -m benchmarks.langid_accuracy                      # model built from the profiles
+    python -m benchmarks.langid_accuracy --model models/langid_model.npz
+
+Prints both detectors' accuracy and every sentence they get wrong. Exits 1
+when the n-gram model is more than --tolerance sentences behind langdetect,
+so a model build can be rejected before it replaces langdetect (the Docker
+image runs this right after precomputing the model).
+"""
+import sys
+import time
+import argparse
+from typing import List, Sequence, Tuple
+
+from app.services.language_detection import FastLanguageDetector, LangdetectDetector, NgramModel
+
+# (expected language, text)
+SAMPLES: List[Tuple[str, str]] = [
+    ('af', 'Wanneer moet ek my tamaties natmaak?'),
+    ('af', 'Die blare van my koring word geel.'),
+    ('af', 'Ek het hulp nodig met my tuin.'),
+    ('af', 'Goeie môre, hoe is die weer vandag?'),
+    ('ar', 'متى يجب أن أسقي الطماطم؟'),
+    ('ar', 'أوراق القمح عندي تتحول إلى اللون الأصفر.'),
+    ('ar', 'أحتاج إلى مساعدة في مزرعتي.'),
+    ('bg', 'Кога трябва да поливам доматите си?'),
+    ('bg', 'Листата на моята пшеница пожълтяват.'),
+    ('bg', 'Имам нужда от помощ с градината.'),
+    ('bg', 'Почвата ми е много суха.'),
+    ('de', 'Wie geht es dir'),
+    ('de', 'Wann sollte ich meine Tomaten gießen?'),
+    ('de', 'Die Blätter meines Weizens werden gelb.'),
+    ('de', 'Ich brauche Hilfe mit meinem Garten.'),
+    ('de', 'Guten Morgen, wie ist das Wetter heute?'),
+    ('de', 'Mein Boden ist sehr trocken.'),
+    ('en', 'When should I water my tomatoes?'),
+    ('en', 'The leaves of my wheat are turning yellow.'),
+    ('en', 'How much fertilizer does rice need per acre?'),
+    ('en', 'Is it going to rain tomorrow in my village?'),
+    ('en', 'My cows are not eating well.'),
+    # a word or symbol in another script inside an English sentence
+    ('en', 'What is the price of गेहूं today?'),
+    ('en', 'ΔT of 5 degrees is fine for wheat'),
+    ('en', 'Apply urea at 50 kg per acre (यूरिया)'),
+    ('es', '¿Cuándo debo regar mis tomates?'),
+    ('es', 'Las hojas de mi trigo se están poniendo amarillas.'),
+    ('es', 'Necesito ayuda con mi jardín.'),
+    ('es', 'Mi suelo está muy seco.'),
+    ('fa', 'کی باید به گوجه فرنگی هایم آب بدهم؟'),
+    ('fa', 'برگ های گندم من زرد می شوند.'),
+    ('fa', 'من برای مزرعه ام به کمک نیاز دارم.'),
+    ('fr', 'Quand dois-je arroser mes tomates ?'),
+    ('fr', 'Les feuilles de mon blé deviennent jaunes.'),
+    ('fr', "J'ai besoin d'aide avec mon jardin."),
+    ('hi', 'मुझे अपने टमाटर को कब पानी देना चाहिए?'),
+    ('hi', 'मेरे गेहूं की पत्तियां पीली हो रही हैं।'),
+    ('hi', 'मुझे अपने खेत के लिए मदद चाहिए।'),
+    ('hi', 'क्या कल बारिश होगी?'),
+    ('id', 'Kapan saya harus menyiram tomat saya?'),
+    ('id', 'Daun gandum saya menguning.'),
+    ('id', 'Saya butuh bantuan dengan kebun saya.'),
+    ('it', 'Quando devo annaffiare i miei pomodori?'),
+    ('it', 'Le foglie del mio grano stanno diventando gialle.'),
+    ('it', 'Ho bisogno di aiuto con il mio giardino.'),
+    ('mk', 'Кога треба да ги наводнувам доматите?'),
+    ('mk', 'Ми треба помош со градината.'),
+    ('mk', 'Мојата почва е многу сува.'),
+    ('mr', 'मी माझ्या टोमॅटोला पाणी केव्हा द्यावे?'),
+    ('mr', 'माझ्या गव्हाची पाने पिवळी पडत आहेत.'),
+    ('mr', 'मला माझ्या शेतासाठी मदत हवी आहे.'),
+    ('ne', 'मैले मेरो गोलभेडामा कहिले पानी हाल्नुपर्छ?'),
+    ('ne', 'मलाई मेरो खेतको लागि मद्दत चाहिन्छ।'),
+    ('nl', 'Wanneer moet ik mijn tomaten water geven?'),
+    ('nl', 'De bladeren van mijn tarwe worden geel.'),
+    ('nl', 'Hoeveel kunstmest heeft rijst nodig?'),
+    ('nl', 'Ik heb hulp nodig met mijn tuin.'),
+    ('nl', 'Goedemorgen, hoe is het weer vandaag?'),
+    ('nl', 'Mijn grond is erg droog.'),
+    ('pl', 'Kiedy powinienem podlewać pomidory?'),
+    ('pl', 'Liście mojej pszenicy żółkną.'),
+    ('pt', 'Quando devo regar os meus tomates?'),
+    ('pt', 'As folhas do meu trigo estão ficando amarelas.'),
+    ('pt', 'Preciso de ajuda com o meu jardim.'),
+    ('ro', 'Când ar trebui să îmi ud roșiile?'),
+    ('ru', 'Когда поливать помидоры?'),
+    ('ru', 'Листья моей пшеницы желтеют.'),
+    ('ru', 'Сколько удобрений нужно для риса?'),
+    ('ru', 'Мне нужна помощь с огородом.'),
+    ('ru', 'Доброе утро, какая сегодня погода?'),
+    ('ru', 'Моя почва очень сухая.'),
+    ('sv', 'När ska jag vattna mina tomater?'),
+    ('sw', 'Ni lini ninapaswa kumwagilia nyanya zangu?'),
+    ('sw', 'Majani ya ngano yangu yanageuka manjano.'),
+    ('sw', 'Nahitaji msaada na shamba langu.'),
+    ('tr', 'Domateslerimi ne zaman sulamalıyım?'),
+    ('tr', 'Buğdayımın yaprakları sararıyor.'),
+    ('tr', 'Bahçem için yardıma ihtiyacım var.'),
+    ('uk', 'Коли поливати помідори?'),
+    ('uk', 'Листя моєї пшениці жовтіє.'),
+    ('uk', 'Скільки добрив потрібно для рису?'),
+    ('uk', 'Мені потрібна допомога з городом.'),
+    ('uk', 'Доброго ранку, яка сьогодні погода?'),
+    ('uk', 'Мій ґрунт дуже сухий.'),
+    ('ur', 'مجھے اپنے ٹماٹروں کو کب پانی دینا چاہیے؟'),
+    ('ur', 'میری گندم کے پتے پیلے ہو رہے ہیں۔'),
+    ('ur', 'مجھے اپنے کھیت کے لیے مدد چاہیے۔'),
+]
+
+
+def evaluate(detector, samples: Sequence[Tuple[str, str]]) -> Tuple[int, List[Tuple[str, str, str]], float]:
+    """(correct, [(expected, detected, text) for misses], ms per sentence)"""
+    start = time.perf_counter()
+    detected = [detector.detect(text) for _, text in samples]
+    ms = (time.perf_counter() - start) * 1000 / len(samples)
+    misses = [(lang, got, text) for (lang, text), got in zip(samples, detected) if got != lang]
+    return len(samples) - len(misses), misses, ms
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="N-gram language id accuracy vs langdetect")
+    parser.add_argument("--model", help="precomputed model (.npz); built from the langdetect profiles if omitted")
+    parser.add_argument("--tolerance", type=int, default=0, help="sentences the model may trail langdetect by")
+    args = parser.parse_args(argv)
+
+    model = NgramModel.load(args.model) if args.model else NgramModel.from_langdetect_profiles()
+    results = {
+        "langdetect": evaluate(LangdetectDetector(), SAMPLES),
+        "ngram": evaluate(FastLanguageDetector(model), SAMPLES),
+    }
+    for name, (correct, misses, ms) in results.items():
+        print(f"{name:<10} {correct}/{len(SAMPLES)} correct, {ms:.2f} ms/sentence")
+        for lang, got, text in misses:
+            print(f"    expected {lang}, got {got}: {text}")
+
+    behind = results["langdetect"][0] - results["ngram"][0]
+    if behind > args.tolerance:
+        print(f"n-gram model is {behind} sentences behind langdetect (tolerance {args.tolerance})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())